@@ -0,0 +1,184 @@
+"""
+Incremental app sync against a local git origin.
+
+Builds a synthetic apps repository (file://) in a temporary directory and
+runs `_download_repo` against it through the persistent git mirror, with
+the apps directory, the mirrors and the app manifest all kept under that
+directory. Each scenario changes the origin or the installed apps, syncs,
+and checks that the apps directory matches the origin again:
+
+    first_sync       empty apps directory, every file installed
+    noop_resync      nothing changed upstream: no file may be rewritten
+    upstream_change  one file added, one modified and one deleted upstream
+    restore_deleted  an installed app removed locally is brought back
+
+Every scenario reports its duration, the files added, updated, deleted and
+left unchanged, how many installed files were (re)written, and whether the
+result is correct. Prints JSON (or writes it with --output):
+
+    python benchmarks/app_sync.py --apps 200 --files-per-app 50
+"""
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import functools
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from saus import downloader
+from saus.app_tree import AppTree
+from saus.git_mirror import GitMirror
+
+SOURCE = 'Open'
+
+# --- Origin repository --------------------------------------------------------
+
+def _git(repo: Path, *args) -> str:
+    result = subprocess.run(['git', '-C', str(repo), *args], capture_output=True, text=True, check=True)
+    return result.stdout
+
+def _commit(repo: Path, message: str) -> None:
+    _git(repo, 'add', '-A')
+    _git(repo, '-c', 'user.name=bench', '-c', 'user.email=bench@localhost', 'commit', '-q', '-m', message)
+
+def _file_content(app: int, index: int, size: int, version: int = 0) -> bytes:
+    line = f"app {app} file {index} version {version}\n".encode()
+    return (line * (size // len(line) + 1))[:size]
+
+def make_origin(path: Path, apps: int, files_per_app: int, file_size: int) -> None:
+    path.mkdir(parents=True)
+    _git(path, 'init', '-q')
+    for app in range(apps):
+        app_dir = path / f"app{app:04d}"
+        (app_dir / 'js').mkdir(parents=True)
+        (app_dir / 'appConfig.json').write_text(json.dumps({'url': f"app{app:04d}"}))
+        for index in range(files_per_app - 1):
+            (app_dir / 'js' / f"file{index:03d}.js").write_bytes(_file_content(app, index, file_size))
+    # Items every sync has to leave alone.
+    (path / 'app_list.json').write_text('[]')
+    (path / '.github').mkdir()
+    (path / '.github' / 'workflow.yml').write_text('on: push\n')
+    _commit(path, 'Initial apps')
+
+# --- Checks -------------------------------------------------------------------
+
+def _expected_files(origin: Path) -> dict:
+    """{relative path: bytes} the apps directory must hold for `origin`."""
+    files = {}
+    for app_dir in origin.iterdir():
+        if not app_dir.is_dir() or app_dir.name in downloader.EXCLUDED_ITEMS:
+            continue
+        for path in app_dir.rglob('*'):
+            if path.is_file():
+                files[path.relative_to(origin).as_posix()] = path.read_bytes()
+    return files
+
+def _installed_files(apps_dir: Path) -> dict:
+    return {
+        path.relative_to(apps_dir).as_posix(): path.read_bytes()
+        for path in apps_dir.rglob('*') if path.is_file()
+    }
+
+def _mtimes(apps_dir: Path) -> dict:
+    return {path: path.stat().st_mtime_ns for path in apps_dir.rglob('*') if path.is_file()}
+
+def _totals(summary: dict) -> dict:
+    totals = {'added': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    for counts in summary.values():
+        for change, n in counts.items():
+            totals[change] += n
+    return totals
+
+# --- Scenarios ----------------------------------------------------------------
+
+def _change_upstream(origin: Path, file_size: int) -> dict:
+    """Adds, modifies and deletes one file upstream; returns the counts the sync must report."""
+    (origin / 'app0000' / 'js' / 'added.js').write_bytes(_file_content(0, 999, file_size))
+    (origin / 'app0001' / 'js' / 'file000.js').write_bytes(_file_content(1, 0, file_size, version=1))
+    (origin / 'app0002' / 'js' / 'file000.js').unlink()
+    _commit(origin, 'Add, modify and delete a file')
+    return {'added': 1, 'updated': 1, 'deleted': 1}
+
+def _delete_locally(apps_dir: Path) -> dict:
+    """Removes one installed app; returns the counts the sync must report."""
+    app_dir = apps_dir / 'app0003'
+    files = sum(1 for path in app_dir.rglob('*') if path.is_file())
+    shutil.rmtree(app_dir)
+    return {'added': files}
+
+def _sync(origin: Path, apps_dir: Path) -> dict:
+    before = _mtimes(apps_dir)
+    downloader.app_tree.begin()
+    start = time.perf_counter()
+    downloader._download_repo(origin.as_uri(), SOURCE)
+    downloader.app_tree.save()
+    elapsed = time.perf_counter() - start
+    after = _mtimes(apps_dir)
+    return {
+        'seconds': round(elapsed, 3),
+        'changes': _totals(downloader.app_tree.summary),
+        'files_written': sum(1 for path, mtime in after.items() if before.get(path) != mtime),
+    }
+
+def run_scenarios(workdir: Path, apps: int, files_per_app: int, file_size: int) -> list:
+    origin = workdir / 'origin'
+    apps_dir = workdir / 'apps'
+    apps_dir.mkdir()
+    make_origin(origin, apps, files_per_app, file_size)
+
+    downloader.SAUS_APPS_PATH = apps_dir
+    downloader.app_tree = AppTree(root=apps_dir, path=workdir / 'app_tree.json')
+    downloader.GitMirror = functools.partial(GitMirror, root=workdir / 'mirrors')
+
+    scenarios = [
+        ('first_sync', lambda: {'added': apps * files_per_app}),
+        ('noop_resync', lambda: {}),
+        ('upstream_change', lambda: _change_upstream(origin, file_size)),
+        ('restore_deleted', lambda: _delete_locally(apps_dir)),
+    ]
+    results = []
+    for name, prepare in scenarios:
+        expected_changes = prepare()
+        result = {'scenario': name, **_sync(origin, apps_dir)}
+        changes = result['changes']
+        result['ok'] = (
+            _installed_files(apps_dir) == _expected_files(origin)
+            and all(changes[change] == expected_changes.get(change, 0) for change in ('added', 'updated', 'deleted'))
+            and result['files_written'] == expected_changes.get('added', 0) + expected_changes.get('updated', 0)
+        )
+        results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apps', type=int, default=50)
+    parser.add_argument('--files-per-app', type=int, default=20)
+    parser.add_argument('--file-kb', type=int, default=8)
+    parser.add_argument('--dir', default=tempfile.gettempdir())
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='saus_app_sync_', dir=args.dir))
+    try:
+        results = run_scenarios(workdir, args.apps, args.files_per_app, args.file_kb * 1024)
+        mirror_kb = sum(path.stat().st_size for path in (workdir / 'mirrors').rglob('*') if path.is_file()) // 1024
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = json.dumps({
+        'apps': args.apps, 'files_per_app': args.files_per_app, 'file_kb': args.file_kb,
+        'mirror_kb': mirror_kb, 'results': results,
+    }, indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    else:
+        print(report)
+    sys.exit(0 if all(result['ok'] for result in results) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+"""
+Download throughput against a local fake origin.
+
+Starts an aiohttp origin in a separate process that serves synthetic sparse
+files, then drives `_download_worker` and the generic download handler
+against it, one scenario at a time. The origin can add latency, cap the
+bandwidth, refuse Range requests and drop connections part way through a
+response, so resumes and restarts are exercised too. Every scenario reports
+MB/s, CPU seconds per GB (client process only), event-loop lag, whether the
+downloaded file is byte-exact, how much more than the file the origin had
+to send (0 when every interruption was resumed), and how many progress
+events were emitted.
+
+Prints JSON (or writes it with --output) for comparing versions:
+
+    python benchmarks/download_throughput.py --size-mb 2048 --output before.json
+    python benchmarks/download_throughput.py --scenarios segmented,resume_single
+
+Run it from a ComfyUI install, or standalone: without ComfyUI a stand-in
+PromptServer that only counts WebSocket events is installed.
+"""
+import os
+import sys
+import json
+import time
+import types
+import struct
+import socket
+import asyncio
+import argparse
+import platform
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loop_latency import _heartbeat, _percentile
+
+MARKER_INTERVAL = 1024 * 1024 # every MiB of a synthetic file starts with its own offset
+ORIGIN_CHUNK_SIZE = 256 * 1024
+FILE_NAME = 'bench.bin'
+
+# --- Fake origin (runs in its own process) -----------------------------------
+
+def make_sparse_file(path: Path, size: int) -> None:
+    """A sparse file whose only data are 8-byte offset markers, so misplaced bytes are detectable."""
+    with open(path, 'wb') as f:
+        f.truncate(size)
+        for offset in range(0, size - 7, MARKER_INTERVAL):
+            f.seek(offset)
+            f.write(struct.pack('<Q', offset))
+
+def verify_file(path: Path, size: int) -> bool:
+    try:
+        if os.path.getsize(path) != size:
+            return False
+        with open(path, 'rb') as f:
+            for offset in range(0, size - 7, MARKER_INTERVAL):
+                f.seek(offset)
+                if f.read(8) != struct.pack('<Q', offset):
+                    return False
+    except OSError:
+        return False
+    return True
+
+def _parse_range(header: str, size: int):
+    try:
+        unit, _, spec = header.partition('=')
+        start, _, end = spec.partition('-')
+        if unit.strip() != 'bytes' or ',' in spec:
+            return None
+        start = int(start)
+        end = int(end) if end else size - 1
+        return (start, min(end, size - 1)) if start <= end else None
+    except ValueError:
+        return None
+
+def run_origin(root: str, port: int) -> None:
+    """
+    Serves files from `root` at /files/<name>. Per-request behaviour comes from
+    the query string: latency_ms, rate_mb_s (per connection), ranges=0 to
+    ignore Range headers, and drop_after_mb + drops to cut the first `drops`
+    responses off after that many MB. run=<id> groups the counters at /stats.
+    """
+    from aiohttp import web
+
+    stats = {}
+    drops_done = {}
+
+    async def serve_file(request):
+        query = request.query
+        run = stats.setdefault(query.get('run', ''), {'requests': 0, 'range_requests': 0, 'bytes_sent': 0, 'drops': 0})
+        run['requests'] += 1
+        path = Path(root) / request.match_info['name']
+        if not path.is_file():
+            return web.Response(status=404)
+        size = path.stat().st_size
+        await asyncio.sleep(float(query.get('latency_ms', 0)) / 1000)
+
+        headers = {'Content-Disposition': f'attachment; filename="{path.name}"'}
+        start, end, status = 0, size - 1, 200
+        if query.get('ranges', '1') != '0':
+            headers['Accept-Ranges'] = 'bytes'
+            byte_range = _parse_range(request.headers.get('Range', ''), size)
+            if byte_range:
+                start, end = byte_range
+                status = 206
+                headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+                run['range_requests'] += 1
+        headers['Content-Length'] = str(end - start + 1)
+        if request.method == 'HEAD':
+            return web.Response(status=status, headers=headers)
+
+        rate = float(query.get('rate_mb_s', 0)) * 1024 * 1024
+        drop_after = int(float(query.get('drop_after_mb', 0)) * 1024 * 1024)
+        key = request.path_qs
+        drop = drop_after and drops_done.get(key, 0) < int(query.get('drops', 1))
+
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        sent = 0
+        started = time.monotonic()
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(ORIGIN_CHUNK_SIZE, remaining))
+                if drop and sent + len(chunk) > drop_after:
+                    drops_done[key] = drops_done.get(key, 0) + 1
+                    run['drops'] += 1
+                    request.transport.close()
+                    return response
+                try:
+                    await response.write(chunk)
+                except ConnectionError:
+                    return response # The client gave up on this response
+                sent += len(chunk)
+                run['bytes_sent'] += len(chunk)
+                remaining -= len(chunk)
+                if rate:
+                    ahead = sent / rate - (time.monotonic() - started)
+                    if ahead > 0:
+                        await asyncio.sleep(ahead)
+        await response.write_eof()
+        return response
+
+    async def get_stats(request):
+        return web.json_response(stats.get(request.query.get('run', ''), {}))
+
+    app = web.Application()
+    app.router.add_get('/files/{name}', serve_file)
+    app.router.add_get('/stats', get_stats)
+    web.run_app(app, host='127.0.0.1', port=port, print=None, access_log=None)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+async def _wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+# --- Client side --------------------------------------------------------------
+
+class _EventCounter:
+    """Stand-in for PromptServer.instance: counts WebSocket events instead of sending them."""
+
+    def __init__(self):
+        self.events = {}
+
+    def send_sync(self, event, data, sid=None):
+        self.events[event] = self.events.get(event, 0) + 1
+
+def _install_prompt_server() -> _EventCounter:
+    try:
+        import server
+    except Exception:
+        # Standalone run: downloads.py only needs PromptServer.instance.send_sync.
+        server = types.ModuleType('server')
+        server.PromptServer = type('PromptServer', (), {'instance': None})
+        sys.modules['server'] = server
+    counter = _EventCounter()
+    server.PromptServer.instance = counter
+    return counter
+
+class _JsonRequest:
+    """The part of web.Request the download handlers use."""
+
+    def __init__(self, data):
+        self._data = data
+        self.query = {}
+        self.match_info = {}
+
+    async def json(self):
+        return self._data
+
+def _isolate(downloads, workdir: Path) -> None:
+    """Keeps state files out of the SAUS data folder and lets downloads reach 127.0.0.1."""
+    from saus import bandwidth, preflight
+    downloads.download_manager.journal.path = workdir / 'downloads_journal.json'
+    downloads.model_store.path = workdir / 'model_store.json'
+    preflight.size_cache.path = workdir / 'download_sizes.json'
+    downloads._validate_url = lambda url, allow_private=False: None
+    bandwidth.apply_settings({}) # No rate limits from the local settings
+
+def _scenarios(size_mb: int, segments: int) -> dict:
+    third = max(1, size_mb // 3)
+    return {
+        'single_stream': {'origin': {'ranges': 0}, 'segments': 1},
+        'segmented': {'origin': {}, 'segments': segments},
+        'latency_capped': {'origin': {'latency_ms': 80, 'rate_mb_s': 200}, 'segments': segments},
+        'resume_single': {'origin': {'drop_after_mb': third, 'drops': 2}, 'segments': 1},
+        'resume_segmented': {'origin': {'drop_after_mb': max(1, size_mb // (segments * 2)), 'drops': 2}, 'segments': segments},
+        'no_range_restart': {'origin': {'ranges': 0, 'drop_after_mb': third, 'drops': 1}, 'segments': 1},
+        'handler_generic': {'origin': {}, 'handler': True},
+    }
+
+async def _download_direct(downloads, url, target, segments, progress_count):
+    errors = []
+
+    def progress_sender(*args):
+        progress_count[0] += 1
+
+    ok = await downloads._download_worker(
+        url, {}, target, progress_sender, lambda *args: None, lambda filename, error: errors.append(error),
+        filename=FILE_NAME, max_retries=5, retry_sleep=0, segments=segments
+    )
+    return ok, errors[-1] if errors else None
+
+async def _download_via_handler(downloads, url, target):
+    response = await downloads.download_generic_handler(_JsonRequest({'url': url, 'targetPath': str(target)}))
+    body = json.loads(response.body)
+    if response.status != 200:
+        return False, body.get('error')
+    job = downloads.download_manager.get(body['job_id'])
+    while job.status not in ('completed', 'failed', 'cancelled'):
+        await asyncio.sleep(0.05)
+    return job.status == 'completed', job.error
+
+async def _run_scenario(name, scenario, downloads, session, base_url, workdir, size, counter):
+    query = {'run': name, **scenario['origin']}
+    url = f"{base_url}/files/{FILE_NAME}?" + '&'.join(f"{key}={value}" for key, value in query.items())
+    target = workdir / 'downloads' / name
+    target.mkdir(parents=True, exist_ok=True)
+    progress_count = [0]
+    events_before = dict(counter.events)
+
+    lags = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(_heartbeat(lags, stop))
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    if scenario.get('handler'):
+        ok, error = await _download_via_handler(downloads, url, target)
+    else:
+        ok, error = await _download_direct(downloads, url, target, scenario['segments'], progress_count)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    stop.set()
+    await beat
+
+    saved = target / FILE_NAME
+    correct = await asyncio.to_thread(verify_file, saved, size)
+    async with session.get(f"{base_url}/stats", params={'run': name}) as resp:
+        origin_stats = await resp.json()
+    for path in target.iterdir():
+        os.remove(path)
+
+    gb = size / 1024 ** 3
+    events = {event: count - events_before.get(event, 0) for event, count in counter.events.items()}
+    return {
+        'scenario': name,
+        'ok': bool(ok),
+        'error': error,
+        'seconds': round(elapsed, 3),
+        'mb_per_s': round(size / 1024 / 1024 / elapsed, 1),
+        'cpu_seconds': round(cpu, 3),
+        'cpu_seconds_per_gb': round(cpu / gb, 3),
+        'loop_lag_ms': {
+            'p50': round(_percentile(lags, 50) * 1000, 2),
+            'p99': round(_percentile(lags, 99) * 1000, 2),
+            'max': round(max(lags) * 1000, 2),
+        } if lags else None,
+        'file_correct': correct,
+        'origin_overhead_mb': round((origin_stats.get('bytes_sent', 0) - size) / 1024 / 1024, 1),
+        'progress_callbacks': progress_count[0],
+        'websocket_events': {event: count for event, count in events.items() if count},
+        'origin': origin_stats,
+        'origin_options': scenario['origin'],
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=2048)
+    parser.add_argument('--dir', default=None, help='work folder (default: temp/saus_benchmark in the ComfyUI folder)')
+    parser.add_argument('--scenarios', default='', help='comma-separated subset to run')
+    parser.add_argument('--output', default=None, help='write the JSON here instead of printing it')
+    args = parser.parse_args()
+
+    counter = _install_prompt_server()
+    from saus import downloads, http_client
+    from saus.constants import APP_VERSION, COMFYUI_DIRECTORY, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_SEGMENTS
+
+    workdir = Path(args.dir) if args.dir else COMFYUI_DIRECTORY / 'temp' / 'saus_benchmark'
+    (workdir / 'origin').mkdir(parents=True, exist_ok=True)
+    _isolate(downloads, workdir)
+    size = args.size_mb * 1024 * 1024
+    make_sparse_file(workdir / 'origin' / FILE_NAME, size)
+
+    scenarios = _scenarios(args.size_mb, DOWNLOAD_SEGMENTS)
+    selected = [name.strip() for name in args.scenarios.split(',') if name.strip()] or list(scenarios)
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)} (known: {', '.join(scenarios)})")
+
+    port = _free_port()
+    origin = multiprocessing.get_context('spawn').Process(
+        target=run_origin, args=(str(workdir / 'origin'), port), daemon=True
+    )
+    origin.start()
+    results = []
+    try:
+        await _wait_for_port(port)
+        session = http_client.get_session()
+        for name in selected:
+            results.append(await _run_scenario(
+                name, scenarios[name], downloads, session, f"http://127.0.0.1:{port}", workdir, size, counter
+            ))
+    finally:
+        origin.terminate()
+        origin.join()
+        await http_client.close_session()
+        os.remove(workdir / 'origin' / FILE_NAME)
+
+    report = {
+        'saus_version': APP_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'size_mb': args.size_mb,
+        'chunk_size': DOWNLOAD_CHUNK_SIZE,
+        'segments': DOWNLOAD_SEGMENTS,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding='utf-8')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""
+Event-loop latency while a large download is written to disk.
+
+Feeds DOWNLOAD_CHUNK_SIZE chunks through the download loop's write path and
+measures how late a 5 ms heartbeat task wakes up, once with the old blocking
+`f.write` and once with the write-behind ChunkWriter. Run it against the volume
+you care about (e.g. a RunPod network volume) with --dir; --write-delay-ms
+emulates a slow volume on a fast local disk.
+
+    python benchmarks/loop_latency.py --size-mb 2048 --dir /workspace/tmp
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from saus.constants import DOWNLOAD_CHUNK_SIZE
+from saus import file_writer
+from saus.file_writer import ChunkWriter
+
+HEARTBEAT = 0.005
+
+class _SlowFile:
+    """Wraps a file object and sleeps on every write to emulate a slow volume."""
+
+    def __init__(self, f, delay):
+        self._f = f
+        self._delay = delay
+
+    def write(self, data):
+        time.sleep(self._delay)
+        return self._f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+
+def _open(path, mode, delay):
+    f = open(path, mode)
+    return _SlowFile(f, delay) if delay else f
+
+async def _heartbeat(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT)
+        lags.append(time.perf_counter() - start - HEARTBEAT)
+
+async def _network(chunks):
+    chunk = os.urandom(DOWNLOAD_CHUNK_SIZE)
+    for _ in range(chunks):
+        await asyncio.sleep(0) # a socket read that is already buffered
+        yield chunk
+
+async def _blocking(path, chunks, delay):
+    with _open(path, 'wb', delay) as f:
+        async for chunk in _network(chunks):
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+
+async def _write_behind(path, chunks, delay):
+    if delay:
+        # Shadow the builtin inside the writer module so its thread gets the slow file.
+        file_writer.open = lambda p, m: _open(p, m, delay)
+    try:
+        async with ChunkWriter(path, 'wb') as writer:
+            async for chunk in _network(chunks):
+                await writer.write(chunk)
+    finally:
+        if delay:
+            del file_writer.open
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def _measure(name, writer, path, chunks, delay):
+    lags = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(_heartbeat(lags, stop))
+    start = time.perf_counter()
+    await writer(path, chunks, delay)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    os.remove(path)
+    return {
+        'mode': name,
+        'seconds': round(elapsed, 3),
+        'mb_per_s': round(chunks * DOWNLOAD_CHUNK_SIZE / 1024 / 1024 / elapsed, 1),
+        'loop_lag_ms': {
+            'p50': round(_percentile(lags, 50) * 1000, 2),
+            'p99': round(_percentile(lags, 99) * 1000, 2),
+            'max': round(max(lags) * 1000, 2),
+        },
+        'heartbeats': len(lags),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=1024)
+    parser.add_argument('--dir', default=tempfile.gettempdir())
+    parser.add_argument('--write-delay-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    chunks = max(1, args.size_mb * 1024 * 1024 // DOWNLOAD_CHUNK_SIZE)
+    path = Path(args.dir) / 'saus_loop_latency.bin'
+    delay = args.write_delay_ms / 1000
+    results = [
+        await _measure('blocking_write', _blocking, path, chunks, delay),
+        await _measure('write_behind', _write_behind, path, chunks, delay),
+    ]
+    print(json.dumps({'size_mb': args.size_mb, 'write_delay_ms': args.write_delay_ms, 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    asyncio.run(main())
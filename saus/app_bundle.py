@@ -0,0 +1,206 @@
+''' Installation of the private apps bundle '''
+import os
+import zlib
+import shutil
+import hashlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from .constants import SAUS_APPS_PATH, SAUSMSG, logger, APP_BUNDLE_WORKERS
+from .app_tree import app_tree
+
+EXCLUDED_ITEMS = ['.git', '.github', 'app_list.json', 'architectures.json', 'models_data.json']
+# Next to the app they belong to, so renames stay on one filesystem; hidden, so they are never loaded as apps.
+STAGING_PREFIX = '.staging-'
+BACKUP_PREFIX = '.replaced-'
+
+def app_locations(root: Path = SAUS_APPS_PATH) -> dict:
+    """
+    {directory name: path} of the directories under `root`, the shallowest
+    one for names found at several depths; the lookup find_destination_path
+    does, for all names in one walk.
+    """
+    locations = {}
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for d in dirnames:
+            path = Path(dirpath) / d
+            if d not in locations or len(path.parts) < len(locations[d].parts):
+                locations[d] = path
+    return locations
+
+def _link_or_copy(src, dst) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def _inside(path: Path, root: Path) -> bool:
+    try:
+        path.resolve().relative_to(root.resolve())
+        return True
+    except ValueError:
+        return False
+
+class BundleInstaller:
+    """
+    Installs the apps of a zip bundle, several at a time. Zip entries whose
+    CRC-32 and size match the manifest of the installed file are not even
+    decompressed. An app with changes is built in a staging directory next
+    to it, from hard links to its current files plus the changed entries,
+    and swapped in with two renames; when anything fails the staging copy
+    is dropped, so an app is served either as it was or fully updated.
+    """
+
+    def __init__(self, source: str = 'Private', root: Path = SAUS_APPS_PATH, tree=app_tree, workers: int = APP_BUNDLE_WORKERS):
+        self.source = source
+        self.root = root
+        self.tree = tree
+        self.workers = workers
+
+    def _apps(self, zip_ref: zipfile.ZipFile) -> dict:
+        """{app name: [(ZipInfo, path parts inside the app)]}; parts are empty for top-level files."""
+        names = zip_ref.namelist()
+        if not names:
+            return {}
+        root_dir = PurePosixPath(names[0]).parts[0]
+        apps = {}
+        for member in zip_ref.infolist():
+            if member.filename.startswith('__MACOSX'):
+                continue
+            try:
+                parts = PurePosixPath(member.filename).relative_to(root_dir).parts
+            except ValueError:
+                continue
+            if not parts or parts[0] in EXCLUDED_ITEMS or '..' in parts:
+                continue
+            apps.setdefault(parts[0], []).append((member, parts[1:]))
+        return apps
+
+    def _extract(self, zip_ref: zipfile.ZipFile, member: zipfile.ZipInfo, target: Path):
+        """Writes `member` to `target`; returns its (sha256, crc32). The CRC is checked while reading."""
+        if target.exists() or target.is_symlink():
+            target.unlink() # May be a hard link to the live file; never write through it
+        target.parent.mkdir(parents=True, exist_ok=True)
+        sha256 = hashlib.sha256()
+        crc32 = 0
+        with zip_ref.open(member) as src, open(target, 'wb') as dst:
+            while chunk := src.read(1024 * 1024):
+                sha256.update(chunk)
+                crc32 = zlib.crc32(chunk, crc32)
+                dst.write(chunk)
+        return sha256.hexdigest(), crc32
+
+    def _recover(self, app_dir: Path, stage: Path, backup: Path) -> None:
+        """Cleans up after an install that was interrupted by a crash."""
+        if backup.exists():
+            if app_dir.exists():
+                shutil.rmtree(backup, ignore_errors=True)
+            else:
+                os.replace(backup, app_dir)
+        if stage.exists():
+            shutil.rmtree(stage)
+
+    def _swap(self, stage: Path, app_dir: Path, backup: Path) -> None:
+        if not app_dir.exists():
+            os.replace(stage, app_dir)
+            return
+        os.replace(app_dir, backup)
+        try:
+            os.replace(stage, app_dir)
+        except OSError:
+            os.replace(backup, app_dir)
+            raise
+        shutil.rmtree(backup, ignore_errors=True)
+
+    def install_app(self, zip_ref: zipfile.ZipFile, name: str, members: list, app_dir: Path) -> None:
+        if not _inside(app_dir, self.root):
+            logger.warning(f"{SAUSMSG}: Skipped unsafe path in zip: {name}")
+            return
+        if any(not parts for _, parts in members):
+            # A file at the top of the bundle rather than an app directory
+            member = next(member for member, parts in members if not parts)
+            if not member.is_dir():
+                self.tree.write(app_dir, zip_ref.read(member), name, self.source)
+            return
+
+        files = {parts: member for member, parts in members if not member.is_dir()}
+        dirs = [parts for member, parts in members if member.is_dir()]
+        changed = [
+            parts for parts, member in files.items()
+            if not self.tree.unchanged(app_dir.joinpath(*parts), member.file_size, crc32=member.CRC)
+        ]
+        keep = {app_dir.joinpath(*parts) for parts in files}
+        stale = [path for path in self.tree.installed(app_dir, self.source) if path not in keep]
+        missing_dirs = [parts for parts in dirs if not app_dir.joinpath(*parts).is_dir()]
+        unchanged = [parts for parts in files if parts not in changed]
+        for parts in unchanged:
+            path = app_dir.joinpath(*parts)
+            if not self.tree.recorded(path, self.source):
+                self.tree.record(path, self.source, *self._hashes(path))
+        self.tree.count(name, 'unchanged', len(unchanged))
+        if not changed and not stale and not missing_dirs:
+            return
+
+        stage = app_dir.with_name(STAGING_PREFIX + app_dir.name)
+        backup = app_dir.with_name(BACKUP_PREFIX + app_dir.name)
+        self._recover(app_dir, stage, backup)
+        existed = {parts: app_dir.joinpath(*parts).exists() for parts in changed}
+        hashes = {}
+        try:
+            if app_dir.is_dir():
+                shutil.copytree(app_dir, stage, symlinks=True, copy_function=_link_or_copy)
+            else:
+                stage.mkdir(parents=True)
+            for parts in dirs:
+                stage.joinpath(*parts).mkdir(parents=True, exist_ok=True)
+            for parts in changed:
+                hashes[parts] = self._extract(zip_ref, files[parts], stage.joinpath(*parts))
+            for path in stale:
+                staged = stage / path.relative_to(app_dir)
+                if staged.is_file():
+                    staged.unlink()
+                    directory = staged.parent
+                    while directory != stage and not any(directory.iterdir()):
+                        directory.rmdir()
+                        directory = directory.parent
+            self._swap(stage, app_dir, backup)
+        except Exception:
+            shutil.rmtree(stage, ignore_errors=True)
+            raise
+
+        for parts, (sha256, crc32) in hashes.items():
+            self.tree.record(app_dir.joinpath(*parts), self.source, sha256, crc32)
+            self.tree.count(name, 'updated' if existed[parts] else 'added')
+        for path in stale:
+            self.tree.forget(path)
+            self.tree.count(name, 'deleted')
+
+    def _hashes(self, path: Path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        return hashlib.sha256(data).hexdigest(), zlib.crc32(data)
+
+    def install(self, zip_path) -> None:
+        """Installs every app in the bundle at `zip_path`; raises after the others are installed if any failed."""
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            apps = self._apps(zip_ref)
+            locations = app_locations(self.root)
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {
+                    name: pool.submit(self.install_app, zip_ref, name, members, locations.get(name, self.root / name))
+                    for name, members in apps.items()
+                }
+            failed = []
+            for name, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"{SAUSMSG}: Failed to install app {name}, keeping the installed version: {e}")
+                    failed.append(name)
+        self.tree.save()
+        if failed:
+            raise Exception(f"Failed to install apps: {', '.join(failed)}")
+
+bundle_installer = BundleInstaller()
@@ -7,7 +7,7 @@ from .constants import (
     SAUS_APPS_PATH, CORE_PATH, BUILDER_PATH, SAUS_BROWSER_PATH, MODEL_MANAGER_PATH, APP_CONFIGS, SAUSMSG, APPS_CONFIG_FILE, logger, FILE_MANAGER_PATH, ARC_MANAGER_PATH
 )
 from .route_manager import RouteManager
-from .downloader import sync_apps_handler
+from .app_sync import sync_apps_handler, sync_status_handler
 from .file_system import (
     directory_listing_handler, rename_file_handler, delete_file_handler, upload_file_handler,
     download_file_handler, upload_chunk_handler, list_input_files_handler,
@@ -22,8 +22,13 @@ from .management import (
 )
 from .downloads import (
     download_generic_handler, download_model_handler, check_model_status_handler,
-    delete_model_handler
+    delete_model_handler, list_downloads_handler, get_download_handler,
+    pause_download_handler, resume_download_handler, cancel_download_handler,
+    prioritize_download_handler, provision_architecture_handler, get_download_group_handler,
+    model_sizes_handler, model_statuses_handler, model_cache_report_handler, pin_model_handler,
+    model_tiers_handler, model_dedup_handler, model_integrity_handler
 )
+from .model_mirror import MIRROR_ROUTE, mirror_file_handler
 from .system import (
     saus_version_handler, set_model_preview_handler, clear_model_preview_handler,
     list_model_previews_handler, get_model_preview_handler, get_settings_handler,
@@ -32,6 +37,9 @@ from .system import (
 from .arc_manager_handler import get_all_arc_data_handler, save_all_arc_data_handler, get_available_apps_handler
 
 class AppManager:
+    # url -> directory of apps installed after startup, see register_new_apps.
+    synced_apps = {}
+
     @staticmethod
     def setup_app_routes(app: web.Application) -> None:
         try:
@@ -54,7 +62,7 @@ class AppManager:
                 # logger.warning(f"{SAUSMSG}: Config file not found in {app_dir}")
                 continue
                 
-        for conf_file in SAUS_APPS_PATH.rglob(APPS_CONFIG_FILE):
+        for conf_file in AppManager._config_files():
             app_dir = conf_file.parent
             conf = AppManager._load_config(conf_file)
             SAUS_url = conf.get('url')
@@ -62,18 +70,63 @@ class AppManager:
                 logger.warning(f"{SAUSMSG}: Missing 'url' in config for {app_dir}")
                 continue
             
-            try:
-                rel_path = app_dir.relative_to(SAUS_APPS_PATH)
-                if len(rel_path.parts) > 1:
-                    conf['app_type'] = rel_path.parts[0]
-                else:
-                    conf['app_type'] = 'open'
-            except Exception:
-                conf['app_type'] = 'open'
-                
+            conf['app_type'] = AppManager._app_type(app_dir)
             app.add_routes(RouteManager.create_routes(f"saus/{SAUS_url}", app_dir))
             APP_CONFIGS.append(conf)
 
+    @staticmethod
+    def _config_files():
+        """Config files of the installed apps; hidden directories (apps being installed) are skipped."""
+        for conf_file in SAUS_APPS_PATH.rglob(APPS_CONFIG_FILE):
+            if not any(part.startswith('.') for part in conf_file.relative_to(SAUS_APPS_PATH).parts):
+                yield conf_file
+
+    @staticmethod
+    def _app_type(app_dir: Path) -> str:
+        try:
+            rel_path = app_dir.relative_to(SAUS_APPS_PATH)
+            if len(rel_path.parts) > 1:
+                return rel_path.parts[0]
+        except Exception:
+            pass
+        return 'open'
+
+    @staticmethod
+    def register_new_apps() -> list:
+        """
+        Lists apps that appeared on disk after the routes were set up (by a
+        background sync) in APP_CONFIGS, and serves them through
+        synced_apps_middleware, as the router cannot take routes any more.
+        Returns their urls.
+        """
+        known = {conf.get('url') for conf in APP_CONFIGS}
+        new_apps = []
+        for conf_file in AppManager._config_files():
+            app_dir = conf_file.parent
+            conf = AppManager._load_config(conf_file)
+            SAUS_url = conf.get('url')
+            if not SAUS_url or SAUS_url in known or '/' in SAUS_url:
+                continue
+            conf['app_type'] = AppManager._app_type(app_dir)
+            AppManager.synced_apps[SAUS_url] = app_dir
+            APP_CONFIGS.append(conf)
+            known.add(SAUS_url)
+            new_apps.append(SAUS_url)
+        return new_apps
+
+    @staticmethod
+    @web.middleware
+    async def synced_apps_middleware(request: web.Request, handler):
+        """Serves /saus/<url> and its files for apps registered by register_new_apps."""
+        if AppManager.synced_apps and request.method in ('GET', 'HEAD') and request.path.startswith('/saus/'):
+            SAUS_url, _, rel_path = request.path[len('/saus/'):].partition('/')
+            app_dir = AppManager.synced_apps.get(SAUS_url)
+            if app_dir is not None:
+                if not rel_path:
+                    return RouteManager.serve_index(f"saus/{SAUS_url}", app_dir)
+                return RouteManager.serve_file(app_dir, rel_path)
+        return await handler(request)
+
     @staticmethod
     def _setup_core_routes(app: web.Application) -> None:
         if CORE_PATH.is_dir():
@@ -111,9 +164,27 @@ class AppManager:
             (f'/saus/api/model-status', 'GET', check_model_status_handler),
             (f'/saus/api/delete-model', 'DELETE', delete_model_handler),
             (f'/saus/api/download-model', 'POST', download_model_handler),
+            (f'/saus/api/downloads', 'GET', list_downloads_handler),
+            (f'/saus/api/downloads/{{job_id}}', 'GET', get_download_handler),
+            (f'/saus/api/downloads/{{job_id}}/pause', 'POST', pause_download_handler),
+            (f'/saus/api/downloads/{{job_id}}/resume', 'POST', resume_download_handler),
+            (f'/saus/api/downloads/{{job_id}}/cancel', 'POST', cancel_download_handler),
+            (f'/saus/api/downloads/{{job_id}}/priority', 'POST', prioritize_download_handler),
+            (f'/saus/api/download-groups/{{group_id}}', 'GET', get_download_group_handler),
+            (f'/saus/api/provision', 'POST', provision_architecture_handler),
+            (f'/saus/api/model-sizes', 'GET', model_sizes_handler),
+            (f'/saus/api/model-statuses', 'GET', model_statuses_handler),
+            (f'/saus/api/model-cache', 'GET', model_cache_report_handler),
+            (f'/saus/api/model-cache/pin', 'POST', pin_model_handler),
+            (f'/saus/api/model-tiers', 'GET', model_tiers_handler),
+            (f'/saus/api/model-dedup', 'GET', model_dedup_handler),
+            (f'/saus/api/model-dedup', 'POST', model_dedup_handler),
+            (f'/saus/api/model-integrity', 'GET', model_integrity_handler),
+            (f'{MIRROR_ROUTE}/{{path:.+}}', 'GET', mirror_file_handler),
             (f'/saus/api/settings', 'GET', get_settings_handler),
             (f'/saus/api/settings', 'POST', save_settings_handler),
             (f'/saus/api/sync-apps', 'POST', sync_apps_handler),
+            (f'/saus/api/sync-status', 'GET', sync_status_handler),
             (f'/saus/api/restart', 'POST', restart_server_handler),
             (f'/saus/api/files/input', 'GET', list_input_files_handler),
             (f'/saus/api/logs', 'GET', get_logs_handler),          
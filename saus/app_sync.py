@@ -0,0 +1,130 @@
+''' Background synchronisation of the apps and data files with their repositories '''
+import time
+import asyncio
+from aiohttp import web
+
+from .constants import SAUSMSG, logger
+from .downloader import sync_stages
+from .app_tree import app_tree
+from .sync_pipeline import SyncPipeline
+
+class AppSync:
+    """
+    Runs the sync pipeline (downloader.sync_stages) in the background, so
+    the server starts, and keeps serving, from the apps already on disk
+    while the repositories are fetched. Only one sync runs at a time; a
+    request made during one waits for it. When the sync ends, the
+    `synced_listeners` register the apps it brought in, and an 'apps_synced'
+    event tells open pages about them. The status includes each stage's
+    outcome and duration, and per app the files added, updated and deleted.
+
+    The thread of a stage that timed out cannot be stopped; the manifest is
+    saved once it ends, and the next sync waits for it before starting.
+    """
+
+    def __init__(self):
+        self.send = None # (event, data) broadcast, PromptServer.send_sync once the server is up
+        # Called with no arguments after every sync; each returns the urls of the apps it registered.
+        self.synced_listeners = []
+        self._task = None
+        self._settling = None # Waits for the threads of timed out stages of the last sync
+        self.status = {
+            'state': 'idle', 'started_at': None, 'finished_at': None, 'duration': None,
+            'error': None, 'new_apps': [], 'changes': {}, 'stages': {},
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _notify(self) -> None:
+        if self.send:
+            try:
+                self.send('apps_synced', dict(self.status))
+            except Exception as e:
+                logger.error(f"{SAUSMSG}: Failed to send app sync status: {e}")
+
+    def _register_new_apps(self) -> list:
+        new_apps = []
+        for listener in self.synced_listeners:
+            try:
+                new_apps.extend(listener() or [])
+            except Exception as e:
+                logger.error(f"{SAUSMSG}: App sync listener failed: {e}")
+        return new_apps
+
+    async def _settle(self, unfinished: dict) -> None:
+        for name, work in unfinished.items():
+            try:
+                await work
+                logger.info(f"{SAUSMSG}: Timed out sync stage {name} finished")
+            except Exception as e:
+                logger.error(f"{SAUSMSG}: Timed out sync stage {name} failed: {e}")
+        await asyncio.to_thread(app_tree.save)
+
+    async def _sync(self) -> dict:
+        if self._settling is not None and not self._settling.done():
+            logger.info(f"{SAUSMSG}: Waiting for the timed out stages of the previous app sync")
+            await self._settling
+        started = time.monotonic()
+        self.status = {
+            'state': 'running', 'started_at': time.time(), 'finished_at': None, 'duration': None,
+            'error': None, 'new_apps': [], 'changes': {}, 'stages': {},
+        }
+        self._notify()
+        app_tree.begin()
+        unfinished = {}
+        try:
+            pipeline = SyncPipeline(sync_stages())
+            stages = await pipeline.run()
+            unfinished = pipeline.unfinished
+            failed = {name: result for name, result in stages.items() if result['status'] in ('failed', 'timeout')}
+            self.status.update(state='failed' if failed else 'done', stages=stages)
+            if failed:
+                self.status['error'] = '; '.join(f"{name}: {result['error']}" for name, result in failed.items())
+        except Exception as e:
+            logger.error(f"{SAUSMSG}: Error syncing apps: {e}")
+            self.status.update(state='failed', error=str(e))
+        finally:
+            if unfinished:
+                # Still writing to the apps and the manifest; saved once they are done.
+                self._settling = asyncio.ensure_future(self._settle(unfinished))
+            else:
+                await asyncio.to_thread(app_tree.save)
+        app_tree.log_summary()
+
+        # Apps installed by the stages that succeeded are registered even when others failed.
+        self.status['changes'] = app_tree.summary
+        self.status['new_apps'] = self._register_new_apps()
+        self.status['finished_at'] = time.time()
+        self.status['duration'] = round(time.monotonic() - started, 3)
+        if self.status['new_apps']:
+            logger.info(f"{SAUSMSG}: Registered {len(self.status['new_apps'])} new apps: {', '.join(self.status['new_apps'])}")
+        timings = ', '.join(f"{name} {result['status']} {result['duration']:.1f}s" for name, result in self.status['stages'].items())
+        logger.info(f"{SAUSMSG}: App sync finished ({self.status['state']}) in {self.status['duration']:.1f}s: {timings}")
+        self._notify()
+        return dict(self.status)
+
+    def start(self) -> asyncio.Task:
+        """Starts a sync unless one is running; returns the task of the current one."""
+        if not self.running:
+            self._task = asyncio.create_task(self._sync())
+        return self._task
+
+app_sync = AppSync()
+
+async def on_startup(app) -> None:
+    app_sync.start()
+
+async def sync_apps_handler(request: web.Request) -> web.Response:
+    status = await asyncio.shield(app_sync.start())
+    response = {
+        "new_apps": status['new_apps'], "changes": status['changes'],
+        "stages": status['stages'], "duration": status['duration'],
+    }
+    if status['state'] == 'done':
+        return web.json_response({"status": "success", "message": "Apps synced successfully.", **response})
+    return web.json_response({"status": "error", "message": status['error'], **response}, status=500)
+
+async def sync_status_handler(request: web.Request) -> web.Response:
+    return web.json_response({'running': app_sync.running, **app_sync.status})
@@ -0,0 +1,171 @@
+''' Change-aware installation of app files into the apps directory '''
+import os
+import json
+import zlib
+import hashlib
+import threading
+from pathlib import Path
+
+from .constants import DATA_DIR, SAUS_APPS_PATH, SAUSMSG, logger
+from .helpers import atomic_write_json
+
+MANIFEST_FILE = DATA_DIR / "app_tree.json"
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class AppTree:
+    """
+    Installs app files only when their content changed. A manifest keeps the
+    size, mtime and SHA-256 of every file a sync wrote, so an unchanged file
+    is recognised from its stat alone and is neither rewritten (which churns
+    the disk and resets the Last-Modified browsers cache on) nor re-read.
+
+    Every file is recorded with the source that installed it ('Open',
+    'Private'); `prune` deletes the files a source installed and no longer
+    ships. Files a sync did not install, such as local edits in new files,
+    are never deleted.
+
+    `summary` counts, per app, the files added, updated, deleted and left
+    unchanged since `begin`.
+    """
+
+    def __init__(self, root: Path = SAUS_APPS_PATH, path: Path = MANIFEST_FILE):
+        self.root = root
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None # relative path -> {'size', 'mtime', 'sha256', 'crc32', 'source'}
+        self._dirty = False
+        self.summary = {}
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            self._entries = {}
+            if self.path.exists():
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._entries = json.load(f)
+                except Exception as e:
+                    logger.warning(f"{SAUSMSG}: Ignoring unreadable app manifest {self.path}: {e}")
+        return self._entries
+
+    def _key(self, path: Path) -> str:
+        return Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+
+    def count(self, app: str, change: str, n: int = 1) -> None:
+        with self._lock:
+            counts = self.summary.setdefault(app, {'added': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0})
+            counts[change] += n
+
+    def begin(self) -> None:
+        self.summary = {}
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._load())
+            self._dirty = False
+        atomic_write_json(self.path, data)
+
+    def unchanged(self, path: Path, size: int, sha256: str = None, crc32: int = None) -> bool:
+        """
+        Whether `path` already holds the `size` bytes with the given SHA-256
+        (or CRC-32, as zip files list it). A file whose stat matches its
+        manifest entry is not read.
+        """
+        entry = self._load().get(self._key(path))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != size:
+            return False
+        if entry and (entry['size'], entry['mtime']) == (stat.st_size, stat.st_mtime):
+            if crc32 is not None and 'crc32' in entry:
+                return entry['crc32'] == crc32
+            if sha256 is not None:
+                return entry['sha256'] == sha256
+        # Not written by a sync, or modified since: compare the content itself.
+        with open(path, 'rb') as f:
+            data = f.read()
+        return (crc32 is None or zlib.crc32(data) == crc32) and (sha256 is None or _sha256(data) == sha256)
+
+    def record(self, path: Path, source: str, sha256: str, crc32: int) -> None:
+        """Records that `source` installed the file at `path`, with the given hashes of its content."""
+        stat = os.stat(path)
+        with self._lock:
+            self._load()[self._key(path)] = {
+                'size': stat.st_size, 'mtime': stat.st_mtime,
+                'sha256': sha256, 'crc32': crc32, 'source': source
+            }
+            self._dirty = True
+
+    def recorded(self, path: Path, source: str) -> bool:
+        with self._lock:
+            entry = self._load().get(self._key(path))
+        return bool(entry) and entry['source'] == source
+
+    def forget(self, path: Path) -> None:
+        with self._lock:
+            if self._load().pop(self._key(path), None) is not None:
+                self._dirty = True
+
+    def installed(self, app_dir: Path, source: str) -> set:
+        """Paths of the files `source` installed under `app_dir`."""
+        prefix = self._key(app_dir) + '/'
+        with self._lock:
+            return {
+                self.root / key for key, entry in self._load().items()
+                if key.startswith(prefix) and entry['source'] == source
+            }
+
+    def write(self, path: Path, data: bytes, app: str, source: str) -> bool:
+        """Installs `data` at `path` unless it already holds it; True when the file was written."""
+        existed = path.exists()
+        sha256 = _sha256(data)
+        if existed and self.unchanged(path, len(data), sha256=sha256):
+            if not self.recorded(path, source):
+                self.record(path, source, sha256, zlib.crc32(data))
+            self.count(app, 'unchanged')
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.record(path, source, sha256, zlib.crc32(data))
+        self.count(app, 'updated' if existed else 'added')
+        return True
+
+    def delete(self, path: Path, app: str, stop: Path = None) -> bool:
+        """
+        Removes the file at `path` and the directories it leaves empty, up
+        to and including `stop`. True when a file was deleted.
+        """
+        self.forget(path)
+        if not path.is_file():
+            return False
+        path.unlink()
+        directory = path.parent
+        while stop is not None and directory != stop.parent and directory.is_dir() and not any(directory.iterdir()):
+            directory.rmdir()
+            directory = directory.parent
+        self.count(app, 'deleted')
+        return True
+
+    def prune(self, app_dir: Path, app: str, source: str, keep: set) -> int:
+        """Deletes the files `source` installed under `app_dir` that are not in `keep` (paths)."""
+        keep = {self._key(path) for path in keep}
+        stale = [path for path in self.installed(app_dir, source) if self._key(path) not in keep]
+        return sum(self.delete(path, app, stop=app_dir) for path in stale)
+
+    def log_summary(self) -> None:
+        for app, counts in sorted(self.summary.items()):
+            if counts['added'] or counts['updated'] or counts['deleted']:
+                logger.info(
+                    f"{SAUSMSG}: {app}: {counts['added']} added, {counts['updated']} updated, "
+                    f"{counts['deleted']} deleted, {counts['unchanged']} unchanged"
+                )
+
+app_tree = AppTree()
@@ -0,0 +1,122 @@
+''' Token-bucket bandwidth shaping for background downloads '''
+import time
+import asyncio
+from aiohttp import web
+
+from .constants import (
+    SAUSMSG, logger, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_INTERACTIVE_RATE_LIMIT, DOWNLOAD_INTERACTIVE_GRACE
+)
+
+MB = 1024 * 1024
+
+# Requests that do not count as interactive UI activity.
+_BACKGROUND_PATHS = {'/ws', '/saus/api/download', '/saus/api/download-model', '/saus/api/model-status', '/saus/api/model-statuses', '/saus/api/sync-status'}
+_BACKGROUND_PREFIXES = ('/saus/api/downloads', '/saus/api/download-groups', '/saus/api/mirror/')
+
+class TokenBucket:
+    """
+    Allows `rate` bytes per second with bursts up to one second of traffic.
+    Consumers take tokens first and sleep off any debt afterwards, so several
+    concurrent consumers share the rate fairly. A rate of 0 means unlimited.
+    """
+
+    def __init__(self, rate: float = 0):
+        self.rate = 0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float) -> None:
+        rate = max(0.0, float(rate or 0))
+        if rate != self.rate:
+            self._refill()
+            self.rate = rate
+            self.tokens = min(self.tokens, self.capacity)
+
+    @property
+    def capacity(self) -> float:
+        return max(self.rate, DOWNLOAD_CHUNK_SIZE)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def consume(self, amount: int) -> None:
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens -= amount
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+class _Limits:
+    def __init__(self):
+        self.global_rate = 0 # bytes/s, 0 = unlimited
+        self.job_rate = 0
+        self.interactive_priority = False
+        self.interactive_rate = DOWNLOAD_INTERACTIVE_RATE_LIMIT * MB
+        self.last_ui_activity = 0.0
+        self.ui_requests_in_flight = 0
+
+limits = _Limits()
+global_bucket = TokenBucket()
+
+def _mb_per_s(settings: dict, key: str, default: float = 0) -> float:
+    try:
+        return max(0.0, float(settings.get(key) or default)) * MB
+    except (TypeError, ValueError):
+        logger.warning(f"{SAUSMSG}: Ignoring invalid value for setting '{key}': {settings.get(key)}")
+        return default * MB
+
+def apply_settings(settings: dict) -> None:
+    """Applies the download_* rate settings (MB/s, 0 = unlimited). Takes effect on running downloads."""
+    limits.global_rate = _mb_per_s(settings, 'download_rate_limit')
+    limits.job_rate = _mb_per_s(settings, 'download_job_rate_limit')
+    limits.interactive_priority = str(settings.get('download_interactive_priority', False)).lower() in ('1', 'true', 'yes', 'on')
+    limits.interactive_rate = _mb_per_s(settings, 'download_interactive_rate_limit', DOWNLOAD_INTERACTIVE_RATE_LIMIT)
+
+def prompt_running() -> bool:
+    try:
+        from server import PromptServer
+        return PromptServer.instance.prompt_queue.get_tasks_remaining() > 0
+    except Exception:
+        return False
+
+def interactive_busy() -> bool:
+    if limits.ui_requests_in_flight > 0:
+        return True
+    if time.monotonic() - limits.last_ui_activity < DOWNLOAD_INTERACTIVE_GRACE:
+        return True
+    return prompt_running()
+
+def effective_global_rate() -> float:
+    rate = limits.global_rate
+    if limits.interactive_priority and limits.interactive_rate > 0 and interactive_busy():
+        rate = min(rate, limits.interactive_rate) if rate > 0 else limits.interactive_rate
+    return rate
+
+class JobThrottle:
+    """Per-job bucket chained with the global one; one instance per download."""
+
+    def __init__(self):
+        self.bucket = TokenBucket(limits.job_rate)
+
+    async def consume(self, amount: int) -> None:
+        self.bucket.set_rate(limits.job_rate)
+        await self.bucket.consume(amount)
+        global_bucket.set_rate(effective_global_rate())
+        await global_bucket.consume(amount)
+
+@web.middleware
+async def ui_activity_middleware(request, handler):
+    """Counts interactive requests so background downloads can back off while they are served."""
+    if request.path in _BACKGROUND_PATHS or request.path.startswith(_BACKGROUND_PREFIXES):
+        return await handler(request)
+    limits.ui_requests_in_flight += 1
+    try:
+        return await handler(request)
+    finally:
+        limits.ui_requests_in_flight -= 1
+        limits.last_ui_activity = time.monotonic()
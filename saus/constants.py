@@ -57,6 +57,51 @@ PREVIEWS_IMAGES_DIR = DATA_DIR / "model_previews"
 FILE_REGISTRY_DIR = DATA_DIR / "file_registry"
 FILE_IMAGES_DIR = DATA_DIR / "file_previews"
 
+# Model/file downloads
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_SEGMENTS = 4 # Parallel byte ranges per file when the server supports Range requests
+DOWNLOAD_SEGMENT_MIN_SIZE = 256 * 1024 * 1024 # Smaller files are fetched over a single stream
+DOWNLOAD_MAX_CONCURRENT = 3 # Transfers running at the same time, all hosts together
+DOWNLOAD_MAX_PER_HOST = 2
+DOWNLOAD_HISTORY_LIMIT = 200 # Finished jobs kept queryable through /saus/api/downloads
+DOWNLOAD_WRITE_QUEUE_SIZE = 16 # Chunks buffered between the network reader and the disk writer thread
+DOWNLOAD_LOCK_HEARTBEAT = 10 # seconds between touches of a held <file>.lock
+DOWNLOAD_LOCK_STALE_AFTER = 60 # a lock not touched for this long belongs to a dead process
+DOWNLOAD_LOCK_POLL_INTERVAL = 2
+DOWNLOAD_INTERACTIVE_RATE_LIMIT = 5 # MB/s for all downloads together while prompts run or the UI is busy
+DOWNLOAD_INTERACTIVE_GRACE = 2 # seconds after the last UI request that still count as busy
+DOWNLOAD_PROGRESS_INTERVAL = 1.0 # seconds between batched 'downloads_progress' WebSocket messages
+DOWNLOAD_JOURNAL_INTERVAL = 5 # seconds between journal writes caused by progress alone
+DOWNLOAD_SPACE_MARGIN = 512 * 1024 * 1024 # free space kept on the target filesystem beyond what downloads need
+DOWNLOAD_SIZE_CACHE_TTL = 7 * 24 * 3600 # seconds a probed remote file size stays valid
+DOWNLOAD_SIZE_FAILURE_TTL = 3600 # seconds before a URL whose size could not be probed is probed again
+DOWNLOAD_PROBE_TIMEOUT = 20
+DOWNLOAD_PROBE_CONCURRENCY = 8
+MODEL_INDEX_REFRESH_INTERVAL = 2 # seconds an in-memory models directory index is trusted before a rescan
+MODEL_CACHE_ACTIVE_APP_WINDOW = 6 * 3600 # models of apps opened this recently are never evicted
+MODEL_CACHE_FLUSH_INTERVAL = 60 # seconds between writes of recorded model usage
+MODEL_DEDUP_MIN_SIZE = 16 * 1024 * 1024 # smaller files are left alone by the duplicate scan
+MODEL_SCAN_WORKERS = 2 # threads hashing model files for the integrity scanner
+MODEL_SCAN_CHUNK_SIZE = 64 * 1024 * 1024 # bytes of a memory-mapped model file hashed at a time
+MODEL_SCAN_INTERVAL = 3600 # seconds between integrity passes over the models directory
+MODEL_SCAN_PAUSE_POLL = 5 # seconds between checks whether prompts are still running
+MODEL_SCAN_CHECKPOINT_INTERVAL = 10 # seconds between writes of integrity scan progress
+MIRROR_CONNECT_TIMEOUT = 5 # seconds to reach the mirror before falling back to the original URL
+APP_SYNC_STAGE_TIMEOUT = 360 # seconds a stage of an app sync may take before it is reported as timed out
+APP_SYNC_RETRIES = 2 # extra attempts of the network stages of an app sync
+APP_SYNC_RETRY_DELAY = 2 # seconds before the first retry of a sync stage, growing with each attempt
+APP_SYNC_GIT_TIMEOUT = 300 # seconds a git clone of an apps repository may take
+APP_SYNC_HTTP_TIMEOUT = 30 # seconds without data from the gatekeeper before a private apps request fails
+APP_BUNDLE_WORKERS = 4 # apps of the private apps bundle installed in parallel
+
+# Shared outbound HTTP session (defaults, overridable from settings.json)
+HTTP_POOL_LIMIT = 64
+HTTP_POOL_LIMIT_PER_HOST = 8
+HTTP_DNS_CACHE_TTL = 300
+HTTP_KEEPALIVE_TIMEOUT = 60
+HTTP_CONNECT_TIMEOUT = 60
+HTTP_READ_TIMEOUT = 300
+
 
 OPEN_APPS_ORIGIN = 'https://github.com/dsigmabcn/SAUS_open_WFs' #OPEN REPOS
 GOLD_BETA_APPS_ORIGIN = 'https://github.com/dsigmabcn/SAUS_private_WFs.git'
@@ -0,0 +1,48 @@
+''' Crash-safe journal of queued and active downloads '''
+import json
+import asyncio
+
+from .constants import DATA_DIR, SAUSMSG, logger
+from .helpers import atomic_write_json
+
+JOURNAL_FILE = DATA_DIR / "downloads_journal.json"
+
+class DownloadJournal:
+    """
+    Keeps the unfinished downloads in a JSON file under DATA_DIR so they can be
+    resumed after a restart, preemption or crash. Writes are atomic (temp file
+    plus os.replace), happen on a worker thread and are coalesced: when several
+    snapshots arrive while one is being written, only the newest is written next.
+    Entries never contain credentials, only the token source to look them up.
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self._pending = None
+        self._task = None
+
+    def load(self) -> list:
+        if not self.path.exists():
+            return []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('jobs', [])
+        except Exception as e:
+            logger.error(f"{SAUSMSG}: Could not read download journal {self.path}: {e}")
+            return []
+
+    def _write(self, entries: list) -> None:
+        atomic_write_json(self.path, {'jobs': entries}, indent=2, fsync=True)
+
+    def save(self, entries: list) -> None:
+        self._pending = entries
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self._pending is not None:
+            entries, self._pending = self._pending, None
+            try:
+                await asyncio.to_thread(self._write, entries)
+            except Exception as e:
+                logger.error(f"{SAUSMSG}: Could not write download journal: {e}")
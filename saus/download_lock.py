@@ -0,0 +1,118 @@
+''' Cross-process coordination of downloads into a shared models directory '''
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+from pathlib import Path
+
+from .constants import (
+    logger, DOWNLOAD_LOCK_HEARTBEAT, DOWNLOAD_LOCK_STALE_AFTER, DOWNLOAD_LOCK_POLL_INTERVAL
+)
+
+def part_path(save_path: Path) -> Path:
+    """Temporary file a download is written to before it is renamed into place."""
+    return save_path.with_name(save_path.name + '.part')
+
+def lock_path(save_path: Path) -> Path:
+    return save_path.with_name(save_path.name + '.lock')
+
+class DownloadLock:
+    """
+    Lock file next to the destination, created with O_EXCL so only one process
+    (several ComfyUI instances can share MODELS_DIRECTORY) downloads a given
+    file. The holder touches the lock every DOWNLOAD_LOCK_HEARTBEAT seconds; a
+    lock that has not been touched for DOWNLOAD_LOCK_STALE_AFTER seconds belongs
+    to a dead process and is broken by the next process that wants the file.
+    """
+
+    def __init__(self, save_path: Path):
+        self.save_path = Path(save_path)
+        self.path = lock_path(self.save_path)
+        self.token = uuid.uuid4().hex
+        self._heartbeat_task = None
+
+    def _owner(self, path=None):
+        try:
+            with open(path or self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('token')
+        except Exception:
+            return None
+
+    def _is_stale(self) -> bool:
+        try:
+            return time.time() - os.path.getmtime(self.path) > DOWNLOAD_LOCK_STALE_AFTER
+        except OSError:
+            return False
+
+    def _break_stale(self) -> None:
+        """Moves a stale lock aside under a unique name so only one breaker wins."""
+        aside = self.path.with_name(f"{self.path.name}.{self.token}.stale")
+        try:
+            os.rename(self.path, aside)
+        except OSError:
+            return
+        if time.time() - os.path.getmtime(aside) > DOWNLOAD_LOCK_STALE_AFTER:
+            logger.warning(f"[Downloader] Broke stale download lock {self.path} held by {self._owner(aside)}")
+            os.remove(aside)
+        elif not self.path.exists():
+            # Lost a race and moved a live lock; put it back.
+            os.rename(aside, self.path)
+
+    def try_acquire(self) -> bool:
+        """Blocking; call via asyncio.to_thread."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._is_stale():
+                    self._break_stale()
+                    continue
+                return False
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'token': self.token,
+                    'pid': os.getpid(),
+                    'host': socket.gethostname(),
+                    'acquired_at': time.time(),
+                }, f)
+            return True
+        return False
+
+    async def acquire(self, poll=DOWNLOAD_LOCK_POLL_INTERVAL) -> bool:
+        """
+        Waits until this process holds the lock (True), or until another process
+        released it after putting the finished file in place (False).
+        """
+        waiting_logged = False
+        while True:
+            if await asyncio.to_thread(self.try_acquire):
+                self._heartbeat_task = asyncio.create_task(self._heartbeat())
+                return True
+            if not waiting_logged:
+                logger.info(f"[Downloader] {self.save_path.name} is being downloaded by another process, waiting...")
+                waiting_logged = True
+            await asyncio.sleep(poll)
+            if self.save_path.exists() and not self.path.exists():
+                return False
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(DOWNLOAD_LOCK_HEARTBEAT)
+            try:
+                await asyncio.to_thread(os.utime, self.path)
+            except OSError as e:
+                logger.warning(f"[Downloader] Lost download lock {self.path}: {e}")
+                return
+
+    async def release(self) -> None:
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        try:
+            if self._owner() == self.token:
+                os.remove(self.path)
+        except OSError as e:
+            logger.warning(f"[Downloader] Could not remove download lock {self.path}: {e}")
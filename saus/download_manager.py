@@ -0,0 +1,454 @@
+''' Queue and scheduler for background downloads '''
+import os
+import time
+import uuid
+import asyncio
+from pathlib import Path
+from urllib.parse import urlparse
+
+from .constants import (
+    logger, DOWNLOAD_MAX_CONCURRENT, DOWNLOAD_MAX_PER_HOST, DOWNLOAD_HISTORY_LIMIT,
+    DOWNLOAD_JOURNAL_INTERVAL
+)
+from .download_lock import part_path, lock_path
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+ACTIVE_STATES = ('queued', 'running', 'paused')
+FINISHED_STATES = ('completed', 'failed', 'cancelled')
+
+def parse_priority(value) -> int:
+    if value is None:
+        return PRIORITIES['normal']
+    if isinstance(value, str) and value.lower() in PRIORITIES:
+        return PRIORITIES[value.lower()]
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid priority: {value}")
+
+class DownloadJob:
+    def __init__(self, url, headers, target_path, filename=None, priority=None, kind='file', worker_options=None, meta=None, token_source=None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.host = (urlparse(url).hostname or '').lower()
+        self.headers = headers or {}
+        self.target_path = str(target_path)
+        self.filename = filename
+        # Identify the transfer for single-flight: the resolved destination once
+        # the filename is known, otherwise the URL plus the target folder.
+        self.key = self._destination_key(filename) if filename else f"{url}|{Path(target_path).resolve()}"
+        self.keys = {self.key}
+        self.priority = parse_priority(priority)
+        self.kind = kind
+        self.worker_options = worker_options or {}
+        self.meta = meta or {}
+        # Where the Authorization header came from ('civitai', 'huggingface',
+        # 'request' for a token sent with the request, or None). Only this is
+        # journaled; the token itself is looked up again on restore.
+        self.token_source = token_source
+        self.listeners = []
+        self.groups = []
+
+        self.status = 'queued'
+        self.downloaded_bytes = 0
+        self.total_bytes = 0
+        self.progress = 0
+        self.path = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.sequence = 0
+        self.task = None
+
+    def _destination_key(self, filename) -> str:
+        return str((Path(self.target_path) / filename).resolve())
+
+    def add_listener(self, progress_sender, completion_sender, error_sender) -> None:
+        self.listeners.append((progress_sender, completion_sender, error_sender))
+
+    # The three callbacks below are handed to _download_worker in place of the
+    # handler's senders; they record state on the job and fan out to listeners.
+    def on_progress(self, filename, downloaded, total, progress):
+        if filename != self.filename:
+            self.filename = filename
+            self.key = self._destination_key(filename)
+            self.keys.add(self.key)
+        self.downloaded_bytes = downloaded
+        self.total_bytes = total
+        self.progress = progress
+        for progress_sender, _, _ in self.listeners:
+            if progress_sender:
+                progress_sender(filename, downloaded, total, progress)
+
+    def on_complete(self, filename, path):
+        self.filename = filename
+        self.path = path
+        self.progress = 100
+        if self.total_bytes:
+            self.downloaded_bytes = self.total_bytes
+        for _, completion_sender, _ in self.listeners:
+            completion_sender(filename, path)
+
+    def on_error(self, filename, error):
+        self.error = error
+        for _, _, error_sender in self.listeners:
+            error_sender(filename, error)
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.id,
+            'url': self.url,
+            'host': self.host,
+            'kind': self.kind,
+            'target_path': self.target_path,
+            'filename': self.filename,
+            'path': self.path,
+            'status': self.status,
+            'priority': PRIORITY_NAMES.get(self.priority, self.priority),
+            'downloaded_bytes': self.downloaded_bytes,
+            'total_bytes': self.total_bytes,
+            'progress': self.progress,
+            'error': self.error,
+            'subscribers': len(self.listeners),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'meta': self.meta,
+        }
+
+    def to_journal(self) -> dict:
+        """What is needed to restart this job after a restart. Never includes headers."""
+        return {
+            'job_id': self.id,
+            'url': self.url,
+            'target_path': self.target_path,
+            'filename': self.filename,
+            'kind': self.kind,
+            'status': self.status,
+            'priority': self.priority,
+            'token_source': self.token_source,
+            'worker_options': self.worker_options,
+            'meta': self.meta,
+            'downloaded_bytes': self.downloaded_bytes,
+            'total_bytes': self.total_bytes,
+            'created_at': self.created_at,
+        }
+
+    @classmethod
+    def from_journal(cls, entry: dict, headers: dict) -> 'DownloadJob':
+        job = cls(
+            url=entry['url'],
+            headers=headers,
+            target_path=entry['target_path'],
+            filename=entry.get('filename'),
+            priority=entry.get('priority'),
+            kind=entry.get('kind', 'file'),
+            worker_options=entry.get('worker_options'),
+            meta=entry.get('meta'),
+            token_source=entry.get('token_source')
+        )
+        job.id = entry.get('job_id') or job.id
+        job.status = 'paused' if entry.get('status') == 'paused' else 'queued'
+        job.downloaded_bytes = entry.get('downloaded_bytes', 0)
+        job.total_bytes = entry.get('total_bytes', 0)
+        if job.total_bytes:
+            job.progress = int(job.downloaded_bytes / job.total_bytes * 100)
+        job.created_at = entry.get('created_at', job.created_at)
+        return job
+
+class DownloadGroup:
+    """
+    Several jobs scheduled by one request (e.g. all components of an
+    architecture) that are reported together. Jobs keep running and can be
+    paused or cancelled individually; the group only aggregates their state.
+    """
+
+    def __init__(self, jobs, meta=None, skipped=None):
+        self.id = uuid.uuid4().hex
+        self.jobs = list(jobs)
+        self.meta = meta or {}
+        self.skipped = skipped or []
+        self.created_at = time.time()
+        for job in self.jobs:
+            job.groups.append(self)
+
+    @property
+    def status(self) -> str:
+        statuses = {job.status for job in self.jobs}
+        for status in ('running', 'queued', 'paused', 'failed', 'cancelled'):
+            if status in statuses:
+                return status
+        return 'completed'
+
+    def to_dict(self, rate=None) -> dict:
+        """`rate(job_id)` gives a job's current bytes/s, for the group's transfer rate and ETA."""
+        total = sum(job.total_bytes for job in self.jobs)
+        downloaded = sum(job.downloaded_bytes for job in self.jobs)
+        # Jobs that have not started yet do not know their size.
+        unknown_sizes = sum(1 for job in self.jobs if not job.total_bytes and job.status in ACTIVE_STATES)
+        bytes_per_second = sum(rate(job.id) for job in self.jobs) if rate else 0
+        eta = None
+        if bytes_per_second > 0 and not unknown_sizes:
+            eta = round(max(0, total - downloaded) / bytes_per_second)
+        status = self.status
+        return {
+            'group_id': self.id,
+            'status': status,
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'progress': 100 if status == 'completed' else (int(downloaded / total * 100) if total else 0),
+            'bytes_per_second': round(bytes_per_second),
+            'eta_seconds': eta,
+            'unknown_sizes': unknown_sizes,
+            'jobs': [
+                {'job_id': job.id, 'filename': job.filename, 'status': job.status, 'progress': job.progress}
+                for job in self.jobs
+            ],
+            'skipped': self.skipped,
+            'meta': self.meta,
+            'created_at': self.created_at,
+        }
+
+class DownloadManager:
+    """
+    Owns every background download. Jobs wait in a queue ordered by priority
+    and submission order and are started while fewer than `max_concurrent`
+    transfers run overall and fewer than `max_per_host` run against the same
+    host. Finished jobs are kept (up to `history_limit`) so clients that missed
+    the WebSocket event can still query the outcome. When a `progress`
+    aggregator is given, every progress update and final state is reported to
+    it as well. When a `journal` is given, the unfinished jobs are written to
+    it on every state change (and every DOWNLOAD_JOURNAL_INTERVAL seconds while
+    bytes arrive) so they can be restored after a restart. `admit(job)`, when
+    given, is asked before a queued job starts; a job it refuses stays queued
+    and is asked again the next time the queue is evaluated.
+    """
+
+    def __init__(self, worker, max_concurrent=DOWNLOAD_MAX_CONCURRENT, max_per_host=DOWNLOAD_MAX_PER_HOST, history_limit=DOWNLOAD_HISTORY_LIMIT, progress=None, journal=None, admit=None):
+        self.worker = worker
+        self.progress = progress
+        self.journal = journal
+        self.admit = admit
+        self._journaled_at = 0.0
+        self.max_concurrent = max_concurrent
+        self.max_per_host = max_per_host
+        self.history_limit = history_limit
+        self.jobs = {}
+        self.groups = {}
+        self._sequence = 0
+
+    def submit(self, job: DownloadJob) -> DownloadJob:
+        """
+        Queues `job`, or, when a transfer to the same destination is already
+        active, attaches the job's listeners to it and returns that job instead.
+        """
+        existing = self.find_active(job.key)
+        if existing:
+            self._attach(existing, job)
+            return existing
+        self._sequence += 1
+        job.sequence = self._sequence
+        self.jobs[job.id] = job
+        logger.info(f"[DownloadManager] Queued job {job.id} for {job.url}")
+        self._schedule()
+        return job
+
+    def restore(self, job: DownloadJob) -> None:
+        """Re-adds a job read back from the journal, keeping its id and status."""
+        if job.id in self.jobs or self.find_active(job.key):
+            return
+        self._sequence += 1
+        job.sequence = self._sequence
+        self.jobs[job.id] = job
+        logger.info(f"[DownloadManager] Restored {job.status} job {job.id} for {job.url}")
+        self._schedule()
+
+    def submit_group(self, jobs, meta=None, skipped=None) -> DownloadGroup:
+        """Submits every job and groups the resulting (possibly already in-flight) jobs."""
+        submitted = []
+        for job in jobs:
+            job = self.submit(job)
+            if job not in submitted:
+                submitted.append(job)
+        group = DownloadGroup(submitted, meta, skipped)
+        self.groups[group.id] = group
+        self._prune()
+        return group
+
+    def get_group(self, group_id: str):
+        return self.groups.get(group_id)
+
+    def find_active(self, key: str):
+        for job in self.jobs.values():
+            if key in job.keys and job.status in ACTIVE_STATES:
+                return job
+        return None
+
+    def _attach(self, existing: DownloadJob, job: DownloadJob) -> None:
+        logger.info(f"[DownloadManager] Request for {job.url} joined in-flight job {existing.id}")
+        for progress_sender, completion_sender, error_sender in job.listeners:
+            existing.add_listener(progress_sender, completion_sender, error_sender)
+            if progress_sender and existing.total_bytes:
+                progress_sender(existing.filename, existing.downloaded_bytes, existing.total_bytes, existing.progress)
+        existing.priority = min(existing.priority, job.priority)
+        if existing.status == 'paused':
+            self.resume(existing)
+        else:
+            self._schedule()
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def list(self, status=None) -> list:
+        jobs = sorted(self.jobs.values(), key=lambda j: j.sequence)
+        if status:
+            jobs = [j for j in jobs if j.status == status]
+        return jobs
+
+    def pause(self, job: DownloadJob) -> None:
+        if job.status not in ('queued', 'running'):
+            raise ValueError(f"Cannot pause a job that is {job.status}")
+        job.status = 'paused'
+        if job.task and not job.task.done():
+            job.task.cancel()
+        self._save_journal()
+
+    def resume(self, job: DownloadJob) -> None:
+        if job.status != 'paused':
+            raise ValueError(f"Cannot resume a job that is {job.status}")
+        job.status = 'queued'
+        self._schedule()
+
+    def cancel(self, job: DownloadJob) -> None:
+        if job.status not in ACTIVE_STATES:
+            raise ValueError(f"Cannot cancel a job that is {job.status}")
+        was_running = job.task is not None and not job.task.done()
+        job.status = 'cancelled'
+        job.finished_at = time.time()
+        if was_running:
+            job.task.cancel()
+        else:
+            self._remove_partial(job)
+            self._prune()
+            self._save_journal()
+
+    def set_priority(self, job: DownloadJob, priority) -> None:
+        job.priority = parse_priority(priority)
+        self._schedule()
+
+    def wake(self) -> None:
+        """Re-evaluates the queue, e.g. after disk space was freed outside the manager."""
+        self._schedule()
+
+    def _running(self) -> list:
+        return [j for j in self.jobs.values() if j.status == 'running']
+
+    def _schedule(self) -> None:
+        running = self._running()
+        per_host = {}
+        for job in running:
+            per_host[job.host] = per_host.get(job.host, 0) + 1
+
+        queued = sorted(
+            (j for j in self.jobs.values() if j.status == 'queued'),
+            key=lambda j: (j.priority, j.sequence)
+        )
+        for job in queued:
+            if len(running) >= self.max_concurrent:
+                break
+            if job.task is not None:
+                continue # Paused and resumed before its previous run finished unwinding
+            if per_host.get(job.host, 0) >= self.max_per_host:
+                continue
+            if self.admit and not self.admit(job):
+                continue
+            per_host[job.host] = per_host.get(job.host, 0) + 1
+            running.append(job)
+            self._start(job)
+        self._save_journal()
+
+    def _save_journal(self) -> None:
+        if self.journal is None:
+            return
+        self._journaled_at = time.monotonic()
+        self.journal.save([j.to_journal() for j in self.list() if j.status in ACTIVE_STATES])
+
+    def _start(self, job: DownloadJob) -> None:
+        job.status = 'running'
+        job.error = None
+        job.started_at = time.time()
+        job.task = asyncio.create_task(self._run(job))
+
+    async def _run(self, job: DownloadJob) -> None:
+        def progress_sender(filename, downloaded, total, progress):
+            job.on_progress(filename, downloaded, total, progress)
+            if self.progress:
+                self.progress.update(job)
+            if time.monotonic() - self._journaled_at >= DOWNLOAD_JOURNAL_INTERVAL:
+                self._save_journal()
+
+        try:
+            ok = await self.worker(
+                url=job.url,
+                headers=job.headers,
+                target_path=job.target_path,
+                progress_sender=progress_sender,
+                completion_sender=job.on_complete,
+                error_sender=job.on_error,
+                filename=job.filename,
+                **job.worker_options
+            )
+            job.status = 'completed' if ok else 'failed'
+            if not ok and not job.error:
+                job.error = 'Download failed'
+            job.finished_at = time.time()
+        except asyncio.CancelledError:
+            # pause() and cancel() set the status before cancelling the task.
+            if job.status == 'cancelled':
+                self._remove_partial(job)
+            elif job.status == 'running':
+                job.status = 'cancelled'
+                job.finished_at = time.time()
+        except Exception as e:
+            logger.error(f"[DownloadManager] Job {job.id} crashed: {e}", exc_info=True)
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = time.time()
+        finally:
+            job.task = None
+            if self.progress:
+                self.progress.finish(job)
+            self._prune()
+            self._schedule()
+
+    def _remove_partial(self, job: DownloadJob) -> None:
+        if not job.filename:
+            return
+        save_path = Path(job.target_path) / job.filename
+        if lock_path(save_path).exists():
+            return # Another process is downloading into the same .part file
+        work_path = part_path(save_path)
+        for path in (work_path, work_path.with_name(work_path.name + '.segments')):
+            try:
+                if path.is_file():
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"[DownloadManager] Could not remove partial file {path}: {e}")
+
+    def _prune(self) -> None:
+        finished = sorted(
+            (j for j in self.jobs.values() if j.status in FINISHED_STATES),
+            key=lambda j: j.finished_at or 0
+        )
+        for job in finished[:max(0, len(finished) - self.history_limit)]:
+            del self.jobs[job.id]
+
+        finished_groups = sorted(
+            (g for g in self.groups.values() if g.status in FINISHED_STATES),
+            key=lambda g: g.created_at
+        )
+        for group in finished_groups[:max(0, len(finished_groups) - self.history_limit)]:
+            del self.groups[group.id]
@@ -0,0 +1,101 @@
+''' Time-based coalescing of download progress events '''
+import time
+import asyncio
+
+from .constants import logger, DOWNLOAD_PROGRESS_INTERVAL
+
+RATE_SMOOTHING = 0.3 # weight of the newest sample in the transfer-rate moving average
+
+class ProgressAggregator:
+    """
+    Collects progress of every active download and broadcasts at most one
+    batched `downloads_progress` message per `interval` seconds covering all of
+    them, with transfer rate and ETA computed here, plus an aggregated entry for
+    each download group those jobs belong to. A finished job triggers an
+    immediate flush so clients see its final state without waiting.
+
+    `send(event, data)` is the broadcast function (PromptServer.send_sync).
+    """
+
+    def __init__(self, send, interval=DOWNLOAD_PROGRESS_INTERVAL, event='downloads_progress'):
+        self.send = send
+        self.interval = interval
+        self.event = event
+        self._active = {}
+        self._finished = []
+        self._dirty = False
+        self._task = None
+
+    def update(self, job) -> None:
+        now = time.monotonic()
+        entry = self._active.get(job.id)
+        if entry is None:
+            entry = self._active[job.id] = {'sample': (now, job.downloaded_bytes), 'rate': 0.0}
+        entry['job'] = job
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def rate(self, job_id) -> float:
+        """Smoothed bytes/s of an active job, 0 when it is not transferring."""
+        entry = self._active.get(job_id)
+        return entry['rate'] if entry else 0.0
+
+    def finish(self, job) -> None:
+        self._active.pop(job.id, None)
+        self._finished.append(job)
+        self.flush()
+
+    def _sample(self, entry, now) -> dict:
+        job = entry['job']
+        last_time, last_bytes = entry['sample']
+        elapsed = now - last_time
+        if elapsed > 0:
+            instant = max(0, job.downloaded_bytes - last_bytes) / elapsed
+            entry['rate'] = instant if entry['rate'] == 0 else (
+                RATE_SMOOTHING * instant + (1 - RATE_SMOOTHING) * entry['rate']
+            )
+            entry['sample'] = (now, job.downloaded_bytes)
+        rate = entry['rate']
+        eta = None
+        if rate > 0 and job.total_bytes:
+            eta = max(0, job.total_bytes - job.downloaded_bytes) / rate
+        return self._payload(job, rate, eta)
+
+    def _payload(self, job, rate=0.0, eta=None) -> dict:
+        return {
+            'job_id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'filename': job.filename,
+            'downloaded_bytes': job.downloaded_bytes,
+            'total_bytes': job.total_bytes,
+            'progress': job.progress,
+            'bytes_per_second': round(rate),
+            'eta_seconds': round(eta) if eta is not None else None,
+            'meta': job.meta,
+        }
+
+    def flush(self) -> None:
+        now = time.monotonic()
+        jobs = [self._sample(entry, now) for entry in self._active.values()]
+        jobs.extend(self._payload(job) for job in self._finished)
+        # Groups with a member in this batch are reported with aggregated bytes and ETA.
+        groups = {}
+        for job in [entry['job'] for entry in self._active.values()] + self._finished:
+            for group in job.groups:
+                groups[group.id] = group
+        self._finished = []
+        self._dirty = False
+        if not jobs:
+            return
+        try:
+            self.send(self.event, {'jobs': jobs, 'groups': [group.to_dict(self.rate) for group in groups.values()]})
+        except Exception as e:
+            logger.error(f"[Downloader] Failed to send progress update: {e}")
+
+    async def _run(self) -> None:
+        while self._active:
+            await asyncio.sleep(self.interval)
+            if self._dirty:
+                self.flush()
@@ -1,18 +1,21 @@
-import subprocess
 import tempfile
 import shutil
 import json
-import asyncio
 import urllib.request
 import urllib.error
-import zipfile
 import os
-from aiohttp import web
 from pathlib import Path
 from packaging.version import parse as parse_version
-from .constants import OPEN_APPS_ORIGIN, GOLD_BETA_APPS_ORIGIN, SAUS_APPS_PATH, APPS_TO_REMOVE, SAUSMSG, logger, DATA_DIR, APP_CONFIGS, APPS_CONFIG_FILE, SAUS_BROWSER_PATH, SAUS_ORIGIN, APP_VERSION
+from .constants import OPEN_APPS_ORIGIN, SAUS_APPS_PATH, APPS_TO_REMOVE, SAUSMSG, logger, DATA_DIR, SAUS_BROWSER_PATH, SAUS_ORIGIN, APP_VERSION, APP_SYNC_HTTP_TIMEOUT, APP_SYNC_RETRIES
 from .helpers import decrypt_value
-from .route_manager import RouteManager
+from .git_mirror import GitMirror
+from .app_tree import app_tree
+from .app_bundle import bundle_installer
+from .sync_pipeline import Stage, StageSkipped, StageFailed
+
+APPLIED_REF = 'refs/saus/applied' # Commit of the apps mirror last copied to SAUS_APPS_PATH
+APPLY_BATCH_SIZE = 256 # files read from the mirror at a time
+EXCLUDED_ITEMS = ['.git', '.github']
 
 def find_destination_path(item_name: str) -> Path:
     p = SAUS_APPS_PATH / item_name
@@ -23,134 +26,87 @@ def find_destination_path(item_name: str) -> Path:
             return p
     return SAUS_APPS_PATH / item_name
 
-def download_update_apps(raise_on_error: bool = False) -> None:
-    # Remove deprecated apps
+def sync_stages() -> list:
+    """
+    The stages of an app sync. The fetches of the data files, the open apps
+    and the private apps bundle run concurrently; files are only written to
+    the apps directory by one stage at a time.
+    """
+    return [
+        Stage('remove_deprecated', lambda inputs: _remove_deprecated_apps()),
+        Stage('core_data', lambda inputs: _update_data_files_from_saus(), retries=APP_SYNC_RETRIES),
+        Stage('open_apps', lambda inputs: _download_repo(OPEN_APPS_ORIGIN, "Open"), after=['remove_deprecated'], retries=APP_SYNC_RETRIES),
+        Stage('validate_token', lambda inputs: _validate_token(), retries=APP_SYNC_RETRIES),
+        Stage('download_private', lambda inputs: _download_private_apps(inputs['validate_token']), needs=['validate_token'], retries=APP_SYNC_RETRIES),
+        Stage('install_private', lambda inputs: _install_private_apps(inputs['download_private']), needs=['download_private'], after=['remove_deprecated', 'open_apps']),
+    ]
+
+def _remove_deprecated_apps() -> None:
+    for apps in APPS_TO_REMOVE:
+        SAUS_BROWSER_PATH = find_destination_path(apps)
+        if SAUS_BROWSER_PATH.exists() and SAUS_BROWSER_PATH.is_dir():
+            shutil.rmtree(SAUS_BROWSER_PATH)
+
+def _validate_token() -> str:
+    """The SAUS token from the settings, once the gatekeeper did not reject it."""
+    settings_file = DATA_DIR / "settings.json"
+    if not settings_file.exists():
+        raise StageSkipped("No settings")
+    with open(settings_file, 'r', encoding='utf-8') as f:
+        settings = json.load(f)
+    token = decrypt_value(settings.get('saus_token'))
+    if not token:
+        raise StageSkipped("No SAUS token")
+
+    # Check token validity first
     try:
-        for apps in APPS_TO_REMOVE:
-            SAUS_BROWSER_PATH = find_destination_path(apps)
-            if SAUS_BROWSER_PATH.exists() and SAUS_BROWSER_PATH.is_dir():                
-                shutil.rmtree(SAUS_BROWSER_PATH)                
+        validate_url = "https://saus-gatekeeper.vercel.app/api/validate-token"
+        v_req = urllib.request.Request(
+            validate_url,
+            data=json.dumps({"token": token}).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'User-Agent': 'ComfyUI-SAUS'}
+        )
+        with urllib.request.urlopen(v_req, timeout=APP_SYNC_HTTP_TIMEOUT) as v_res:
+            if v_res.status == 200:
+                logger.info(f"{SAUSMSG}: Token validated successfully.")
+    except urllib.error.HTTPError as e:
+        if e.code == 403:
+            raise StageFailed("Token validation failed: Invalid or expired token. Private apps were not downloaded.")
+        logger.warning(f"{SAUSMSG}: Token validation check failed with status {e.code}. Proceeding with download...")
     except Exception as e:
-        logger.error(f"{SAUSMSG}: Error removing deprecated apps: {e}")
-
-    # Update Data Files from SAUS Core
-    _update_data_files_from_saus()
+        logger.warning(f"{SAUSMSG}: Token validation check error: {e}. Proceeding with download...")
+    return token
+
+def _download_private_apps(token: str) -> str:
+    """Downloads the private apps bundle via the gatekeeper proxy; returns the path of the zip."""
+    gatekeeper_url = "https://saus-gatekeeper.vercel.app/api/download-private-apps"
+    req = urllib.request.Request(
+        gatekeeper_url,
+        data=json.dumps({"token": token}).encode('utf-8'),
+        headers={'Content-Type': 'application/json', 'User-Agent': 'ComfyUI-SAUS'}
+    )
+    with urllib.request.urlopen(req, timeout=APP_SYNC_HTTP_TIMEOUT) as response:
+        if response.status != 200:
+            error_body = response.read().decode('utf-8', 'ignore')
+            raise Exception(f"Gatekeeper returned status {response.status}: {error_body}")
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp_zip:
+            try:
+                shutil.copyfileobj(response, tmp_zip)
+            except Exception:
+                tmp_zip.close()
+                os.remove(tmp_zip.name)
+                raise
+            return tmp_zip.name
 
-    # Download Public Apps (Log errors but don't stop)
+def _install_private_apps(zip_path: str) -> None:
     try:
-        _download_repo(OPEN_APPS_ORIGIN, "Open")
-    except Exception as e:
-        logger.error(f"{SAUSMSG}: Public apps update failed: {e}")
-
-    # Download Private Apps (Propagate errors for UI feedback)
-    settings_file = DATA_DIR / "settings.json"
-    if settings_file.exists():
-        try:
-            with open(settings_file, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
-            
-            token = decrypt_value(settings.get('saus_token'))
-            if token:
-                # Check token validity first
-                try:
-                    validate_url = "https://saus-gatekeeper.vercel.app/api/validate-token"
-                    v_req = urllib.request.Request(
-                        validate_url,
-                        data=json.dumps({"token": token}).encode('utf-8'),
-                        headers={'Content-Type': 'application/json', 'User-Agent': 'ComfyUI-SAUS'}
-                    )
-                    with urllib.request.urlopen(v_req) as v_res:
-                        if v_res.status == 200:
-                            logger.info(f"{SAUSMSG}: Token validated successfully.")
-                except urllib.error.HTTPError as e:
-                    if e.code == 403:
-                        msg = "Token validation failed: Invalid or expired token. Private apps were not downloaded."
-                        logger.error(f"{SAUSMSG}: {msg}")
-                        if raise_on_error:
-                            raise Exception(msg)
-                        return
-                    logger.warning(f"{SAUSMSG}: Token validation check failed with status {e.code}. Proceeding with download...")
-                except Exception as e:
-                    logger.warning(f"{SAUSMSG}: Token validation check error: {e}. Proceeding with download...")
-
-                # Securely download private apps via the gatekeeper proxy
-                try:
-                    gatekeeper_url = "https://saus-gatekeeper.vercel.app/api/download-private-apps"
-                    
-                    req = urllib.request.Request(
-                        gatekeeper_url,
-                        data=json.dumps({"token": token}).encode('utf-8'),
-                        headers={'Content-Type': 'application/json', 'User-Agent': 'ComfyUI-SAUS'}
-                    )
-
-                    with urllib.request.urlopen(req) as response:
-                        if response.status == 200:
-                            with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp_zip:
-                                shutil.copyfileobj(response, tmp_zip)
-                                tmp_zip_path = tmp_zip.name
-
-                            with zipfile.ZipFile(tmp_zip_path, 'r') as zip_ref:
-                                root_dir = ""
-                                if zip_ref.namelist():
-                                    root_dir = Path(zip_ref.namelist()[0]).parts[0]
-
-                                # Cache for app locations to avoid repeated rglob calls
-                                app_locations = {}
-                                excluded_items = ['.git', '.github', 'app_list.json', 'architectures.json', 'models_data.json']
-
-                                for member in zip_ref.infolist():
-                                    if not root_dir or member.filename.startswith('__MACOSX'):
-                                        continue
-                                    
-                                    try:
-                                        relative_path = Path(member.filename).relative_to(root_dir)
-                                    except ValueError:
-                                        continue
-
-                                    if not str(relative_path) or str(relative_path) == ".":
-                                        continue
-
-                                    parts = relative_path.parts
-                                    if not parts:
-                                        continue
-                                    
-                                    app_name = parts[0]
-                                    if app_name in excluded_items:
-                                        continue
-                                        
-                                    if app_name not in app_locations:
-                                        app_locations[app_name] = find_destination_path(app_name)
-                                    
-                                    dest_root = app_locations[app_name]
-                                    target_path = dest_root.joinpath(*parts[1:]) if len(parts) > 1 else dest_root
-                                    
-                                    try:
-                                        target_path.resolve().relative_to(SAUS_APPS_PATH.resolve())
-                                    except ValueError:
-                                        logger.warning(f"{SAUSMSG}: Skipped unsafe path in zip: {member.filename}")
-                                        continue
-
-                                    if member.is_dir():
-                                        target_path.mkdir(parents=True, exist_ok=True)
-                                    else:
-                                        target_path.parent.mkdir(parents=True, exist_ok=True)
-                                        with zip_ref.open(member) as source, open(target_path, "wb") as target:
-                                            shutil.copyfileobj(source, target)
-                            logger.info(f"{SAUSMSG}: Private apps downloaded and extracted successfully.")
-                            os.remove(tmp_zip_path)
-                        else:
-                            error_body = response.read().decode('utf-8', 'ignore')
-                            logger.error(f"{SAUSMSG}: Gatekeeper returned status {response.status}: {error_body}")
-                except Exception as e:
-                    logger.error(f"{SAUSMSG}: Error downloading private apps: {e}")
-        except Exception as e:
-            logger.error(f"{SAUSMSG}: Error checking private apps: {e}")
-            if raise_on_error:
-                raise e # Re-raise to notify caller
+        bundle_installer.install(zip_path)
+    finally:
+        os.remove(zip_path)
+    logger.info(f"{SAUSMSG}: Private apps downloaded and extracted successfully.")
 
-def _check_and_update_data_file(filename: str, temp_repo_path: Path, repo_type: str, version_mismatch: bool = False) -> None:
-    src = temp_repo_path / filename
-    if not src.exists():
+def _check_and_update_data_file(filename: str, content: bytes, repo_type: str, version_mismatch: bool = False) -> None:
+    if content is None:
         return
 
     dest = SAUS_BROWSER_PATH / "data" / filename
@@ -165,106 +121,97 @@ def _check_and_update_data_file(filename: str, temp_repo_path: Path, repo_type:
         reason = "Version mismatch"
 
     if should_update:
+        if dest.exists() and dest.read_bytes() == content:
+            return
         try:
             dest.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(src, dest)
+            dest.write_bytes(content)
             logger.info(f"{SAUSMSG}: Updated {filename} from {repo_type} repository. ({reason})")
         except Exception as e:
             logger.error(f"{SAUSMSG}: Failed to update {filename}: {e}")
 
 def _update_data_files_from_saus() -> None:
-    try:
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            temp_repo_path = Path(tmpdirname) / "SAUS_Core"
-            logger.info(f"{SAUSMSG}: Checking for data file updates from SAUS Core...")
-
-            result = subprocess.run(
-                ['git', 'clone', SAUS_ORIGIN, str(temp_repo_path)],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode != 0:
-                logger.error(f"{SAUSMSG}: Failed to clone SAUS Core repository: {result.stderr}")
-                return
-
-            # Check version from pyproject.toml
-            remote_version = None
-            pyproject_path = temp_repo_path / "pyproject.toml"
-            if pyproject_path.exists():
-                try:
-                    with open(pyproject_path, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            if line.strip().startswith("version"):
-                                parts = line.split('=')
-                                if len(parts) > 1:
-                                    remote_version = parts[1].strip().strip('"\'')
-                                break
-                except Exception as e:
-                    logger.warning(f"{SAUSMSG}: Failed to parse version from remote pyproject.toml: {e}")
+    logger.info(f"{SAUSMSG}: Checking for data file updates from SAUS Core...")
+    # Only the files read below are downloaded, not the whole repository.
+    mirror = GitMirror(SAUS_ORIGIN, "saus_core", blobs_on_demand=True)
+    commit = mirror.fetch()
+
+    # Check version from pyproject.toml
+    remote_version = None
+    pyproject = mirror.read_path(commit, "pyproject.toml")
+    if pyproject is not None:
+        try:
+            for line in pyproject.decode('utf-8').splitlines():
+                if line.strip().startswith("version"):
+                    parts = line.split('=')
+                    if len(parts) > 1:
+                        remote_version = parts[1].strip().strip('"\'')
+                    break
+        except Exception as e:
+            logger.warning(f"{SAUSMSG}: Failed to parse version from remote pyproject.toml: {e}")
 
-            version_update_needed = False
-            if remote_version:
-                try:
-                    if parse_version(remote_version) > parse_version(APP_VERSION):
-                        version_update_needed = True
-                        logger.info(f"{SAUSMSG}: Newer version detected (Local: {APP_VERSION}, Remote: {remote_version}). Updating data files.")
-                except Exception as e:
-                    logger.warning(f"{SAUSMSG}: Could not compare versions ('{remote_version}' vs '{APP_VERSION}'): {e}")
+    version_update_needed = False
+    if remote_version:
+        try:
+            if parse_version(remote_version) > parse_version(APP_VERSION):
+                version_update_needed = True
+                logger.info(f"{SAUSMSG}: Newer version detected (Local: {APP_VERSION}, Remote: {remote_version}). Updating data files.")
+        except Exception as e:
+            logger.warning(f"{SAUSMSG}: Could not compare versions ('{remote_version}' vs '{APP_VERSION}'): {e}")
 
-            source_dir = temp_repo_path / "web" / "saus_browser" / "data"
-            if source_dir.exists():
-                data_files = ["app_list.json", "architectures.json", "models_data.json"]
-                for df in data_files:
-                    _check_and_update_data_file(df, source_dir, "SAUS Core", version_update_needed)
-    except Exception as e:
-        logger.error(f"{SAUSMSG}: Failed to update data files from SAUS Core: {e}")
+    data_files = ["app_list.json", "architectures.json", "models_data.json"]
+    for df in data_files:
+        if version_update_needed or not (SAUS_BROWSER_PATH / "data" / df).exists():
+            _check_and_update_data_file(df, mirror.read_path(commit, f"web/saus_browser/data/{df}"), "SAUS Core", version_update_needed)
 
 def _download_repo(repo_url: str, repo_type: str) -> None:
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        temp_repo_path = Path(tmpdirname) / "Apps"
-        logger.info(f"{SAUSMSG}: Downloading and Uploading {repo_type} Apps")
-
-        result = subprocess.run(
-            ['git', 'clone', repo_url, str(temp_repo_path)],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode != 0:
-            safe_url = repo_url.split('@')[-1] if '@' in repo_url else repo_url
-            msg = f"Failed to clone {repo_type} Apps repository ({safe_url}):\n{result.stderr}"
-            logger.error(f"{SAUSMSG}: {msg}")
-            raise Exception(msg)
-
-        if not SAUS_APPS_PATH.exists():
-            SAUS_APPS_PATH.mkdir(parents=True)
-
-        data_files = ["app_list.json", "architectures.json", "models_data.json"]
-
-        for item in temp_repo_path.iterdir():
-            if item.name in ['.git', '.github'] + data_files:
+    logger.info(f"{SAUSMSG}: Downloading and Uploading {repo_type} Apps")
+    mirror = GitMirror(repo_url, f"{repo_type.lower()}_apps")
+    try:
+        commit = mirror.fetch()
+    except Exception as e:
+        safe_url = repo_url.split('@')[-1] if '@' in repo_url else repo_url
+        raise Exception(f"Failed to fetch {repo_type} Apps repository ({safe_url}):\n{e}")
+
+    if not SAUS_APPS_PATH.exists():
+        SAUS_APPS_PATH.mkdir(parents=True)
+
+    # Only what changed since the commit applied last; everything the first time.
+    applied = mirror.rev(APPLIED_REF)
+    changes = mirror.changes(applied, commit)
+    if applied:
+        # Apps removed from disk are restored, as a full copy used to do.
+        changed = {path.split('/')[0] for path, _ in changes}
+        for name in mirror.names(commit):
+            if name not in changed and name not in EXCLUDED_ITEMS and not find_destination_path(name).exists():
+                changes += mirror.changes(None, commit, prefix=name)
+
+    data_files = ["app_list.json", "architectures.json", "models_data.json"]
+    app_locations = {}
+    for start in range(0, len(changes), APPLY_BATCH_SIZE):
+        batch = changes[start:start + APPLY_BATCH_SIZE]
+        blobs = mirror.read(blob_id for _, blob_id in batch if blob_id)
+        for path, blob_id in batch:
+            parts = path.split('/')
+            if any(part in EXCLUDED_ITEMS for part in parts) or (len(parts) == 1 and parts[0] in data_files):
+                continue
+            if parts[0] not in app_locations:
+                app_locations[parts[0]] = find_destination_path(parts[0])
+            dest_root = app_locations[parts[0]]
+            target_path = dest_root.joinpath(*parts[1:])
+            try:
+                target_path.resolve().relative_to(SAUS_APPS_PATH.resolve())
+            except ValueError:
+                logger.warning(f"{SAUSMSG}: Skipped unsafe path in {repo_type} Apps repository: {path}")
                 continue
-            dest_item = find_destination_path(item.name)
-            if item.is_dir():
-                if dest_item.exists():
-                    _copy_directory(item, dest_item)
-                else:
-                    shutil.copytree(item, dest_item)
+
+            if blob_id is None:
+                app_tree.delete(target_path, parts[0], stop=dest_root)
             else:
-                shutil.copy2(item, dest_item)
-        
-        logger.info(f"{SAUSMSG}: {repo_type} Apps have been updated successfully.")
+                app_tree.write(target_path, blobs[blob_id], parts[0], repo_type)
 
-def _copy_directory(src: Path, dest: Path) -> None:
-    for item in src.iterdir():
-        if item.name in ['.git', '.github']:
-            continue
-        dest_item = dest / item.name
-        if item.is_dir():
-            if not dest_item.exists():
-                dest_item.mkdir()
-            _copy_directory(item, dest_item)
-        else:
-            shutil.copy2(item, dest_item)
+    mirror.mark(APPLIED_REF, commit)
+    logger.info(f"{SAUSMSG}: {repo_type} Apps have been updated successfully ({len(changes)} files changed upstream).")
 
 def _load_config(conf_file: Path) -> dict:
     try:
@@ -323,12 +270,3 @@ def _load_config(conf_file: Path) -> dict:
                 logger.error(f"{SAUSMSG}: Error registering new app {url}: {e}")
 
 '''
-
-async def sync_apps_handler(request: web.Request) -> web.Response:
-    try:
-        await asyncio.to_thread(download_update_apps, True)
-        
-        return web.json_response({"status": "success", "message": "Apps synced successfully."})
-    except Exception as e:
-        logger.error(f"{SAUSMSG}: Error syncing apps: {e}")
-        return web.json_response({"status": "error", "message": str(e)}, status=500)
@@ -1,6 +1,7 @@
 import os
 import json
 import asyncio
+import hashlib
 import ipaddress
 from urllib.parse import urlparse
 from pathlib import Path
@@ -9,9 +10,255 @@ import aiohttp
 from server import PromptServer
 
 from .constants import (
-    SAUSMSG, logger, MODELS_DIRECTORY, COMFYUI_DIRECTORY, DATA_DIR
+    SAUSMSG, logger, MODELS_DIRECTORY, COMFYUI_DIRECTORY,
+    DOWNLOAD_CHUNK_SIZE, DOWNLOAD_SEGMENTS, DOWNLOAD_SEGMENT_MIN_SIZE,
+    DOWNLOAD_SPACE_MARGIN, DOWNLOAD_PROBE_CONCURRENCY, MIRROR_CONNECT_TIMEOUT
 )
-from .helpers import extract_filename_from_response, decrypt_value
+from .helpers import (
+    extract_filename_from_response, decrypt_value, find_model_entry, load_settings, load_browser_data,
+    app_architecture, default_components, pathToKey, atomic_write_json
+)
+from . import model_manifest
+from .download_manager import DownloadManager, DownloadJob, ACTIVE_STATES
+from .http_client import get_session
+from .file_writer import ChunkWriter
+from .download_lock import DownloadLock, part_path, lock_path
+from .bandwidth import JobThrottle
+from .download_progress import ProgressAggregator
+from .download_journal import DownloadJournal
+from . import preflight
+from .model_index import model_index
+from .model_cache import model_cache, GB
+from .model_tiers import fast_tier
+from .model_store import model_store, dedup_scan, materialize_duplicate
+from .model_scanner import model_scanner
+from . import model_mirror
+
+SEGMENT_CHECKPOINT_INTERVAL = 2 # seconds between writes of the segment state file
+
+def _segment_state_path(save_path: Path) -> Path:
+    return save_path.with_name(save_path.name + '.segments')
+
+def _load_segment_state(save_path: Path):
+    """Returns (total_size, segments) of an interrupted segmented download, or None."""
+    state_path = _segment_state_path(save_path)
+    if not state_path.exists() or not save_path.exists():
+        return None
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        total_size = int(state['total_size'])
+        segments = [[int(start), int(end), int(done)] for start, end, done in state['segments']]
+        if os.path.getsize(save_path) != total_size or not segments:
+            return None
+        return total_size, segments
+    except Exception as e:
+        logger.warning(f"[Downloader] Ignoring unreadable segment state {state_path}: {e}")
+        return None
+
+def _save_segment_state(save_path: Path, total_size: int, segments: list) -> None:
+    atomic_write_json(_segment_state_path(save_path), {'total_size': total_size, 'segments': segments})
+
+def _preallocate(save_path: Path, total_size: int) -> None:
+    with open(save_path, 'wb') as f:
+        f.truncate(total_size)
+
+def _plan_segments(total_size: int, count: int) -> list:
+    """Splits [0, total_size) into `count` inclusive byte ranges as [start, end, bytes_done]."""
+    segment_size = total_size // count
+    segments = []
+    for i in range(count):
+        start = i * segment_size
+        end = total_size - 1 if i == count - 1 else start + segment_size - 1
+        segments.append([start, end, 0])
+    return segments
+
+async def _download_segmented(
+    session,
+    url,
+    headers,
+    timeout,
+    save_path,
+    total_size,
+    segments,
+    on_progress,
+    max_retries,
+    retry_sleep,
+    throttle
+):
+    """
+    Fetches `url` as concurrent byte ranges written at their offsets into a
+    preallocated file. Progress of every range is kept in a `.segments` file
+    next to the download so each range resumes on its own after a failure.
+    """
+    state = _load_segment_state(save_path)
+    if state and state[0] == total_size:
+        plan = state[1]
+        logger.info(f"[Downloader] Resuming segmented download of {save_path.name}")
+    else:
+        plan = _plan_segments(total_size, segments)
+        await asyncio.to_thread(_preallocate, save_path, total_size)
+        await asyncio.to_thread(_save_segment_state, save_path, total_size, plan)
+        logger.info(f"[Downloader] Downloading {save_path.name} in {len(plan)} segments")
+
+    def report():
+        on_progress(sum(done for _, _, done in plan))
+
+    async def fetch_segment(segment):
+        for attempt in range(max_retries):
+            start, end, done = segment
+            if start + done > end:
+                return
+            request_headers = headers.copy()
+            request_headers['Range'] = f'bytes={start + done}-{end}'
+            try:
+                async with session.get(url, headers=request_headers, timeout=timeout) as resp:
+                    if resp.status != 206:
+                        raise Exception(f"HTTP {resp.status} for range {start + done}-{end}")
+                    # Only bytes the writer thread has stored count as done, so a
+                    # checkpoint never claims data that is still in the queue.
+                    writer = ChunkWriter(save_path, 'r+b', offset=start + done)
+                    try:
+                        async with writer:
+                            received = done
+                            while received <= end - start:
+                                chunk = await resp.content.read(DOWNLOAD_CHUNK_SIZE)
+                                if not chunk:
+                                    break
+                                chunk = chunk[:end + 1 - start - received]
+                                await throttle.consume(len(chunk))
+                                await writer.write(chunk)
+                                received += len(chunk)
+                                segment[2] = done + writer.written
+                                report()
+                    finally:
+                        segment[2] = done + writer.written
+                if start + segment[2] > end:
+                    return
+                raise Exception(f"Connection closed early for range {start}-{end}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[Downloader] Segment {start}-{end} attempt {attempt + 1} failed: {e}")
+                if attempt == max_retries - 1:
+                    raise
+                await asyncio.sleep(retry_sleep)
+
+    async def checkpoint():
+        while True:
+            await asyncio.sleep(SEGMENT_CHECKPOINT_INTERVAL)
+            await asyncio.to_thread(_save_segment_state, save_path, total_size, [list(s) for s in plan])
+
+    report()
+    checkpoint_task = asyncio.create_task(checkpoint())
+    tasks = [asyncio.create_task(fetch_segment(segment)) for segment in plan]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # When one range fails, the others must stop writing before the caller retries or lets go of the lock.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        checkpoint_task.cancel()
+        _save_segment_state(save_path, total_size, plan)
+
+    _segment_state_path(save_path).unlink()
+
+async def _claim_destination(save_path: Path, reuse_existing: bool = False):
+    """
+    Takes the cross-process lock for `save_path`. Returns the held DownloadLock,
+    or None when the finished file is to be reused: another ComfyUI process
+    wrote it while we waited for its lock, or, with `reuse_existing` (model
+    jobs), it was already in place with a current model manifest entry.
+    Otherwise an existing file is downloaded again and replaced.
+    """
+    segments_file = _segment_state_path(save_path)
+    if segments_file.exists() and save_path.exists() and not part_path(save_path).exists():
+        # Segmented download started before .part files were used.
+        os.replace(save_path, part_path(save_path))
+        os.replace(segments_file, _segment_state_path(part_path(save_path)))
+
+    def reusable():
+        return reuse_existing and save_path.exists() and model_manifest.lookup(save_path) is not None
+
+    if not lock_path(save_path).exists() and await asyncio.to_thread(reusable):
+        return None
+    lock = DownloadLock(save_path)
+    if not await lock.acquire():
+        return None # Waited for another process, which put the file in place
+    if await asyncio.to_thread(reusable):
+        await lock.release()
+        return None
+    return lock
+
+async def _finalize_download(work_path: Path, save_path: Path, sha256: str = None, expected_sha256: str = None, url: str = None, served_sha256: str = None) -> bool:
+    """
+    Atomically moves the finished .part file into place and records its hash and origin.
+    A file whose hash differs from `expected_sha256`, or from `served_sha256` (the one
+    a mirror announced), is dropped without ever appearing under its final name.
+    """
+    for source, wanted in (('expected', expected_sha256), ('sent by the mirror', served_sha256)):
+        if wanted and sha256 is not None and sha256 != wanted.lower():
+            logger.error(f"[Downloader] SHA-256 mismatch for {save_path}: {source} {wanted}, got {sha256}")
+            await asyncio.to_thread(os.remove, work_path)
+            return False
+    await asyncio.to_thread(os.replace, work_path, save_path)
+    model_index.update(save_path)
+    model_cache.touch(save_path)
+    fast_tier.forget(save_path) # A copy of a previous version is stale now
+    if sha256 is not None:
+        await asyncio.to_thread(model_manifest.record, save_path, sha256, expected_sha256)
+    if url:
+        try:
+            await asyncio.to_thread(model_store.remember, url, save_path)
+        except OSError as e:
+            logger.warning(f"[Downloader] Could not record the origin of {save_path}: {e}")
+    return True
+
+async def _reuse_duplicate(url, headers, work_path: Path, save_path: Path, expected_sha256: str = None) -> bool:
+    """
+    Fills `save_path` with a link to an identical file already on disk, dropping
+    any partial download of it. False when the file has to be downloaded.
+    """
+    if not await materialize_duplicate(url, headers, save_path, expected_sha256):
+        return False
+    for stale in (work_path, _segment_state_path(work_path)):
+        try:
+            os.remove(stale)
+        except FileNotFoundError:
+            pass
+    model_cache.touch(save_path)
+    return True
+
+def _validate_url(url, allow_private: bool = False) -> None:
+    """
+    Raises ValueError for URLs that would allow Server Side Request Forgery (SSRF).
+    `allow_private` lets through local hosts, for the mirror URL the admin configured.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https'):
+        raise ValueError(f"Invalid URL scheme: {parsed.scheme}. Only http and https are allowed.")
+
+    hostname = parsed.hostname
+    if hostname and not allow_private:
+        if hostname.lower() == 'localhost':
+            raise ValueError("Access to localhost is denied")
+        try:
+            ip = ipaddress.ip_address(hostname)
+        except ValueError:
+            return # Not an IP literal
+        if ip.is_private or ip.is_loopback or ip.is_link_local:
+            raise ValueError(f"Access to private/local IP {hostname} is denied")
+
+def _disk_space_error(path: Path, needed: int):
+    """Message when fewer than `needed` bytes (plus the safety margin) are free at `path`, else None."""
+    free = preflight.free_bytes(path)
+    if needed + DOWNLOAD_SPACE_MARGIN <= free:
+        return None
+    return (
+        f"Not enough disk space: {preflight.format_size(needed)} needed, "
+        f"{preflight.format_size(free)} free on the target drive"
+    )
 
 async def _download_worker(
     url,
@@ -23,122 +270,432 @@ async def _download_worker(
     filename=None,
     resolve_filename_from_header=False,
     max_retries=5,
-    connect_timeout=60,
-    total_timeout=3600,
-    retry_sleep=5
+    connect_timeout=None,
+    total_timeout=None,
+    retry_sleep=5,
+    segments=DOWNLOAD_SEGMENTS,
+    compute_sha256=False,
+    expected_sha256=None,
+    mirror_path=None,
+    reuse_existing=False,
+    from_mirror=False
 ):
     logger.info(f"[Downloader] Background task started for URL: {url}")
 
-    # Validate URL to prevent Server Side Request Forgery (SSRF)
     try:
-        parsed = urlparse(url)
-        if parsed.scheme not in ('http', 'https'):
-            raise ValueError(f"Invalid URL scheme: {parsed.scheme}. Only http and https are allowed.")
-        
-        hostname = parsed.hostname
-        if hostname:
-            if hostname.lower() == 'localhost':
-                raise ValueError("Access to localhost is denied")
-            try:
-                ip = ipaddress.ip_address(hostname)
-                if ip.is_private or ip.is_loopback or ip.is_link_local:
-                    raise ValueError(f"Access to private/local IP {hostname} is denied")
-            except ValueError:
-                pass
+        _validate_url(url, allow_private=from_mirror)
     except Exception as e:
         logger.error(f"[Downloader] Security validation failed for {url}: {e}")
         error_sender(filename or "unknown", str(e))
         return False
+
+    mirror = model_mirror.mirror_source(mirror_path) if filename and mirror_path else None
+    if mirror:
+        mirror_url, mirror_headers = mirror
+        # One quick attempt at the mirror; whatever it transferred is resumed from the origin.
+        if await _download_worker(
+            mirror_url, mirror_headers, target_path, progress_sender, completion_sender,
+            lambda *args: None, filename=filename, max_retries=1, connect_timeout=MIRROR_CONNECT_TIMEOUT,
+            retry_sleep=0, segments=segments, compute_sha256=compute_sha256, expected_sha256=expected_sha256,
+            reuse_existing=reuse_existing, from_mirror=True
+        ):
+            return True
+        logger.info(f"[Downloader] Mirror could not provide {filename}, downloading from {url}")
     
-    timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout)
+    session = get_session()
+    # Per-call overrides on top of the shared session's configured timeouts.
+    timeout = aiohttp.ClientTimeout(
+        total=total_timeout,
+        connect=connect_timeout or session.timeout.connect,
+        sock_read=session.timeout.sock_read
+    )
     save_path = None
-    
+    work_path = None
+    lock = None
+    throttle = JobThrottle()
+    served_sha256 = None # Announced by a mirror; what it sent is checked against it
+
     if filename:
         save_path = Path(target_path) / filename
+        lock = await _claim_destination(save_path, reuse_existing)
+        if lock is None:
+            logger.info(f"[Downloader] {filename} is already in place, reusing it.")
+            completion_sender(filename, str(save_path))
+            return True
+        work_path = part_path(save_path)
+
+    try:
+        if save_path is not None and await _reuse_duplicate(url, headers, work_path, save_path, expected_sha256):
+            completion_sender(filename, str(save_path))
+            return True
 
-    async with aiohttp.ClientSession(timeout=timeout) as session:
         for attempt in range(max_retries):
             try:
                 request_headers = headers.copy()
                 mode = 'wb'
                 downloaded_size = 0
-                
-                if save_path and os.path.exists(save_path):
-                    downloaded_size = os.path.getsize(save_path)
+                segmented_size = 0
+
+                segment_state = _load_segment_state(work_path) if work_path else None
+                if segment_state:
+                    current_filename = save_path.name
+                    segmented_size = segment_state[0]
+                elif work_path and os.path.exists(work_path):
+                    downloaded_size = os.path.getsize(work_path)
                     if downloaded_size > 0:
                         request_headers['Range'] = f'bytes={downloaded_size}-'
                         mode = 'ab'
                         logger.info(f"[Downloader] Resuming {filename or 'file'} from byte {downloaded_size}")
 
-                logger.info(f"[Downloader] Attempt {attempt+1}/{max_retries} connecting...")
-                async with session.get(url, headers=request_headers) as resp:
-                    if resp.status not in (200, 206):
-                        error_msg = f"HTTP Error {resp.status}"
-                        logger.error(f"[Downloader] {error_msg}")
-                        if resp.status in [401, 403, 404]:
-                            error_sender(filename or "unknown", error_msg)
+                if not segmented_size:
+                    logger.info(f"[Downloader] Attempt {attempt+1}/{max_retries} connecting...")
+                    async with session.get(url, headers=request_headers, timeout=timeout) as resp:
+                        if resp.status not in (200, 206):
+                            error_msg = f"HTTP Error {resp.status}"
+                            logger.error(f"[Downloader] {error_msg}")
+                            if resp.status in [401, 403, 404]:
+                                error_sender(filename or "unknown", error_msg)
+                                return False
+                            raise Exception(error_msg)
+
+                        current_filename = filename
+                        if not current_filename:
+                            if resolve_filename_from_header:
+                                current_filename = extract_filename_from_response(resp, url)
+                            else:
+                                current_filename = Path(url).name
+                            save_path = Path(target_path) / current_filename
+                            logger.info(f"[Downloader] Resolved filename: {current_filename}, Saving to: {save_path}")
+
+                        if lock is None:
+                            # The name was only known from this response, so the destination
+                            # is claimed now. Drop the response and start over once we own it.
+                            filename = current_filename
+                            lock = await _claim_destination(save_path, reuse_existing)
+                            if lock is None:
+                                logger.info(f"[Downloader] {filename} is already in place, reusing it.")
+                                completion_sender(filename, str(save_path))
+                                return True
+                            work_path = part_path(save_path)
+                            if await _reuse_duplicate(url, headers, work_path, save_path, expected_sha256):
+                                completion_sender(filename, str(save_path))
+                                return True
+                            if os.path.exists(work_path):
+                                continue
+
+                        save_path.parent.mkdir(parents=True, exist_ok=True)
+                        if from_mirror:
+                            served_sha256 = resp.headers.get(model_mirror.HASH_HEADER)
+
+                        total_size = int(resp.headers.get('Content-Length', 0))
+                        if resp.status == 206:
+                            content_range = resp.headers.get('Content-Range', '')
+                            if content_range:
+                                try:
+                                    total_size = int(content_range.split('/')[-1])
+                                except (ValueError, IndexError):
+                                    pass
+                        elif resp.status == 200 and downloaded_size > 0:
+                            downloaded_size = 0
+                            mode = 'wb'
+                            logger.warning("[Downloader] Server ignored Range header, restarting download.")
+
+                        # Last check before anything is written, for sizes the preflight could not probe.
+                        space_error = _disk_space_error(save_path.parent, total_size - downloaded_size) if total_size else None
+                        if space_error:
+                            logger.error(f"[Downloader] {current_filename}: {space_error}")
+                            error_sender(current_filename, space_error)
                             return False
-                        raise Exception(error_msg)
-                    
-                    current_filename = filename
-                    if not current_filename:
-                        if resolve_filename_from_header:
-                            current_filename = extract_filename_from_response(resp, url)
+
+                        if (
+                            segments > 1
+                            and resp.status == 200
+                            and total_size >= DOWNLOAD_SEGMENT_MIN_SIZE
+                            and resp.headers.get('Accept-Ranges', '').lower() == 'bytes'
+                        ):
+                            # Leave this response unread; the ranges are requested separately.
+                            segmented_size = total_size
                         else:
-                            current_filename = Path(url).name
-                        save_path = Path(target_path) / current_filename
-                        logger.info(f"[Downloader] Resolved filename: {current_filename}, Saving to: {save_path}")
-
-                    save_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    total_size = int(resp.headers.get('Content-Length', 0))
-                    if resp.status == 206:
-                        content_range = resp.headers.get('Content-Range', '')
-                        if content_range:
-                            try:
-                                total_size = int(content_range.split('/')[-1])
-                            except (ValueError, IndexError):
-                                pass
-                    elif resp.status == 200 and downloaded_size > 0:
-                        downloaded_size = 0
-                        mode = 'wb'
-                        logger.warning("[Downloader] Server ignored Range header, restarting download.")
-
-                    with open(save_path, mode) as f:
-                        bytes_read_in_attempt = 0
-                        last_progress_update = -1
-                        
-                        while True:
-                            chunk = await resp.content.read(1024 * 1024)
-                            if not chunk:
-                                break
-                            f.write(chunk)
-                            bytes_read_in_attempt += len(chunk)
-                            
-                            current_total = downloaded_size + bytes_read_in_attempt
-                            
-                            if total_size > 0:
-                                progress = int((current_total / total_size) * 100)
-                                if progress > last_progress_update:
-                                    last_progress_update = progress
-                                    progress_sender(current_filename, current_total, total_size, progress)
-                    
-                    logger.info(f"[Downloader] Complete: {current_filename}")
-                    completion_sender(current_filename, str(save_path))
-                    return True
+                            hasher = None
+                            if compute_sha256 or expected_sha256 or served_sha256:
+                                if downloaded_size > 0:
+                                    # Only the already-downloaded prefix is read back on resume.
+                                    hasher = await asyncio.to_thread(model_manifest.hash_file, work_path, downloaded_size)
+                                else:
+                                    hasher = hashlib.sha256()
+
+                            async with ChunkWriter(work_path, mode, hasher=hasher) as writer:
+                                bytes_read_in_attempt = 0
+
+                                while True:
+                                    chunk = await resp.content.read(DOWNLOAD_CHUNK_SIZE)
+                                    if not chunk:
+                                        break
+                                    await throttle.consume(len(chunk))
+                                    await writer.write(chunk)
+                                    bytes_read_in_attempt += len(chunk)
+
+                                    current_total = downloaded_size + bytes_read_in_attempt
+
+                                    # Reported per chunk; broadcasting is rate-limited by the progress aggregator.
+                                    if total_size > 0:
+                                        progress = int((current_total / total_size) * 100)
+                                        progress_sender(current_filename, current_total, total_size, progress)
+
+                            sha256 = hasher.hexdigest() if hasher is not None else None
+                            if not await _finalize_download(work_path, save_path, sha256, expected_sha256, url, served_sha256):
+                                error_sender(current_filename, f"Checksum mismatch for {current_filename}")
+                                return False
+
+                            logger.info(f"[Downloader] Complete: {current_filename}")
+                            completion_sender(current_filename, str(save_path))
+                            return True
+
+                def segmented_progress(current_total):
+                    progress = int((current_total / segmented_size) * 100)
+                    progress_sender(current_filename, current_total, segmented_size, progress)
+
+                await _download_segmented(
+                    session, url, headers, timeout, work_path, segmented_size, segments,
+                    segmented_progress, max_retries, retry_sleep, throttle
+                )
+                sha256 = None
+                if compute_sha256 or expected_sha256 or served_sha256:
+                    # Ranges arrive out of order, so a segmented file is hashed once after the fact.
+                    sha256 = (await asyncio.to_thread(model_manifest.hash_file, work_path)).hexdigest()
+                if not await _finalize_download(work_path, save_path, sha256, expected_sha256, url, served_sha256):
+                    error_sender(current_filename, f"Checksum mismatch for {current_filename}")
+                    return False
+                logger.info(f"[Downloader] Complete: {current_filename}")
+                completion_sender(current_filename, str(save_path))
+                return True
 
             except Exception as e:
                 logger.error(f"[Downloader] Attempt {attempt + 1} failed: {e}")
                 if attempt == max_retries - 1:
                     error_sender(filename or "unknown", str(e))
-                
-                if downloaded_size == 0 and save_path and save_path.exists():
-                    os.remove(save_path)
-                    
+                # Whatever reached the .part file is kept; the next attempt resumes from it.
                 await asyncio.sleep(retry_sleep)
-    
-    logger.error(f"Download failed after {max_retries} attempts for {filename or url}.")
-    return False
+
+        logger.error(f"Download failed after {max_retries} attempts for {filename or url}.")
+        return False
+    finally:
+        if lock is not None:
+            await lock.release()
+
+def _partial_bytes(job: DownloadJob) -> int:
+    """Bytes of `job` already stored in its .part file."""
+    if not job.filename:
+        return 0
+    work_path = part_path(Path(job.target_path) / job.filename)
+    state = _load_segment_state(work_path)
+    if state:
+        return sum(done for _, _, done in state[1]) # The preallocated file is sparse
+    try:
+        return os.path.getsize(work_path)
+    except OSError:
+        return 0
+
+def _space_shortfall(job: DownloadJob, others) -> int:
+    """
+    Bytes missing on the target drive to finish `job` after the jobs in
+    `others` on the same drive have finished too; 0 when everything fits.
+    """
+    if not job.total_bytes:
+        return 0
+    needed = max(0, job.total_bytes - _partial_bytes(job))
+    reserved = sum(
+        max(0, other.total_bytes - other.downloaded_bytes)
+        for other in others
+        if other is not job and other.total_bytes and preflight.same_filesystem(other.target_path, job.target_path)
+    )
+    return max(0, needed + reserved + DOWNLOAD_SPACE_MARGIN - preflight.free_bytes(job.target_path))
+
+def _admit(job: DownloadJob) -> bool:
+    """Start queued jobs only when the running ones leave enough disk space for them."""
+    shortfall = _space_shortfall(job, download_manager.list('running'))
+    if shortfall:
+        job.error = f"Waiting for disk space: {preflight.format_size(shortfall)} more needed"
+        return False
+    return True
+
+progress_aggregator = ProgressAggregator(lambda event, data: PromptServer.instance.send_sync(event, data))
+download_manager = DownloadManager(_download_worker, progress=progress_aggregator, journal=DownloadJournal(), admit=_admit)
+
+def _space_policy() -> str:
+    """'reject' (default) refuses downloads that do not fit; 'queue' keeps them queued until they do."""
+    policy = str(load_settings().get('download_space_policy', 'reject')).lower()
+    return policy if policy in ('reject', 'queue') else 'reject'
+
+async def _probe_job_size(job: DownloadJob) -> None:
+    if job.total_bytes or download_manager.find_active(job.key):
+        return
+    try:
+        _validate_url(job.url)
+    except ValueError:
+        return # The worker reports the invalid URL
+    job.total_bytes = await preflight.probe_size(job.url, job.headers) or 0
+
+async def _shortfalls(jobs, reserved) -> list:
+    """Jobs that do not fit, each checked after the ones before it have reserved their space."""
+    reserved = list(reserved)
+    short = []
+    for job in jobs:
+        shortfall = await asyncio.to_thread(_space_shortfall, job, reserved)
+        if shortfall:
+            short.append({'url': job.url, 'filename': job.filename, 'size': job.total_bytes, 'shortfall': shortfall})
+        reserved.append(job)
+    return short
+
+def _in_models_directory(job: DownloadJob) -> bool:
+    try:
+        model_index.key(job.target_path)
+        return True
+    except ValueError:
+        return False
+
+def _destinations(jobs) -> list:
+    return [Path(job.target_path) / job.filename for job in jobs if job.filename]
+
+async def _make_room(jobs, reserved, short) -> list:
+    """Lets the model cache evict old models for new model downloads; returns what was evicted."""
+    model_jobs = [job for job in jobs if _in_models_directory(job)]
+    if not model_jobs:
+        return []
+    # .part files are not in the model index, so active downloads count in full.
+    incoming = sum(job.total_bytes for job in model_jobs + reserved if _in_models_directory(job))
+    disk_shortfall = max((item['shortfall'] for item in short), default=0)
+    return await model_cache.make_room(incoming, disk_shortfall, _destinations(jobs + reserved))
+
+async def _check_space(jobs) -> dict:
+    """
+    Preflight for new jobs: probes their sizes and checks them, together with
+    every active job, against the free space of their drives. Returns None when
+    they can be submitted, or the details of the shortfall when they must be
+    rejected. With the 'queue' policy nothing is rejected; the scheduler holds
+    the jobs back instead.
+    """
+    jobs = [job for job in jobs if not download_manager.find_active(job.key)]
+    await asyncio.gather(*(_probe_job_size(job) for job in jobs))
+    reserved = [job for job in download_manager.list() if job.status in ACTIVE_STATES]
+    short = await _shortfalls(jobs, reserved)
+    if await _make_room(jobs, reserved, short):
+        short = await _shortfalls(jobs, reserved)
+    if not short or _space_policy() == 'queue':
+        return None
+    total_shortfall = max(item['shortfall'] for item in short)
+    return {
+        'message': f"Not enough disk space: {preflight.format_size(total_shortfall)} more needed on the target drive",
+        'downloads': short,
+    }
+
+TOKEN_SETTINGS = {
+    'civitai': 'civitai_api_key',
+    'huggingface': 'huggingface_api_key'
+}
+
+def _stored_token(token_source):
+    """Decrypted API key saved in settings for 'civitai' or 'huggingface', else None."""
+    if token_source not in TOKEN_SETTINGS:
+        return None
+    try:
+        return decrypt_value(load_settings().get(TOKEN_SETTINGS[token_source]))
+    except Exception as e:
+        logger.error(f"Error reading stored token: {e}")
+        return None
+
+def _auth_headers(token) -> dict:
+    return {'Authorization': f'Bearer {token}'} if token else {}
+
+def _file_senders():
+    def completion_sender(filename, path):
+        PromptServer.instance.send_sync("file_download_complete", {
+            "filename": filename,
+            "path": path
+        })
+
+    def error_sender(filename, error):
+        PromptServer.instance.send_sync("file_download_error", {"filename": filename, "error": error})
+
+    return completion_sender, error_sender
+
+def _model_senders(component_type, model_path):
+    def completion_sender(filename, path):
+        PromptServer.instance.send_sync("model_download_complete", {
+            "component_type": component_type,
+            "model_path": model_path,
+            "file_name": filename
+        })
+
+    def error_sender(filename, error):
+        # The original function did not send an error notification via WebSocket.
+        # Logging is handled by the worker.
+        pass
+
+    return completion_sender, error_sender
+
+def _model_target(model_path: str) -> Path:
+    """Resolved folder under MODELS_DIRECTORY for `model_path`; ValueError when it escapes it."""
+    target_path = (MODELS_DIRECTORY / model_path.strip('/\\')).resolve()
+    target_path.relative_to(MODELS_DIRECTORY.resolve())
+    return target_path
+
+def _model_job(component_type, url_model, model_path, file_name, priority=None, expected_sha256=None) -> DownloadJob:
+    target_path = _model_target(model_path)
+    if expected_sha256 is None:
+        expected_sha256 = find_model_entry(model_path, file_name).get('sha256')
+    if file_name:
+        existing_file = target_path / file_name
+        if model_manifest.status(existing_file, expected_sha256) == 'corrupt':
+            # A corrupt file cannot be resumed; start over.
+            logger.warning(f"[API] Removing corrupt model before re-download: {existing_file}")
+            os.remove(existing_file)
+            model_manifest.forget(existing_file)
+            model_index.update(existing_file)
+
+    job = DownloadJob(
+        url=url_model,
+        headers={},
+        target_path=target_path,
+        filename=file_name,
+        priority=priority,
+        kind='model',
+        worker_options={
+            'resolve_filename_from_header': False,
+            'retry_sleep': 10, # Use longer sleep as in original function
+            'compute_sha256': True,
+            'expected_sha256': expected_sha256,
+            'reuse_existing': True,
+            'mirror_path': f"{pathToKey(model_path).strip('/')}/{file_name}" if file_name else None
+        },
+        meta={'component_type': component_type, 'model_path': model_path}
+    )
+    # Progress is broadcast in batches as 'downloads_progress' by progress_aggregator.
+    job.add_listener(None, *_model_senders(component_type, model_path))
+    return job
+
+async def restore_journaled_downloads(app) -> None:
+    """
+    on_startup hook: puts the downloads that were queued or running when the
+    server last stopped back in the queue. Each resumes from its .part file
+    through the normal Range-resume path of _download_worker.
+    """
+    for entry in download_manager.journal.load():
+        try:
+            token_source = entry.get('token_source')
+            job = DownloadJob.from_journal(entry, _auth_headers(_stored_token(token_source)))
+            if token_source == 'request':
+                # The token came with the original request and was never stored.
+                job.status = 'paused'
+                job.error = 'Paused after restart: resubmit the download with its API token'
+            if job.kind == 'model':
+                senders = _model_senders(job.meta.get('component_type'), job.meta.get('model_path'))
+            else:
+                senders = _file_senders()
+            job.add_listener(None, *senders)
+            download_manager.restore(job)
+        except Exception as e:
+            logger.error(f"{SAUSMSG}: Could not restore download {entry.get('url')}: {e}")
 
 #### API HANDLERS TO MANAGE DOWNLOADS OF FILES/MODELS ##################
 
@@ -161,58 +718,32 @@ async def download_generic_handler(request):
         except ValueError:
              return web.json_response({"error": "Access denied: Target path outside allowed directories"}, status=403)
 
-        headers = {}
-        
-        final_token = None
-        if token_source in ['civitai', 'huggingface']:
-            settings_file = DATA_DIR / "settings.json"
-            if settings_file.exists():
-                try:
-                    with open(settings_file, 'r', encoding='utf-8') as f:
-                        settings = json.load(f)
-                    
-                    key_map = {
-                        'civitai': 'civitai_api_key',
-                        'huggingface': 'huggingface_api_key'
-                    }
-                    encrypted_token = settings.get(key_map.get(token_source))
-                    final_token = decrypt_value(encrypted_token)
-                except Exception as e:
-                    logger.error(f"Error reading stored token: {e}")
+        if token_source in TOKEN_SETTINGS:
+            final_token = _stored_token(token_source)
         elif api_token:
             final_token = api_token
+            token_source = 'request'
+        else:
+            final_token = None
+            token_source = None
 
-        if final_token:
-            headers['Authorization'] = f'Bearer {final_token}'
-
-        def progress_sender(filename, downloaded, total, progress):
-            PromptServer.instance.send_sync("file_download_progress", {
-                "filename": filename,
-                "progress": progress,
-                "total_bytes": total,
-                "downloaded_bytes": downloaded
-            })
-
-        def completion_sender(filename, path):
-            PromptServer.instance.send_sync("file_download_complete", {
-                "filename": filename,
-                "path": path
-            })
-
-        def error_sender(filename, error):
-            PromptServer.instance.send_sync("file_download_error", {"filename": filename, "error": error})
-
-        asyncio.create_task(_download_worker(
+        job = DownloadJob(
             url=url,
-            headers=headers,
+            headers=_auth_headers(final_token),
             target_path=target_path,
-            progress_sender=progress_sender,
-            completion_sender=completion_sender,
-            error_sender=error_sender,
-            resolve_filename_from_header=True
-        ))
+            priority=data.get('priority'),
+            kind='file',
+            worker_options={'resolve_filename_from_header': True},
+            token_source=token_source
+        )
+        # Progress is broadcast in batches as 'downloads_progress' by progress_aggregator.
+        job.add_listener(None, *_file_senders())
+        space_error = await _check_space([job])
+        if space_error:
+            return web.json_response({'error': space_error['message'], **space_error}, status=507)
+        job = download_manager.submit(job)
 
-        return web.json_response({'message': 'Download initiated in background'})
+        return web.json_response({'message': 'Download initiated in background', 'job_id': job.id})
 
     except Exception as e:
         return web.json_response({'error': str(e)}, status=500)
@@ -232,51 +763,245 @@ async def download_model_handler(request: web.Request) -> web.Response:
                 'message': f'Missing model URL, destination path, or component type. Received: type={component_type}, url={url_model}, path={model_path}'
             }, status=400)
 
-        target_path = (MODELS_DIRECTORY / model_path.strip('/\\')).resolve()
-        
         try:
-            target_path.relative_to(MODELS_DIRECTORY.resolve())
+            job = _model_job(component_type, url_model, model_path, file_name, data.get('priority'), data.get('sha256'))
         except ValueError:
             return web.json_response({'status': 'error', 'message': 'Invalid model path'}, status=403)
+        space_error = await _check_space([job])
+        if space_error:
+            return web.json_response({'status': 'error', **space_error}, status=507)
+        job = download_manager.submit(job)
 
-        def progress_sender(filename, downloaded, total, progress):
-            PromptServer.instance.send_sync("model_download_progress", {
-                "component_type": component_type,
-                "model_path": model_path,
-                "file_name": filename,
-                "progress": progress
-            })
-
-        def completion_sender(filename, path):
-            PromptServer.instance.send_sync("model_download_complete", {
-                "component_type": component_type,
-                "model_path": model_path,
-                "file_name": filename
-            })
-
-        def error_sender(filename, error):
-            # The original function did not send an error notification via WebSocket.
-            # Logging is handled by the worker.
-            pass
+        return web.json_response({'status': 'initiated', 'message': 'Download started in the background.', 'job_id': job.id})
 
-        asyncio.create_task(_download_worker(
-            url=url_model,
-            headers={},
-            target_path=target_path,
-            progress_sender=progress_sender,
-            completion_sender=completion_sender,
-            error_sender=error_sender,
-            filename=file_name,
-            resolve_filename_from_header=False,
-            retry_sleep=10 # Use longer sleep as in original function
-        ))
+    except Exception as e:
+        logger.error(f"Error handling download request: {e}", exc_info=True)
+        return web.json_response({'status': 'error', 'message': 'Internal Server Error'}, status=500)
+
+def _select_components(architecture: dict, requested, models_data: dict) -> list:
+    """
+    Component keys to install for `architecture`: every compulsory one plus
+    the requested ones. Without a request, the first `at_least_one` entry is
+    added unless one of them is installed already.
+    """
+    components = architecture.get('components', {})
+    compulsory = components.get('compulsory', [])
+    at_least_one = components.get('at_least_one', [])
+    known = set(compulsory) | set(at_least_one) | set(components.get('optional', []))
+
+    if requested is None:
+        requested = []
+        if at_least_one and not any(_component_installed(models_data.get(key)) for key in at_least_one):
+            requested = at_least_one[:1]
+    unknown = [key for key in requested if key not in known]
+    if unknown:
+        raise ValueError(f"Components not part of this architecture: {', '.join(unknown)}")
+
+    selected = []
+    for key in list(compulsory) + list(requested):
+        if key not in selected:
+            selected.append(key)
+    return selected
+
+def _component_path(entry: dict) -> Path:
+    return _model_target(entry.get('model_path', '')) / entry['id']
+
+def _component_installed(entry) -> bool:
+    if not entry or not entry.get('id'):
+        return False
+    try:
+        return model_manifest.status(_component_path(entry), entry.get('sha256')) in ('ready', 'unverified')
+    except ValueError:
+        return False
+
+async def _component_jobs(keys, models_data: dict, priority=None) -> tuple:
+    """
+    (jobs, skipped, missing) for installing the components `keys`: download
+    jobs for the files not on disk yet, the components already present, and
+    the keys without a usable models_data entry.
+    """
+    jobs = []
+    skipped = []
+    missing = []
+    for key in keys:
+        entry = models_data.get(key)
+        if not entry or not entry.get('id') or not entry.get('url_model') or not entry.get('model_path'):
+            missing.append(key)
+            continue
+        try:
+            status = await asyncio.to_thread(model_manifest.status, _component_path(entry), entry.get('sha256'))
+            if status in ('ready', 'unverified'):
+                skipped.append({'component': key, 'file_name': entry['id'], 'status': status})
+                continue
+            jobs.append(_model_job(
+                entry.get('type'), entry['url_model'], entry['model_path'], entry['id'],
+                priority, entry.get('sha256')
+            ))
+        except ValueError:
+            missing.append(key)
+    return jobs, skipped, missing
+
+async def provision_architecture_handler(request: web.Request) -> web.Response:
+    """
+    Installs the models an architecture needs in one call. Body:
+    {"architecture": key, "components": [component keys] (optional), "priority": ...}.
+    Files already present are skipped; the rest are queued as one download group.
+    """
+    try:
+        data = await request.json()
+        architecture_key = data.get('architecture')
+        architectures = load_browser_data('architectures.json') or {}
+        models_data = load_browser_data('models_data.json') or {}
+
+        architecture = architectures.get(architecture_key)
+        if not architecture:
+            return web.json_response({'status': 'error', 'message': f'Unknown architecture: {architecture_key}'}, status=404)
 
-        return web.json_response({'status': 'initiated', 'message': 'Download started in the background.'})
+        requested = data.get('components')
+        if requested is not None and not isinstance(requested, list):
+            return web.json_response({'status': 'error', 'message': 'components must be a list'}, status=400)
+        try:
+            selected = _select_components(architecture, requested, models_data)
+        except ValueError as e:
+            return web.json_response({'status': 'error', 'message': str(e)}, status=400)
+
+        jobs, skipped, missing = await _component_jobs(selected, models_data, data.get('priority'))
+        if missing:
+            logger.warning(f"[API] Provisioning {architecture_key}: no usable models_data entry for {', '.join(missing)}")
+
+        space_error = await _check_space(jobs)
+        if space_error:
+            return web.json_response({'status': 'error', **space_error}, status=507)
+
+        group = download_manager.submit_group(
+            jobs,
+            meta={'architecture': architecture_key, 'components': selected, 'unavailable': missing},
+            skipped=skipped
+        )
+        return web.json_response({
+            'status': 'initiated' if jobs else 'ready',
+            'group_id': group.id,
+            'group': group.to_dict(progress_aggregator.rate)
+        })
 
     except Exception as e:
-        logger.error(f"Error handling download request: {e}", exc_info=True)
+        logger.error(f"Error provisioning architecture: {e}", exc_info=True)
         return web.json_response({'status': 'error', 'message': 'Internal Server Error'}, status=500)
 
+_prefetching = {} # app url -> running prefetch task
+
+async def _prefetch_app_models(app_url: str) -> None:
+    architecture_key, architecture = app_architecture(app_url)
+    if not architecture:
+        return
+    keys = default_components(architecture)
+    jobs, skipped, missing = await _component_jobs(keys, load_browser_data('models_data.json') or {}, 'low')
+    jobs = [job for job in jobs if not download_manager.find_active(job.key)]
+    if not jobs:
+        return
+
+    # A guess must not push anything else out: no eviction and no waiting for space.
+    await asyncio.gather(*(_probe_job_size(job) for job in jobs))
+    reserved = [job for job in download_manager.list() if job.status in ACTIVE_STATES]
+    if await _shortfalls(jobs, reserved):
+        logger.info(f"[Downloader] Not prefetching models for {app_url}: not enough free disk space")
+        return
+
+    group = download_manager.submit_group(
+        jobs,
+        meta={'architecture': architecture_key, 'components': keys, 'unavailable': missing, 'prefetch': app_url},
+        skipped=skipped
+    )
+    logger.info(f"[Downloader] Prefetching {len(jobs)} models for {app_url} (group {group.id})")
+
+async def _run_prefetch(app_url: str) -> None:
+    try:
+        await _prefetch_app_models(app_url)
+    except Exception as e:
+        logger.error(f"[Downloader] Prefetch for {app_url} failed: {e}")
+    finally:
+        _prefetching.pop(app_url, None)
+
+def prefetch_app_models(base_path: str) -> None:
+    """
+    RouteManager open listener: queues the default models of the app being
+    opened at low priority, so they are likely on disk by the time it runs.
+    Disabled with the `prefetch_models` setting set to false.
+    """
+    app_url = base_path.strip('/').split('/', 1)[-1]
+    if app_url in _prefetching or load_settings().get('prefetch_models') is False:
+        return
+    _prefetching[app_url] = asyncio.create_task(_run_prefetch(app_url))
+
+async def get_download_group_handler(request: web.Request) -> web.Response:
+    group = download_manager.get_group(request.match_info.get('group_id', ''))
+    if not group:
+        return web.json_response({'status': 'error', 'message': 'Download group not found'}, status=404)
+    return web.json_response(group.to_dict(progress_aggregator.rate))
+
+async def model_sizes_handler(request: web.Request) -> web.Response:
+    """
+    Remote size of every models_data.json entry, keyed like the file. Sizes
+    come from the probe cache, which also remembers URLs without one for a
+    while; the others are probed unless ?cached_only=1.
+    """
+    models_data = load_browser_data('models_data.json') or {}
+    cached_only = request.query.get('cached_only', '').lower() in ('1', 'true', 'yes')
+    semaphore = asyncio.Semaphore(DOWNLOAD_PROBE_CONCURRENCY)
+
+    async def size_of(entry):
+        url = entry.get('url_model')
+        if not url:
+            return None
+        if cached_only or preflight.size_cache.known(url):
+            return preflight.size_cache.get(url)
+        try:
+            _validate_url(url)
+        except ValueError:
+            return None
+        async with semaphore:
+            return await preflight.probe_size(url, use_cache=False)
+
+    keys = list(models_data)
+    sizes = await asyncio.gather(*(size_of(models_data[key]) for key in keys))
+    return web.json_response({'sizes': dict(zip(keys, sizes))})
+
+async def list_downloads_handler(request: web.Request) -> web.Response:
+    status = request.query.get('status')
+    return web.json_response({'jobs': [job.to_dict() for job in download_manager.list(status)]})
+
+async def get_download_handler(request: web.Request) -> web.Response:
+    job = download_manager.get(request.match_info.get('job_id', ''))
+    if not job:
+        return web.json_response({'status': 'error', 'message': 'Download job not found'}, status=404)
+    return web.json_response(job.to_dict())
+
+def _download_job_action(request: web.Request, action) -> web.Response:
+    job = download_manager.get(request.match_info.get('job_id', ''))
+    if not job:
+        return web.json_response({'status': 'error', 'message': 'Download job not found'}, status=404)
+    try:
+        action(job)
+    except ValueError as e:
+        return web.json_response({'status': 'error', 'message': str(e)}, status=409)
+    return web.json_response(job.to_dict())
+
+async def pause_download_handler(request: web.Request) -> web.Response:
+    return _download_job_action(request, download_manager.pause)
+
+async def resume_download_handler(request: web.Request) -> web.Response:
+    return _download_job_action(request, download_manager.resume)
+
+async def cancel_download_handler(request: web.Request) -> web.Response:
+    return _download_job_action(request, download_manager.cancel)
+
+async def prioritize_download_handler(request: web.Request) -> web.Response:
+    try:
+        data = await request.json()
+    except Exception:
+        return web.json_response({'status': 'error', 'message': 'Invalid JSON body'}, status=400)
+    return _download_job_action(request, lambda job: download_manager.set_priority(job, data.get('priority')))
+
 async def check_model_status_handler(request: web.Request) -> web.Response:
     model_path = request.query.get('model_path', '')
     file_id = request.query.get('file_id', '')
@@ -291,13 +1016,99 @@ async def check_model_status_handler(request: web.Request) -> web.Response:
     except ValueError:
         return web.json_response({'status': 'error', 'message': 'Invalid file path.'}, status=403)
 
-    if full_file_path.exists() and full_file_path.is_file():
-        status = 'ready'
-    else:
-        status = 'missing'
+    expected_sha256 = find_model_entry(model_path, file_id).get('sha256')
+    status = model_manifest.status(full_file_path, expected_sha256)
+    if status == 'corrupt':
+        return web.json_response({'status': status, 'problem': model_scanner.problem(full_file_path)})
 
     return web.json_response({'status': status})
 
+async def model_statuses_handler(request: web.Request) -> web.Response:
+    """
+    Status and local size of every models_data.json entry (or of the keys in
+    ?keys=a,b) in one response, answered from the in-memory models index.
+    """
+    await model_index.ensure_built()
+    models_data = load_browser_data('models_data.json') or {}
+    keys = [k for k in request.query.get('keys', '').split(',') if k] or list(models_data)
+
+    statuses = {}
+    for key in keys:
+        entry = models_data.get(key) or {}
+        file_id = entry.get('id')
+        model_path = entry.get('model_path')
+        if not file_id or not model_path:
+            statuses[key] = {'status': 'missing', 'size': None}
+            continue
+        full_file_path = MODELS_DIRECTORY / model_path.strip('/\\') / file_id
+        stat = model_index.get(full_file_path)
+        statuses[key] = {
+            'status': model_index.status(full_file_path, entry.get('sha256')),
+            'size': stat[0] if stat else None,
+        }
+    return web.json_response({'statuses': statuses})
+
+async def model_cache_report_handler(request: web.Request) -> web.Response:
+    """
+    Dry run of the model cache: every model with its last use and whether it
+    may be evicted, and what would be evicted to free ?need_gb= (default: to
+    get back under the budget).
+    """
+    need = None
+    if request.query.get('need_gb'):
+        try:
+            need = int(float(request.query['need_gb']) * GB)
+        except ValueError:
+            return web.json_response({'status': 'error', 'message': 'need_gb must be a number'}, status=400)
+    await model_index.ensure_built()
+    active = [job for job in download_manager.list() if job.status in ACTIVE_STATES]
+    report = await asyncio.to_thread(model_cache.report, need, _destinations(active))
+    return web.json_response(report)
+
+async def model_tiers_handler(request: web.Request) -> web.Response:
+    """Contents of the fast model tier and the models waiting to be promoted to it."""
+    return web.json_response(fast_tier.report())
+
+async def model_integrity_handler(request: web.Request) -> web.Response:
+    """Progress of the background integrity scanner and the corrupt or truncated files it found."""
+    await model_index.ensure_built()
+    return web.json_response(await asyncio.to_thread(model_scanner.report))
+
+async def model_dedup_handler(request: web.Request) -> web.Response:
+    """
+    GET: result of the last duplicate model scan. POST: starts a scan that
+    replaces identical model files with hard links to one copy.
+    """
+    if request.method == 'POST':
+        started = dedup_scan.start()
+        return web.json_response(dedup_scan.report(), status=202 if started else 409)
+    return web.json_response(dedup_scan.report())
+
+async def pin_model_handler(request: web.Request) -> web.Response:
+    """Pins (or with "pinned": false, unpins) a model so the model cache never evicts it."""
+    try:
+        data = await request.json()
+        file_id = data.get('file_id')
+        model_path = data.get('model_path')
+        pinned = bool(data.get('pinned', True))
+
+        if not file_id or not model_path:
+            return web.json_response({'status': 'error', 'message': 'Missing file_id or model_path'}, status=400)
+
+        full_file_path = MODELS_DIRECTORY / model_path.strip('/\\') / file_id
+        try:
+            full_file_path.resolve().relative_to(MODELS_DIRECTORY.resolve())
+        except ValueError:
+            return web.json_response({'status': 'error', 'message': 'Invalid file path.'}, status=403)
+
+        rel = model_cache.set_pinned(full_file_path, pinned)
+        await asyncio.to_thread(model_cache.flush)
+        return web.json_response({'status': 'success', 'path': rel, 'pinned': pinned})
+
+    except Exception as e:
+        logger.error(f"Error pinning model: {e}")
+        return web.json_response({'status': 'error', 'message': 'Internal Server Error'}, status=500)
+
 async def delete_model_handler(request: web.Request) -> web.Response:
     try:
         data = await request.json()
@@ -316,6 +1127,10 @@ async def delete_model_handler(request: web.Request) -> web.Response:
 
         if full_file_path.exists() and full_file_path.is_file():
             os.remove(full_file_path)
+            model_manifest.forget(full_file_path)
+            model_index.update(full_file_path)
+            fast_tier.forget(full_file_path)
+            download_manager.wake() # Jobs may be waiting for the space just freed
             return web.json_response({'status': 'success', 'message': f'File {file_id} deleted.'})
         else:
             return web.json_response({'status': 'error', 'message': f'File not found at {full_file_path}'}, status=404)
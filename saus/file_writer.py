@@ -0,0 +1,107 @@
+''' Write-behind file writer used by the download loop '''
+import os
+import queue
+import asyncio
+import threading
+
+from .constants import logger, DOWNLOAD_WRITE_QUEUE_SIZE
+
+_CLOSE = object()
+
+class ChunkWriter:
+    """
+    Moves file writes off the event loop. Chunks go through a bounded queue to
+    a dedicated thread that owns the file handle, so network reads and disk
+    writes overlap and the loop only waits when the queue is full (the disk is
+    slower than the network). `written` counts bytes that reached the file and
+    is safe to read from the loop.
+
+    Use as `async with ChunkWriter(path, 'ab') as writer: await writer.write(chunk)`.
+    On exit every queued chunk is flushed (and fsynced when `fsync` is set)
+    before control returns, including when the body raised. A `hasher` (e.g.
+    hashlib.sha256()) is fed every written chunk on the writer thread.
+    """
+
+    def __init__(self, path, mode='wb', offset=None, fsync=True, hasher=None, max_pending=DOWNLOAD_WRITE_QUEUE_SIZE):
+        self.path = path
+        self.mode = mode
+        self.offset = offset
+        self.fsync = fsync
+        self.hasher = hasher
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._opened = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"saus-writer-{os.path.basename(str(path))}", daemon=True)
+
+    def _run(self) -> None:
+        f = None
+        try:
+            f = open(self.path, self.mode)
+            if self.offset is not None:
+                f.seek(self.offset)
+        except Exception as e:
+            self._error = e
+            if f is not None:
+                f.close()
+            return
+        finally:
+            self._opened.set()
+
+        while True:
+            chunk = self._queue.get()
+            if chunk is _CLOSE:
+                break
+            if self._error is not None:
+                continue # Keep draining so the producer never blocks on a dead writer
+            try:
+                f.write(chunk)
+                self.written += len(chunk)
+                if self.hasher is not None:
+                    self.hasher.update(chunk)
+            except Exception as e:
+                self._error = e
+
+        if f is not None:
+            try:
+                f.flush()
+                if self.fsync and self._error is None:
+                    os.fsync(f.fileno())
+            except Exception as e:
+                self._error = self._error or e
+            finally:
+                f.close()
+
+    async def open(self) -> "ChunkWriter":
+        self._thread.start()
+        await asyncio.to_thread(self._opened.wait)
+        if self._error is not None:
+            raise self._error
+        return self
+
+    async def write(self, chunk: bytes) -> None:
+        if self._error is not None:
+            raise self._error
+        try:
+            self._queue.put_nowait(chunk)
+        except queue.Full:
+            await asyncio.to_thread(self._queue.put, chunk)
+
+    async def close(self) -> None:
+        if not self._thread.is_alive():
+            return
+        await asyncio.to_thread(self._queue.put, _CLOSE)
+        await asyncio.to_thread(self._thread.join)
+        if self._error is not None:
+            raise self._error
+
+    async def __aenter__(self) -> "ChunkWriter":
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        try:
+            await self.close()
+        except Exception as e:
+            if exc_type is None:
+                raise
+            logger.warning(f"[Downloader] Error flushing {self.path}: {e}")
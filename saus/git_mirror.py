@@ -0,0 +1,125 @@
+''' Persistent shallow git mirrors of the repositories apps and data files come from '''
+import shutil
+import subprocess
+from pathlib import Path
+
+from .constants import DATA_DIR, APP_SYNC_GIT_TIMEOUT
+
+MIRRORS_DIR = DATA_DIR / "git_mirrors"
+UPSTREAM_REF = 'refs/saus/upstream'
+EMPTY_TREE = '4b825dc642cb6eb9a060e54bf8d69288fbee4904' # Known to every git repository
+
+def _safe_url(url: str) -> str:
+    return url.split('@')[-1] if '@' in url else url
+
+class GitMirror:
+    """
+    A bare repository under DATA_DIR that follows the default branch of
+    `origin` with shallow fetches, so a sync only downloads the objects of the
+    newest commit that the mirror does not have yet, never the history.
+
+    Whoever applies the files somewhere records the commit it applied in a
+    ref of its own (`mark`), and next time asks only for the files that
+    changed since (`changes`). With `blobs_on_demand` the fetch brings commits
+    and trees only, and file contents are fetched when they are read; for
+    repositories of which only a few files are needed.
+    """
+
+    def __init__(self, origin: str, name: str, blobs_on_demand: bool = False, root: Path = MIRRORS_DIR):
+        self.origin = origin
+        self.path = root / f"{name}.git"
+        self.blobs_on_demand = blobs_on_demand
+
+    def _git(self, *args, input: bytes = None, check: bool = True) -> bytes:
+        result = subprocess.run(
+            ['git', '--git-dir', str(self.path), *args],
+            input=input,
+            capture_output=True,
+            timeout=APP_SYNC_GIT_TIMEOUT
+        )
+        if check and result.returncode != 0:
+            error = result.stderr.decode('utf-8', 'replace').strip()
+            raise Exception(f"git {args[0]} failed for {_safe_url(self.origin)}: {error}")
+        return result.stdout
+
+    def _init(self) -> None:
+        if (self.path / 'HEAD').exists():
+            return
+        if self.path.exists():
+            shutil.rmtree(self.path) # Left over from an interrupted init
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._git('init', '--bare', '-q')
+        if self.blobs_on_demand:
+            # Lazy fetches of missing blobs go to the promisor remote.
+            self._git('config', 'core.repositoryformatversion', '1')
+            self._git('config', 'extensions.partialClone', 'origin')
+            self._git('config', 'remote.origin.url', self.origin)
+            self._git('config', 'remote.origin.promisor', 'true')
+            self._git('config', 'remote.origin.partialclonefilter', 'blob:none')
+
+    def fetch(self) -> str:
+        """Brings the mirror up to date with the head of origin; returns that commit."""
+        self._init()
+        args = ['fetch', '-q', '--depth=1', '--no-tags']
+        if self.blobs_on_demand:
+            args += ['--filter=blob:none', 'origin']
+        else:
+            args.append(self.origin) # Not stored: the URL may carry credentials
+        self._git(*args, f'+HEAD:{UPSTREAM_REF}')
+        return self.rev(UPSTREAM_REF)
+
+    def rev(self, ref: str):
+        """The commit `ref` points to, or None."""
+        out = self._git('rev-parse', '--verify', '-q', f'{ref}^{{commit}}', check=False)
+        return out.decode().strip() or None
+
+    def mark(self, ref: str, commit: str) -> None:
+        self._git('update-ref', ref, commit)
+
+    def names(self, commit: str) -> list:
+        """Names of the entries at the top of the tree of `commit`."""
+        out = self._git('ls-tree', '-z', '--name-only', commit)
+        return [name.decode('utf-8', 'surrogateescape') for name in out.split(b'\0') if name]
+
+    def changes(self, since, commit: str, prefix: str = None) -> list:
+        """
+        [(path, blob id)] of the files that differ between commit `since`
+        (None for none) and `commit`, optionally under `prefix`. The blob id
+        is None for files deleted. Submodules and symlinks are left out.
+        """
+        args = ['diff-tree', '-r', '-z', '--no-renames', since or EMPTY_TREE, commit]
+        if prefix:
+            args += ['--', prefix]
+        fields = self._git(*args).split(b'\0')
+        changes = []
+        for meta, path in zip(fields[0::2], fields[1::2]):
+            _, new_mode, _, new_id, status = meta.decode().split(' ')
+            if status == 'D':
+                changes.append((path.decode('utf-8', 'surrogateescape'), None))
+            elif new_mode.startswith('100'):
+                changes.append((path.decode('utf-8', 'surrogateescape'), new_id))
+        return changes
+
+    def read(self, blob_ids) -> dict:
+        """{blob id: contents} of the given blobs."""
+        blob_ids = list(dict.fromkeys(blob_ids))
+        if not blob_ids:
+            return {}
+        out = self._git('cat-file', '--batch', input=''.join(f'{b}\n' for b in blob_ids).encode())
+        blobs = {}
+        pos = 0
+        for blob_id in blob_ids:
+            end = out.index(b'\n', pos)
+            header = out[pos:end].decode().split(' ')
+            pos = end + 1
+            if header[-1] == 'missing':
+                raise Exception(f"git object {blob_id} is missing from the mirror of {_safe_url(self.origin)}")
+            size = int(header[2])
+            blobs[blob_id] = out[pos:pos + size]
+            pos += size + 1
+        return blobs
+
+    def read_path(self, commit: str, path: str):
+        """Contents of `path` at `commit`, or None when it does not exist there."""
+        blob_id = self._git('rev-parse', '--verify', '-q', f'{commit}:{path}', check=False).decode().strip()
+        return self.read([blob_id])[blob_id] if blob_id else None
@@ -3,6 +3,7 @@ import re
 import base64
 import json
 import hashlib
+import threading
 import urllib.parse
 from pathlib import Path
 import secrets
@@ -10,7 +11,7 @@ from itertools import cycle
 import stat
 
 from .constants import (
-    SAUS_APPS_PATH, DATA_DIR, ALLOWED_EXTENSIONS, logger, SAUSMSG,
+    SAUS_APPS_PATH, SAUS_BROWSER_PATH, DATA_DIR, ALLOWED_EXTENSIONS, logger, SAUSMSG,
     PREVIEWS_REGISTRY_DIR, PREVIEWS_IMAGES_DIR, FILE_REGISTRY_DIR, FILE_IMAGES_DIR
 )
 
@@ -24,6 +25,119 @@ def ensure_data_folders():
     except Exception as e:
         logger.error(f"{SAUSMSG}: Could not create data dirs: {e}")
 
+def load_settings() -> dict:
+    settings_file = DATA_DIR / "settings.json"
+    if not settings_file.exists():
+        return {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"{SAUSMSG}: Error reading settings: {e}")
+        return {}
+
+def atomic_write_json(path: Path, data, indent=None, fsync: bool = False) -> None:
+    """
+    Writes `data` as JSON to `path` through a temporary file and a rename, so
+    readers never see a partial file. `data` may be JSON text already, e.g.
+    serialized under the lock of the state it comes from. With `fsync` the
+    contents reach the disk before the rename.
+    """
+    text = data if isinstance(data, str) else json.dumps(data, indent=indent)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A name of its own per writing thread, so concurrent saves never share a temporary file.
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+_browser_data_cache = {}
+
+def load_browser_data(filename: str):
+    """
+    Loads one of the SAUS browser data files (app_list.json, architectures.json,
+    models_data.json). Parsed contents are kept until the file's mtime changes;
+    callers must not modify the returned data.
+    """
+    data_file = SAUS_BROWSER_PATH / "data" / filename
+    try:
+        mtime = os.stat(data_file).st_mtime
+    except OSError:
+        return None
+    cached = _browser_data_cache.get(filename)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(data_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error(f"{SAUSMSG}: Error reading {filename}: {e}")
+        return None
+    _browser_data_cache[filename] = (mtime, data)
+    return data
+
+def find_model_entry(model_path: str, file_id: str) -> dict:
+    """Returns the models_data.json entry for a model_path/file id pair, or an empty dict."""
+    models_data = load_browser_data("models_data.json") or {}
+    wanted_path = pathToKey(model_path or '').strip('/')
+    for entry in models_data.values():
+        if entry.get('id') == file_id and pathToKey(entry.get('model_path') or '').strip('/') == wanted_path:
+            return entry
+    return {}
+
+def model_entry_path(entry: dict):
+    """Path of a models_data.json entry relative to MODELS_DIRECTORY, or None."""
+    if not entry.get('id') or not entry.get('model_path'):
+        return None
+    return f"{pathToKey(entry['model_path']).strip('/')}/{entry['id']}"
+
+def app_architecture(app_url: str):
+    """(architecture key, architectures.json entry) of an app in app_list.json, or (None, {})."""
+    app = next((a for a in load_browser_data('app_list.json') or [] if a.get('url') == app_url), None)
+    if not app or not app.get('architecture'):
+        return None, {}
+    key = app['architecture']
+    return key, (load_browser_data('architectures.json') or {}).get(key) or {}
+
+def default_components(architecture: dict) -> list:
+    """
+    Component keys an architecture runs with out of the box: the compulsory
+    ones plus the models and LoRAs of its base_settings (the first
+    at_least_one entry when it has no base_settings).
+    """
+    components = architecture.get('components', {})
+    base_settings = architecture.get('base_settings') or {}
+    keys = list(components.get('compulsory', []))
+    if base_settings:
+        keys += list(base_settings.get('model') or []) + list(base_settings.get('lora') or [])
+    else:
+        keys += components.get('at_least_one', [])[:1]
+    return list(dict.fromkeys(keys))
+
+def app_model_paths(app_url: str, groups=('compulsory', 'at_least_one', 'optional')) -> list:
+    """Relative model paths of the components an app's architecture lists in `groups`."""
+    _, architecture = app_architecture(app_url)
+    components = architecture.get('components', {})
+    models_data = load_browser_data('models_data.json') or {}
+    paths = []
+    for group in groups:
+        for key in components.get(group, []):
+            rel = model_entry_path(models_data.get(key) or {})
+            if rel and rel not in paths:
+                paths.append(rel)
+    return paths
+
 def pathToKey(model_path: str) -> str:
     return model_path.replace('\\', '/')
 
@@ -0,0 +1,61 @@
+''' Long-lived, pooled aiohttp session shared by all outbound transfers '''
+import aiohttp
+
+from .constants import (
+    SAUSMSG, logger, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+)
+from .helpers import load_settings
+
+_session = None
+
+def _setting(settings: dict, key: str, default):
+    try:
+        value = settings.get(key)
+        return type(default)(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        logger.warning(f"{SAUSMSG}: Ignoring invalid value for setting '{key}': {settings.get(key)}")
+        return default
+
+def _create_session() -> aiohttp.ClientSession:
+    settings = load_settings()
+    connector = aiohttp.TCPConnector(
+        limit=_setting(settings, 'http_pool_limit', HTTP_POOL_LIMIT),
+        limit_per_host=_setting(settings, 'http_pool_limit_per_host', HTTP_POOL_LIMIT_PER_HOST),
+        ttl_dns_cache=_setting(settings, 'http_dns_cache_ttl', HTTP_DNS_CACHE_TTL),
+        keepalive_timeout=_setting(settings, 'http_keepalive_timeout', HTTP_KEEPALIVE_TIMEOUT),
+    )
+    # No total timeout by default: model downloads can legitimately take hours.
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        connect=_setting(settings, 'http_connect_timeout', HTTP_CONNECT_TIMEOUT),
+        sock_read=_setting(settings, 'http_read_timeout', HTTP_READ_TIMEOUT),
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        headers={'User-Agent': 'ComfyUI-SAUS'}
+    )
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Returns the shared session, creating it on first use. Must be called from
+    inside the running event loop.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+async def close_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+async def on_startup(app) -> None:
+    get_session()
+    logger.info(f"{SAUSMSG}: Shared HTTP session ready.")
+
+async def on_cleanup(app) -> None:
+    await close_session()
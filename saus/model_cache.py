@@ -0,0 +1,272 @@
+''' Disk-budgeted least-recently-used eviction of downloaded models '''
+import os
+import json
+import time
+import asyncio
+import threading
+
+from .constants import (
+    DATA_DIR, SAUSMSG, logger,
+    MODEL_CACHE_ACTIVE_APP_WINDOW, MODEL_CACHE_FLUSH_INTERVAL
+)
+from .helpers import load_settings, load_browser_data, model_entry_path, app_model_paths, atomic_write_json
+from .model_index import model_index
+from . import model_manifest
+from .model_tiers import fast_tier
+
+STATE_FILE = DATA_DIR / "model_cache.json"
+GB = 1024 ** 3
+
+MODEL_EXTENSIONS = ('.safetensors', '.ckpt', '.pt', '.pth', '.bin', '.gguf', '.sft', '.onnx')
+
+def budget_bytes(settings: dict) -> int:
+    """`model_cache_budget_gb` from settings in bytes; 0 disables eviction."""
+    try:
+        return int(max(0.0, float(settings.get('model_cache_budget_gb') or 0)) * GB)
+    except (TypeError, ValueError):
+        logger.warning(f"{SAUSMSG}: Ignoring invalid model_cache_budget_gb: {settings.get('model_cache_budget_gb')}")
+        return 0
+
+def _catalog_paths() -> dict:
+    """{relative path: models_data key} for every model the SAUS browser can download again."""
+    paths = {}
+    for key, entry in (load_browser_data('models_data.json') or {}).items():
+        rel = model_entry_path(entry)
+        if rel:
+            paths[rel] = key
+    return paths
+
+class ModelCache:
+    """
+    Keeps MODELS_DIRECTORY under the `model_cache_budget_gb` setting by
+    deleting the least recently used models when a new download needs room.
+
+    Last use comes from ComfyUI loading a model (folder_paths.get_full_path),
+    from SAUS finishing a download, and otherwise from the file's mtime in the
+    model index. Never evicted: pinned models, models of apps opened in the
+    last MODEL_CACHE_ACTIVE_APP_WINDOW seconds, files being downloaded and,
+    unless `model_cache_scope` is 'all', anything that is not in
+    models_data.json (and so could not be downloaded again).
+    """
+
+    def __init__(self, index=model_index, path=STATE_FILE):
+        self.index = index
+        self.path = path
+        self.send = None # Broadcast function, set once the server is running
+        self._lock = threading.Lock()
+        self._state = None
+        self._dirty = False
+        self._flush_task = None
+        self.active_apps = {} # app url -> time it was last opened
+
+    def _load(self) -> dict:
+        if self._state is None:
+            self._state = {'last_used': {}, 'pinned': []}
+            if self.path.exists():
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._state.update(json.load(f))
+                except Exception as e:
+                    logger.error(f"{SAUSMSG}: Could not read model cache state: {e}")
+        return self._state
+
+    def flush(self) -> None:
+        """Writes recorded usage and pins if they changed. Blocking; call via asyncio.to_thread."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._load(), indent=2)
+            self._dirty = False
+        atomic_write_json(self.path, data)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(MODEL_CACHE_FLUSH_INTERVAL)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"{SAUSMSG}: Could not write model cache state: {e}")
+
+    def touch(self, path) -> None:
+        """Records that a model was used now. Cheap; safe to call from any thread."""
+        try:
+            rel = self.index.key(path)
+        except ValueError:
+            return
+        with self._lock:
+            self._load()['last_used'][rel] = time.time()
+            self._dirty = True
+
+    def set_pinned(self, path, pinned: bool) -> str:
+        rel = self.index.key(path)
+        with self._lock:
+            pins = self._load()['pinned']
+            if pinned and rel not in pins:
+                pins.append(rel)
+            elif not pinned and rel in pins:
+                pins.remove(rel)
+            self._dirty = True
+        return rel
+
+    def app_opened(self, base_path: str) -> None:
+        """RouteManager open listener: remembers which apps are in use."""
+        self.active_apps[base_path.strip('/').split('/', 1)[-1]] = time.time()
+
+    def _active_app_models(self) -> dict:
+        """{relative path: app url} for the components of recently opened apps."""
+        cutoff = time.time() - MODEL_CACHE_ACTIVE_APP_WINDOW
+        protected = {}
+        for url, opened in self.active_apps.items():
+            if opened >= cutoff:
+                for rel in app_model_paths(url):
+                    protected[rel] = url
+        return protected
+
+    def inventory(self, settings: dict, exclude=()) -> list:
+        """
+        Every model file with its size, last use and whether it may be evicted
+        (`reason` says why not), least recently used first.
+        """
+        catalog = _catalog_paths()
+        all_files = settings.get('model_cache_scope') == 'all'
+        active = self._active_app_models()
+        excluded = set()
+        for path in exclude:
+            try:
+                excluded.add(self.index.key(path))
+            except ValueError:
+                continue
+        with self._lock:
+            state = self._load()
+            last_used = dict(state['last_used'])
+            pinned = set(state['pinned'])
+
+        items = []
+        for rel, (size, mtime) in self.index.files().items():
+            if not rel.lower().endswith(MODEL_EXTENSIONS):
+                continue
+            reason = None
+            if rel in pinned:
+                reason = 'pinned'
+            elif rel in active:
+                reason = f"used by app {active[rel]}"
+            elif rel in excluded:
+                reason = 'downloading'
+            elif not all_files and rel not in catalog:
+                reason = 'not in catalog'
+            items.append({
+                'path': rel,
+                'size': size,
+                'last_used': max(last_used.get(rel, 0), mtime),
+                'evictable': reason is None,
+                'reason': reason,
+            })
+        items.sort(key=lambda item: item['last_used'])
+        return items
+
+    def plan(self, need: int, settings: dict, exclude=()) -> tuple:
+        """(files to evict, bytes freed) for freeing `need` bytes, oldest first."""
+        victims, freed = [], 0
+        if need <= 0:
+            return victims, freed
+        for item in self.inventory(settings, exclude):
+            if freed >= need:
+                break
+            if item['evictable']:
+                victims.append(item)
+                freed += item['size']
+        return victims, freed
+
+    def evict(self, victims: list) -> list:
+        """Deletes the planned files. Blocking; call via asyncio.to_thread."""
+        removed = []
+        for item in victims:
+            path = self.index.root / item['path']
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"{SAUSMSG}: Could not evict {path}: {e}")
+                continue
+            model_manifest.forget(path)
+            self.index.update(path)
+            fast_tier.forget(path)
+            with self._lock:
+                self._load()['last_used'].pop(item['path'], None)
+                self._dirty = True
+            logger.info(f"{SAUSMSG}: Evicted {item['path']} ({item['size']} bytes) to stay within the model cache budget")
+            removed.append(item)
+        return removed
+
+    async def make_room(self, incoming: int, disk_shortfall: int = 0, exclude=()) -> list:
+        """
+        Called before downloads of `incoming` bytes into MODELS_DIRECTORY start.
+        Evicts what is needed to keep the budget and to cover `disk_shortfall`;
+        evicts nothing when that much cannot be freed. No-op without a budget.
+        """
+        settings = load_settings()
+        budget = budget_bytes(settings)
+        if not budget:
+            return []
+        await self.index.ensure_built()
+        used = sum(size for size, _ in self.index.files().values())
+        need = max(used + incoming - budget, disk_shortfall)
+        if need <= 0:
+            return []
+        victims, freed = self.plan(need, settings, exclude)
+        if freed < need:
+            logger.warning(
+                f"{SAUSMSG}: Model cache needs {need} bytes but only {freed} are evictable; nothing evicted"
+            )
+            return []
+        removed = await asyncio.to_thread(self.evict, victims)
+        await asyncio.to_thread(self.flush)
+        if removed and self.send:
+            self.send('models_evicted', {'files': [item['path'] for item in removed]})
+        return removed
+
+    def report(self, need: int = None, exclude=()) -> dict:
+        """Dry run: what make_room would evict for `need` bytes (default: to get back under budget)."""
+        settings = load_settings()
+        budget = budget_bytes(settings)
+        inventory = self.inventory(settings, exclude)
+        used = sum(size for size, _ in self.index.files().values())
+        if need is None:
+            need = max(0, used - budget) if budget else 0
+        victims, freed = self.plan(need, settings, exclude)
+        return {
+            'enabled': bool(budget),
+            'budget_bytes': budget,
+            'used_bytes': used,
+            'need_bytes': need,
+            'would_evict': victims,
+            'would_free_bytes': freed,
+            'sufficient': freed >= need,
+            'active_apps': sorted(self.active_apps),
+            'models': inventory,
+        }
+
+model_cache = ModelCache()
+
+def install_load_hook() -> None:
+    """Records a use whenever ComfyUI resolves a model file for loading."""
+    try:
+        import folder_paths
+        original_get_full_path = folder_paths.get_full_path
+
+        def get_full_path(folder_name, filename):
+            path = original_get_full_path(folder_name, filename)
+            if path:
+                model_cache.touch(path)
+            return path
+
+        folder_paths.get_full_path = get_full_path
+    except Exception as e:
+        logger.error(f"{SAUSMSG}: Could not hook model loading for the model cache: {e}")
+
+async def on_startup(app) -> None:
+    model_cache._flush_task = asyncio.create_task(model_cache._flush_loop())
+
+async def on_cleanup(app) -> None:
+    if model_cache._flush_task:
+        model_cache._flush_task.cancel()
+    await asyncio.to_thread(model_cache.flush)
@@ -0,0 +1,203 @@
+''' In-memory inventory of the models directory '''
+import os
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+from .constants import MODELS_DIRECTORY, SAUSMSG, logger, MODEL_INDEX_REFRESH_INTERVAL
+from . import model_manifest
+
+# Files that belong to downloads in progress, not models.
+_TRANSIENT_SUFFIXES = ('.part', '.segments', '.lock', '.tmp', '.stale')
+
+class ModelIndex:
+    """
+    Size and mtime of every file under `root`, built with one walk and then
+    kept current by mtime diffing: adding, removing or renaming an entry bumps
+    its directory's mtime, so a refresh only stats the known directories and
+    rescans the ones that changed. Downloads and deletions made by SAUS update
+    the index directly through `update`.
+
+    Queries never touch the disk; they trigger a background refresh when the
+    index is older than MODEL_INDEX_REFRESH_INTERVAL seconds.
+    """
+
+    def __init__(self, root=MODELS_DIRECTORY, refresh_interval=MODEL_INDEX_REFRESH_INTERVAL):
+        self.root = Path(root)
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._files = {}  # relative posix path -> (size, mtime)
+        self._dirs = {}   # relative posix path -> mtime
+        self._built = False
+        self._refreshed_at = 0.0
+        self._task = None
+
+    def key(self, path) -> str:
+        """Relative posix key of `path`; ValueError when it is outside the root."""
+        try:
+            rel = Path(os.path.abspath(path)).relative_to(os.path.abspath(self.root))
+        except ValueError:
+            rel = Path(path).resolve().relative_to(self.root.resolve())
+        rel = rel.as_posix()
+        return '' if rel == '.' else rel
+
+    def _path(self, rel: str) -> Path:
+        return self.root / rel if rel else self.root
+
+    def _scan_dir(self, rel_dir: str, files: dict, dirs: dict, seen: set) -> None:
+        """Records one directory and everything below it."""
+        path = self._path(rel_dir)
+        try:
+            real = os.path.realpath(path)
+            if real in seen:
+                return # Symlink loop
+            seen.add(real)
+            dirs[rel_dir] = os.stat(path).st_mtime
+            entries = list(os.scandir(path))
+        except OSError:
+            return
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir():
+                    self._scan_dir(rel, files, dirs, seen)
+                elif entry.is_file() and not entry.name.endswith(_TRANSIENT_SUFFIXES):
+                    stat = entry.stat()
+                    files[rel] = (stat.st_size, stat.st_mtime)
+            except OSError:
+                continue
+
+    def build(self) -> None:
+        """Full walk. Blocking; call via asyncio.to_thread."""
+        started = time.monotonic()
+        files, dirs = {}, {}
+        self._scan_dir('', files, dirs, set())
+        with self._lock:
+            self._files, self._dirs = files, dirs
+            self._built = True
+            self._refreshed_at = time.monotonic()
+        logger.info(f"{SAUSMSG}: Indexed {len(files)} model files in {time.monotonic() - started:.2f}s")
+
+    def refresh(self) -> None:
+        """
+        Re-lists only the directories whose mtime changed, walking directories
+        that appeared since the last pass. Blocking; call via asyncio.to_thread.
+        """
+        if not self._built:
+            self.build()
+            return
+        with self._lock:
+            known_dirs = dict(self._dirs)
+
+        listed = {}   # changed dir -> {file rel: (size, mtime)} of its direct children
+        removed = []  # dirs whose whole subtree is gone
+        files, dirs = {}, {}
+        for rel_dir, mtime in known_dirs.items():
+            path = self._path(rel_dir)
+            try:
+                current = os.stat(path).st_mtime
+                if current == mtime:
+                    continue
+                entries = list(os.scandir(path))
+            except OSError:
+                removed.append(rel_dir)
+                continue
+            dirs[rel_dir] = current
+            children = {}
+            subdirs = set()
+            for entry in entries:
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    if entry.is_dir():
+                        subdirs.add(rel)
+                        if rel not in known_dirs:
+                            self._scan_dir(rel, files, dirs, set())
+                    elif entry.is_file() and not entry.name.endswith(_TRANSIENT_SUFFIXES):
+                        stat = entry.stat()
+                        children[rel] = (stat.st_size, stat.st_mtime)
+                except OSError:
+                    continue
+            listed[rel_dir] = children
+            removed.extend(
+                d for d in known_dirs
+                if d and d.rpartition('/')[0] == rel_dir and d not in subdirs
+            )
+
+        if listed or removed:
+            with self._lock:
+                for rel_dir in removed:
+                    prefix = rel_dir + '/'
+                    self._files = {k: v for k, v in self._files.items() if not k.startswith(prefix)}
+                    self._dirs = {k: v for k, v in self._dirs.items() if k != rel_dir and not k.startswith(prefix)}
+                for rel_dir, children in listed.items():
+                    self._files = {k: v for k, v in self._files.items() if k.rpartition('/')[0] != rel_dir}
+                    self._files.update(children)
+                self._files.update(files)
+                self._dirs.update(dirs)
+        self._refreshed_at = time.monotonic()
+
+    async def refresh_async(self) -> None:
+        try:
+            await asyncio.to_thread(self.refresh)
+        except Exception as e:
+            logger.error(f"{SAUSMSG}: Model index refresh failed: {e}")
+
+    def maybe_refresh(self) -> None:
+        """Starts a background refresh when the index is stale and none is running."""
+        if time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.refresh_async())
+
+    async def ensure_built(self) -> None:
+        if not self._built:
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self.refresh_async())
+            await asyncio.shield(self._task)
+        else:
+            self.maybe_refresh()
+
+    def update(self, path) -> None:
+        """Records the current state of one file (or its absence) right away."""
+        try:
+            rel = self.key(path)
+        except ValueError:
+            return
+        try:
+            stat = os.stat(path)
+            value = (stat.st_size, stat.st_mtime)
+        except OSError:
+            value = None
+        with self._lock:
+            if value is None:
+                self._files.pop(rel, None)
+            else:
+                self._files[rel] = value
+
+    def files(self) -> dict:
+        """Snapshot of {relative path: (size, mtime)}."""
+        with self._lock:
+            return dict(self._files)
+
+    def get(self, path):
+        """(size, mtime) of the file at `path`, or None when it is not in the index."""
+        try:
+            rel = self.key(path)
+        except ValueError:
+            return None
+        with self._lock:
+            return self._files.get(rel)
+
+    def status(self, path, expected_sha256: str = None) -> str:
+        """Same answers as model_manifest.status, from memory."""
+        stat = self.get(path)
+        if stat is None:
+            return 'missing'
+        return model_manifest.state_for(path, stat[0], stat[1], expected_sha256)
+
+model_index = ModelIndex()
+
+async def on_startup(app) -> None:
+    # Built in the background; queries made before it finishes wait for it.
+    model_index._task = asyncio.create_task(model_index.refresh_async())
@@ -0,0 +1,150 @@
+''' Local manifest of SHA-256 hashes for files in the models directory '''
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+from .constants import DATA_DIR, MODELS_DIRECTORY, SAUSMSG, logger, DOWNLOAD_CHUNK_SIZE
+from .helpers import atomic_write_json
+
+MANIFEST_FILE = DATA_DIR / "model_manifest.json"
+
+_lock = threading.Lock()
+_entries = None
+
+def _key(path) -> str:
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(MODELS_DIRECTORY.resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+def _load() -> dict:
+    global _entries
+    if _entries is None:
+        _entries = {}
+        if MANIFEST_FILE.exists():
+            try:
+                with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                    _entries = json.load(f)
+            except Exception as e:
+                logger.error(f"{SAUSMSG}: Could not read model manifest, starting empty: {e}")
+    return _entries
+
+def _save() -> None:
+    atomic_write_json(MANIFEST_FILE, _entries, indent=2)
+
+def hash_file(path, length=None) -> "hashlib._Hash":
+    """Returns a sha256 object fed with the first `length` bytes of `path` (all of it by default)."""
+    hasher = hashlib.sha256()
+    remaining = length
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            size = DOWNLOAD_CHUNK_SIZE if remaining is None else min(DOWNLOAD_CHUNK_SIZE, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return hasher
+
+def record(path, sha256: str, expected_sha256: str = None, problem: str = None) -> dict:
+    """
+    Stores the hash of a file together with its current size and mtime, and
+    whether it matched the expected hash. A `problem` found some other way
+    (e.g. a truncated file) marks it corrupt as well. Blocking; call via asyncio.to_thread.
+    """
+    stat = os.stat(path)
+    if expected_sha256:
+        state = 'verified' if sha256.lower() == expected_sha256.lower() else 'corrupt'
+    else:
+        state = 'hashed'
+    if problem:
+        state = 'corrupt'
+    entry = {
+        'sha256': sha256,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'state': state,
+    }
+    if expected_sha256:
+        entry['expected_sha256'] = expected_sha256.lower()
+    if problem:
+        entry['problem'] = problem
+    with _lock:
+        _load()[_key(path)] = entry
+        _save()
+    return entry
+
+def forget(path) -> None:
+    with _lock:
+        if _load().pop(_key(path), None) is not None:
+            _save()
+
+def link(source, path) -> None:
+    """
+    Gives `path`, a hard link or clone of `source`, the hash recorded for
+    `source` so it does not have to be read again. Blocking; call via asyncio.to_thread.
+    """
+    entry = lookup(source)
+    if not entry:
+        return
+    stat = os.stat(path)
+    if (stat.st_size, stat.st_mtime) != (entry['size'], entry['mtime']):
+        # A clone gets its own mtime; the content is the same.
+        entry = {**entry, 'size': stat.st_size, 'mtime': stat.st_mtime}
+    with _lock:
+        _load()[_key(path)] = dict(entry)
+        _save()
+
+def paths_with_hash(sha256: str) -> list:
+    """Files whose recorded hash is `sha256`; callers check with lookup() that they are unchanged."""
+    sha256 = sha256.lower()
+    with _lock:
+        keys = [key for key, entry in _load().items() if entry.get('sha256', '').lower() == sha256]
+    return [Path(key) if Path(key).is_absolute() else MODELS_DIRECTORY / key for key in keys]
+
+def lookup(path, size=None, mtime=None):
+    """
+    Returns the manifest entry for `path` if the file has not changed since it
+    was hashed. `size` and `mtime` skip the stat when the caller knows them.
+    """
+    if size is None or mtime is None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        size, mtime = stat.st_size, stat.st_mtime
+    with _lock:
+        entry = _load().get(_key(path))
+    if not entry or entry.get('size') != size or entry.get('mtime') != mtime:
+        return None
+    return entry
+
+def state_for(path, size, mtime, expected_sha256: str = None) -> str:
+    """status() for a file known to exist with the given size and mtime."""
+    entry = lookup(path, size, mtime)
+    if not entry:
+        return 'unverified'
+    if entry.get('problem'):
+        return 'corrupt'
+    if expected_sha256:
+        return 'ready' if entry['sha256'].lower() == expected_sha256.lower() else 'corrupt'
+    return 'corrupt' if entry.get('state') == 'corrupt' else 'ready'
+
+def status(path, expected_sha256: str = None) -> str:
+    """
+    'missing' when there is no file, 'corrupt' when its recorded hash does not
+    match the expected one, 'ready' when the recorded hash is current and
+    consistent, and 'unverified' when the file was never hashed or changed
+    since. Never reads the file contents.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 'missing'
+    if not os.path.isfile(path):
+        return 'missing'
+    return state_for(path, stat.st_size, stat.st_mtime, expected_sha256)
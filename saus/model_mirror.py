@@ -0,0 +1,60 @@
+''' Serving the models directory to other SAUS instances, and using such a mirror '''
+import hmac
+import asyncio
+from urllib.parse import quote
+from aiohttp import web
+
+from .constants import MODELS_DIRECTORY
+from .helpers import load_settings, decrypt_value
+from . import model_manifest
+from .model_index import _TRANSIENT_SUFFIXES # Files of downloads in progress are never served
+
+MIRROR_ROUTE = '/saus/api/mirror'
+TOKEN_HEADER = 'X-SAUS-Mirror-Token'
+HASH_HEADER = 'X-SAUS-SHA256'
+
+def _mirror_token(settings: dict):
+    return decrypt_value(settings.get('mirror_token')) or None
+
+def mirror_source(rel_path: str):
+    """
+    (url, headers) of `rel_path` (relative to the models directory) on the
+    mirror configured in the `mirror_url` setting, or None without one.
+    """
+    settings = load_settings()
+    base = (settings.get('mirror_url') or '').rstrip('/')
+    if not base or not rel_path:
+        return None
+    headers = {}
+    token = _mirror_token(settings)
+    if token:
+        headers[TOKEN_HEADER] = token
+    return f"{base}{MIRROR_ROUTE}/{quote(rel_path.strip('/'))}", headers
+
+async def mirror_file_handler(request: web.Request) -> web.StreamResponse:
+    """
+    Serves a file of the models directory to other SAUS instances when the
+    `mirror_serve` setting is on. Range requests are answered by FileResponse;
+    the SHA-256 from the model manifest, when current, is sent in X-SAUS-SHA256.
+    """
+    settings = load_settings()
+    if str(settings.get('mirror_serve', False)).lower() not in ('1', 'true', 'yes', 'on'):
+        return web.json_response({'status': 'error', 'message': 'Mirror mode is not enabled'}, status=404)
+    token = _mirror_token(settings)
+    if token and not hmac.compare_digest(request.headers.get(TOKEN_HEADER, ''), token):
+        return web.json_response({'status': 'error', 'message': 'Invalid mirror token'}, status=403)
+
+    rel_path = request.match_info.get('path', '')
+    file_path = MODELS_DIRECTORY / rel_path
+    try:
+        file_path.resolve().relative_to(MODELS_DIRECTORY.resolve())
+    except ValueError:
+        return web.json_response({'status': 'error', 'message': 'Invalid file path.'}, status=403)
+    if file_path.name.endswith(_TRANSIENT_SUFFIXES) or not file_path.is_file():
+        return web.json_response({'status': 'error', 'message': 'File not found'}, status=404)
+
+    headers = {}
+    entry = await asyncio.to_thread(model_manifest.lookup, file_path)
+    if entry:
+        headers[HASH_HEADER] = entry['sha256']
+    return web.FileResponse(file_path, headers=headers)
@@ -0,0 +1,288 @@
+''' Background integrity scanning of the models directory '''
+import os
+import json
+import mmap
+import time
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .constants import (
+    DATA_DIR, SAUSMSG, logger,
+    MODEL_SCAN_WORKERS, MODEL_SCAN_CHUNK_SIZE, MODEL_SCAN_INTERVAL,
+    MODEL_SCAN_PAUSE_POLL, MODEL_SCAN_CHECKPOINT_INTERVAL
+)
+from .helpers import load_settings, load_browser_data, model_entry_path, atomic_write_json
+from .model_index import model_index
+from .model_cache import MODEL_EXTENSIONS
+from .bandwidth import prompt_running
+from . import model_manifest
+
+STATE_FILE = DATA_DIR / "model_scan.json"
+
+SAFETENSORS_MAX_HEADER = 100 * 1024 * 1024
+
+def hash_file_mapped(path: str, chunk_size: int = MODEL_SCAN_CHUNK_SIZE, pause=None) -> str:
+    """
+    SHA-256 of a file read through a memory map. hashlib releases the GIL
+    while it digests a chunk, so this runs in threads. `pause`, when given,
+    is called between chunks and may block, or raise to abandon the file.
+    """
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hasher.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(mapped), chunk_size):
+                    if pause is not None:
+                        pause()
+                    hasher.update(view[offset:offset + chunk_size])
+            finally:
+                view.release()
+    return hasher.hexdigest()
+
+def check_safetensors(path, size: int):
+    """Why a .safetensors file is unusable (truncated, bad header), or None when its layout is intact."""
+    if size < 8:
+        return f"truncated: {size} bytes, shorter than a safetensors header"
+    with open(path, 'rb') as f:
+        header_size = int.from_bytes(f.read(8), 'little')
+        if header_size > SAFETENSORS_MAX_HEADER:
+            return f"invalid safetensors header length {header_size}"
+        if 8 + header_size > size:
+            return f"truncated: {size} of at least {8 + header_size} bytes"
+        try:
+            header = json.loads(f.read(header_size))
+            data_end = max(
+                (int(tensor['data_offsets'][1]) for name, tensor in header.items() if name != '__metadata__'),
+                default=0
+            )
+        except (ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+            return f"invalid safetensors header: {e}"
+    expected = 8 + header_size + data_end
+    if size < expected:
+        return f"truncated: {size} of {expected} bytes"
+    return None
+
+def _expected_hashes() -> dict:
+    """{relative path: sha256} for the models_data.json entries that list a hash."""
+    hashes = {}
+    for entry in (load_browser_data('models_data.json') or {}).values():
+        rel = model_entry_path(entry)
+        if rel and entry.get('sha256'):
+            hashes[rel] = entry['sha256']
+    return hashes
+
+class ModelScanner:
+    """
+    Verifies every model file in the background: safetensors files get a
+    layout check that catches truncation, and every file is hashed (in a
+    small thread pool, MODEL_SCAN_WORKERS files at a time, through
+    memory-mapped reads) and compared with the hash models_data.json lists
+    for it. Results go to the model manifest, so model status checks report
+    damaged files as 'corrupt'.
+
+    Scanned files are checkpointed with their size and mtime, so a restart
+    continues where it stopped and later passes only look at files that
+    changed. Scanning waits while ComfyUI is executing prompts, also in the
+    middle of hashing a file.
+    """
+
+    def __init__(self, index=model_index, path=STATE_FILE):
+        self.index = index
+        self.path = path
+        self._lock = threading.Lock()
+        self._checked = None # relative path -> {'size', 'mtime', 'status', 'problem', 'checked_at'}
+        self._saved_at = 0.0
+        self._pool = None
+        self._stopping = threading.Event()
+        self._task = None
+        self.current = set() # files being scanned
+        self.paused = False
+        self.pass_finished_at = None
+
+    def _load(self) -> dict:
+        if self._checked is None:
+            self._checked = {}
+            if self.path.exists():
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._checked = json.load(f)
+                except Exception as e:
+                    logger.warning(f"{SAUSMSG}: Ignoring unreadable integrity scan state {self.path}: {e}")
+        return self._checked
+
+    def flush(self) -> None:
+        """Blocking; call via asyncio.to_thread."""
+        with self._lock:
+            data = json.dumps(self._load())
+        atomic_write_json(self.path, data)
+        self._saved_at = time.monotonic()
+
+    def pending(self) -> list:
+        """Model files not scanned yet, or changed since they were."""
+        with self._lock:
+            checked = dict(self._load())
+        pending = []
+        for rel, (size, mtime) in self.index.files().items():
+            if not rel.lower().endswith(MODEL_EXTENSIONS):
+                continue
+            done = checked.get(rel)
+            if not done or (done['size'], done['mtime']) != (size, mtime):
+                pending.append(rel)
+        return pending
+
+    def _pause_while_busy(self) -> None:
+        """Called by the hashing threads between chunks."""
+        while prompt_running() and not self._stopping.is_set():
+            self.paused = True
+            time.sleep(MODEL_SCAN_PAUSE_POLL)
+        self.paused = False
+        if self._stopping.is_set():
+            raise InterruptedError("Integrity scan stopped")
+
+    async def _hash(self, path) -> str:
+        loop = asyncio.get_running_loop() # Before start, in the loop's default executor
+        return await loop.run_in_executor(self._pool, hash_file_mapped, str(path), MODEL_SCAN_CHUNK_SIZE, self._pause_while_busy)
+
+    async def scan_file(self, rel: str, expected_sha256: str = None) -> None:
+        path = self.index.root / rel
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return # Deleted since it was listed
+        problem = None
+        if rel.lower().endswith('.safetensors'):
+            problem = await asyncio.to_thread(check_safetensors, path, stat.st_size)
+
+        entry = model_manifest.lookup(path, stat.st_size, stat.st_mtime)
+        sha256 = entry['sha256'] if entry else await self._hash(path)
+        try:
+            current = os.stat(path)
+        except OSError:
+            return
+        if (current.st_size, current.st_mtime) != (stat.st_size, stat.st_mtime):
+            return # Changed while being read; the next pass picks it up
+        if not entry or problem or (expected_sha256 and entry.get('expected_sha256') != expected_sha256.lower()):
+            await asyncio.to_thread(model_manifest.record, path, sha256, expected_sha256, problem)
+
+        status = model_manifest.state_for(path, stat.st_size, stat.st_mtime, expected_sha256)
+        if status == 'corrupt':
+            problem = problem or (entry or {}).get('problem') or 'SHA-256 does not match models_data.json'
+            logger.warning(f"{SAUSMSG}: Integrity scan: {rel}: {problem}")
+        with self._lock:
+            self._load()[rel] = {
+                'size': stat.st_size, 'mtime': stat.st_mtime,
+                'status': status, 'problem': problem, 'checked_at': time.time(),
+            }
+
+    async def _wait_for_idle(self) -> None:
+        while prompt_running():
+            self.paused = True
+            await asyncio.sleep(MODEL_SCAN_PAUSE_POLL)
+        self.paused = False
+
+    async def scan_pass(self) -> int:
+        """Scans every pending file; returns how many were scanned."""
+        await self.index.ensure_built()
+        expected = _expected_hashes()
+        pending = await asyncio.to_thread(self.pending)
+        semaphore = asyncio.Semaphore(MODEL_SCAN_WORKERS)
+
+        async def scan(rel) -> bool:
+            async with semaphore:
+                await self._wait_for_idle()
+                self.current.add(rel)
+                try:
+                    await self.scan_file(rel, expected.get(rel))
+                except InterruptedError:
+                    return False # The scanner is stopping; the file stays pending
+                except OSError as e:
+                    logger.warning(f"{SAUSMSG}: Integrity scan could not read {rel}: {e}")
+                    return False
+                finally:
+                    self.current.discard(rel)
+                if time.monotonic() - self._saved_at >= MODEL_SCAN_CHECKPOINT_INTERVAL:
+                    self._saved_at = time.monotonic() # One checkpoint at a time
+                    await asyncio.to_thread(self.flush)
+                return True
+
+        scanned = sum(await asyncio.gather(*(scan(rel) for rel in pending)))
+
+        # Forget files that are gone.
+        files = self.index.files()
+        with self._lock:
+            checked = self._load()
+            for rel in [rel for rel in checked if rel not in files]:
+                del checked[rel]
+        await asyncio.to_thread(self.flush)
+        self.pass_finished_at = time.time()
+        return scanned
+
+    async def _run(self) -> None:
+        while True:
+            if load_settings().get('model_scan') is not False:
+                started = time.monotonic()
+                try:
+                    scanned = await self.scan_pass()
+                    if scanned:
+                        logger.info(f"{SAUSMSG}: Integrity scan checked {scanned} model files in {time.monotonic() - started:.0f}s")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"{SAUSMSG}: Integrity scan failed: {e}")
+            await asyncio.sleep(MODEL_SCAN_INTERVAL)
+
+    def problem(self, path):
+        """What the last scan found wrong with the file at `path`, or None."""
+        try:
+            rel = self.index.key(path)
+        except ValueError:
+            return None
+        with self._lock:
+            return (self._load().get(rel) or {}).get('problem')
+
+    def report(self) -> dict:
+        with self._lock:
+            checked = dict(self._load())
+        problems = [
+            {'path': rel, 'size': result['size'], 'status': result['status'],
+             'problem': result['problem'], 'checked_at': result['checked_at']}
+            for rel, result in sorted(checked.items())
+            if result['status'] == 'corrupt'
+        ]
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'paused': self.paused,
+            'current': sorted(self.current),
+            'checked': len(checked),
+            'pending': len(self.pending()),
+            'pass_finished_at': self.pass_finished_at,
+            'problems': problems,
+        }
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._pool = ThreadPoolExecutor(max_workers=MODEL_SCAN_WORKERS, thread_name_prefix='saus-scan')
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        await asyncio.to_thread(self.flush)
+
+model_scanner = ModelScanner()
+
+async def on_startup(app) -> None:
+    model_scanner.start()
+
+async def on_cleanup(app) -> None:
+    await model_scanner.stop()
@@ -0,0 +1,280 @@
+''' Content-addressed reuse of model files that are already on disk '''
+import os
+import json
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+from .constants import DATA_DIR, MODELS_DIRECTORY, SAUSMSG, logger, MODEL_DEDUP_MIN_SIZE
+from .download_lock import lock_path
+from .helpers import load_settings, atomic_write_json
+from .model_index import model_index
+from .model_tiers import fast_tier
+from . import model_manifest
+from .model_manifest import _key
+from . import preflight
+
+STORE_FILE = DATA_DIR / "model_store.json"
+
+FICLONE = 0x40049409 # Linux ioctl that makes a copy-on-write clone (btrfs, XFS)
+
+def _path(key: str) -> Path:
+    return Path(key) if Path(key).is_absolute() else MODELS_DIRECTORY / key
+
+def _reflink(source, dest) -> None:
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("Reflinks are not supported on this platform")
+    try:
+        with open(source, 'rb') as src, open(dest, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        try:
+            os.remove(dest)
+        except OSError:
+            pass
+        raise
+
+def clone_file(source, dest) -> str:
+    """
+    Makes `dest` a hard link to `source`, or a copy-on-write clone where hard
+    links are not possible, replacing `dest` atomically. Never copies data;
+    raises OSError when neither works (e.g. across filesystems).
+    Blocking; call via asyncio.to_thread.
+    """
+    dest = Path(dest)
+    tmp_path = dest.with_name(dest.name + '.tmp')
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if tmp_path.exists():
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+        method = 'hardlink'
+    except OSError:
+        _reflink(source, tmp_path)
+        method = 'reflink'
+    try:
+        os.replace(tmp_path, dest)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+    return method
+
+def _same_file(a, b) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+class ModelStore:
+    """
+    Remembers which URL every finished download came from, together with the
+    file's size and mtime, so a later download of the same URL (or of a file
+    with the same expected SHA-256) can be satisfied from the copy already on
+    disk. The URL match is the cheap first pass: it only counts when the
+    remote size still equals the stored file's size.
+    """
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            self._entries = {}
+            if self.path.exists():
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._entries = json.load(f)
+                except Exception as e:
+                    logger.warning(f"{SAUSMSG}: Ignoring unreadable model store {self.path}: {e}")
+        return self._entries
+
+    def remember(self, url: str, path) -> None:
+        """Records that `path` holds the file at `url`. Blocking; call via asyncio.to_thread."""
+        stat = os.stat(path)
+        with self._lock:
+            self._load()[preflight.SizeCache.key(url)] = {
+                'path': _key(path), 'size': stat.st_size, 'mtime': stat.st_mtime
+            }
+            atomic_write_json(self.path, self._entries, indent=2)
+
+    def _by_url(self, url: str):
+        """Stored file for `url` with its size, if it has not changed since it was downloaded."""
+        with self._lock:
+            entry = self._load().get(preflight.SizeCache.key(url))
+        if not entry:
+            return None
+        path = _path(entry['path'])
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime) != (entry['size'], entry['mtime']):
+            return None
+        return path, stat.st_size
+
+    async def find(self, url: str, headers: dict = None, expected_sha256: str = None):
+        """
+        An existing file with the content `url` would download, or None.
+        With `expected_sha256` only hash matches count; otherwise the file last
+        downloaded from the same URL counts when the remote size is unchanged.
+        """
+        if expected_sha256:
+            for path in await asyncio.to_thread(model_manifest.paths_with_hash, expected_sha256):
+                if await asyncio.to_thread(model_manifest.lookup, path):
+                    return path
+            return None
+        found = await asyncio.to_thread(self._by_url, url)
+        if not found:
+            return None
+        path, size = found
+        remote_size = await preflight.probe_size(url, headers)
+        return path if remote_size == size else None
+
+model_store = ModelStore()
+
+async def materialize_duplicate(url: str, headers: dict, save_path, expected_sha256: str = None) -> bool:
+    """
+    Materializes `save_path` from an identical file already on disk instead of
+    downloading it. False when there is none or it cannot be linked here.
+    """
+    if load_settings().get('model_dedup') is False:
+        return False
+    try:
+        source = await model_store.find(url, headers, expected_sha256)
+    except Exception as e:
+        logger.warning(f"[Downloader] Duplicate lookup for {url} failed: {e}")
+        return False
+    if source is None or _same_file(source, save_path):
+        return False
+    try:
+        method = await asyncio.to_thread(clone_file, source, save_path)
+    except OSError as e:
+        logger.info(f"[Downloader] {source} has the same content as {save_path} but cannot be linked ({e}); downloading")
+        return False
+    await asyncio.to_thread(model_manifest.link, source, save_path)
+    model_index.update(save_path)
+    fast_tier.forget(save_path)
+    await asyncio.to_thread(model_store.remember, url, save_path)
+    logger.info(f"[Downloader] {save_path} is a {method} of {source}, nothing downloaded")
+    return True
+
+class DedupScan:
+    """
+    Background pass over the models directory that replaces identical files
+    with hard links to (or clones of) one copy, in place. Candidates are grouped by size
+    first, so only files with a twin of the same size are hashed; hashes
+    already in the model manifest are reused and new ones are recorded there.
+    """
+
+    def __init__(self, index=model_index):
+        self.index = index
+        self._task = None
+        self.result = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _hash(self, path: Path, stat) -> str:
+        entry = model_manifest.lookup(path, stat.st_size, stat.st_mtime)
+        if entry:
+            return entry['sha256'].lower()
+        self.result['hashed'] += 1
+        sha256 = model_manifest.hash_file(path).hexdigest()
+        model_manifest.record(path, sha256)
+        return sha256
+
+    def _merge(self, keep: Path, duplicate: Path, size: int) -> bool:
+        rel = self.index.key(duplicate)
+        try:
+            method = clone_file(keep, duplicate)
+        except OSError as e:
+            # In use (Windows), on another filesystem, or links not supported.
+            self.result['errors'].append({'path': rel, 'error': str(e)})
+            return False
+        model_manifest.link(keep, duplicate)
+        self.index.update(duplicate)
+        fast_tier.forget(duplicate)
+        self.result['merged'].append({'path': rel, 'into': self.index.key(keep), 'size': size})
+        logger.info(f"{SAUSMSG}: {rel} was identical to {self.index.key(keep)}, now a {method} of it")
+        return True
+
+    def scan(self) -> None:
+        """Blocking; call via asyncio.to_thread."""
+        by_size = {}
+        for rel, (size, _) in self.index.files().items():
+            if size >= MODEL_DEDUP_MIN_SIZE:
+                by_size.setdefault(size, []).append(self.index.root / rel)
+
+        for size, paths in by_size.items():
+            if len(paths) < 2:
+                continue
+            inodes = {}  # (dev, inode) -> (path, stat) of one link to it
+            for path in paths:
+                if lock_path(path).exists():
+                    continue # Being downloaded
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                inodes.setdefault((stat.st_dev, stat.st_ino), (path, stat))
+            if len(inodes) < 2:
+                continue
+
+            by_content = {}
+            for (dev, _), (path, stat) in inodes.items():
+                try:
+                    sha256 = self._hash(path, stat)
+                except OSError as e:
+                    self.result['errors'].append({'path': self.index.key(path), 'error': str(e)})
+                    continue
+                by_content.setdefault((dev, sha256), []).append((path, stat))
+
+            for twins in by_content.values():
+                if len(twins) < 2:
+                    continue
+                # Keep the copy that already has the most links, then the oldest.
+                twins.sort(key=lambda twin: (-twin[1].st_nlink, twin[1].st_mtime))
+                keep = twins[0][0]
+                for path, stat in twins[1:]:
+                    # Every link to the duplicate's inode is merged; its space is
+                    # only freed once none is left.
+                    links = [other for other in paths if _same_file(other, path)]
+                    merged = sum(self._merge(keep, link, size) for link in links)
+                    if merged == stat.st_nlink:
+                        self.result['freed_bytes'] += size
+
+    async def _run(self) -> None:
+        started = time.monotonic()
+        self.result = {
+            'started_at': time.time(), 'finished_at': None,
+            'hashed': 0, 'merged': [], 'freed_bytes': 0, 'errors': [],
+        }
+        try:
+            await self.index.ensure_built()
+            await asyncio.to_thread(self.scan)
+        except Exception as e:
+            logger.error(f"{SAUSMSG}: Duplicate model scan failed: {e}")
+            self.result['errors'].append({'path': None, 'error': str(e)})
+        self.result['finished_at'] = time.time()
+        logger.info(
+            f"{SAUSMSG}: Duplicate model scan merged {len(self.result['merged'])} files, "
+            f"freeing {preflight.format_size(self.result['freed_bytes'])} in {time.monotonic() - started:.1f}s"
+        )
+
+    def start(self) -> bool:
+        """Starts a scan unless one is running; True when a new one started."""
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    def report(self) -> dict:
+        return {'running': self.running, **self.result}
+
+dedup_scan = DedupScan()
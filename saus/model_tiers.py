@@ -0,0 +1,233 @@
+''' Two-tier model storage: MODELS_DIRECTORY as backing store plus a fast local cache '''
+import os
+import time
+import shutil
+import asyncio
+import threading
+from pathlib import Path
+
+from .constants import SAUSMSG, logger, DOWNLOAD_SPACE_MARGIN
+from .helpers import app_model_paths
+from .model_index import model_index
+from . import preflight
+
+GB = 1024 ** 3
+
+class FastTier:
+    """
+    Copies of models on a fast local disk (`model_fast_tier_path`), laid out
+    like MODELS_DIRECTORY. MODELS_DIRECTORY stays the authoritative backing
+    store and is never modified here. ComfyUI is pointed at a copy through
+    `resolve`, hooked into folder_paths.get_full_path, but only while the copy
+    still has the backing file's size and mtime.
+
+    Opening an app queues its models for promotion; a background task copies
+    them one at a time and evicts the least recently used copies to stay under
+    `model_fast_tier_cap_gb` (0 = only limited by free space).
+    """
+
+    def __init__(self, index=model_index):
+        self.index = index
+        self.root = None
+        self.cap = 0
+        self._lock = threading.Lock()
+        self._entries = {}  # relative path -> {'size', 'mtime', 'last_used'}
+        self._pending = []
+        self._task = None
+        self._loaded = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None
+
+    def apply_settings(self, settings: dict) -> None:
+        root = settings.get('model_fast_tier_path') or None
+        try:
+            self.cap = int(max(0.0, float(settings.get('model_fast_tier_cap_gb') or 0)) * GB)
+        except (TypeError, ValueError):
+            logger.warning(f"{SAUSMSG}: Ignoring invalid model_fast_tier_cap_gb: {settings.get('model_fast_tier_cap_gb')}")
+            self.cap = 0
+        root = Path(root) if root else None
+        if root != self.root:
+            self.root = root
+            with self._lock:
+                self._entries = {}
+            self._loaded = False
+
+    def load(self) -> None:
+        """
+        Picks up copies left by a previous run and deletes the ones that no longer
+        match their backing file. Blocking; call via asyncio.to_thread.
+        """
+        if not self.enabled or self._loaded:
+            return
+        entries = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                fast_path = Path(dirpath) / name
+                rel = fast_path.relative_to(self.root).as_posix()
+                try:
+                    stat = fast_path.stat()
+                    backing = os.stat(self.index.root / rel)
+                    if not name.endswith('.part') and (stat.st_size, stat.st_mtime) == (backing.st_size, backing.st_mtime):
+                        entries[rel] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'last_used': stat.st_atime}
+                        continue
+                except OSError:
+                    pass
+                try:
+                    os.remove(fast_path)
+                except OSError as e:
+                    logger.warning(f"{SAUSMSG}: Could not remove stale fast tier copy {fast_path}: {e}")
+        with self._lock:
+            self._entries = entries
+        self._loaded = True
+        logger.info(f"{SAUSMSG}: Fast model tier at {self.root} holds {len(entries)} models")
+
+    def resolve(self, path):
+        """Fast copy of the backing file at `path` when one is current, else `path`."""
+        if not self.enabled or not path:
+            return path
+        try:
+            rel = self.index.key(path)
+        except ValueError:
+            return path
+        with self._lock:
+            entry = self._entries.get(rel)
+            if not entry or self.index.get(path) != (entry['size'], entry['mtime']):
+                return path
+            entry['last_used'] = time.time()
+        return str(self.root / rel)
+
+    def used_bytes(self) -> int:
+        with self._lock:
+            return sum(entry['size'] for entry in self._entries.values())
+
+    def _drop(self, rel: str) -> None:
+        with self._lock:
+            self._entries.pop(rel, None)
+        try:
+            os.remove(self.root / rel)
+        except OSError:
+            pass
+
+    def forget(self, path) -> None:
+        """Drops the fast copy of a backing file that was deleted or replaced."""
+        if not self.enabled:
+            return
+        try:
+            self._drop(self.index.key(path))
+        except ValueError:
+            pass
+
+    def _make_room(self, size: int, keep: set) -> bool:
+        """Evicts least recently used copies not in `keep` until `size` more bytes fit."""
+        while True:
+            over_cap = self.used_bytes() + size - self.cap if self.cap else 0
+            short_disk = size + DOWNLOAD_SPACE_MARGIN - preflight.free_bytes(self.root)
+            if over_cap <= 0 and short_disk <= 0:
+                return True
+            with self._lock:
+                candidates = sorted(
+                    (rel for rel in self._entries if rel not in keep),
+                    key=lambda rel: self._entries[rel]['last_used']
+                )
+            if not candidates:
+                return False
+            logger.info(f"{SAUSMSG}: Evicting {candidates[0]} from the fast model tier")
+            self._drop(candidates[0])
+
+    def _promote(self, rel: str, keep: set) -> None:
+        """Copies one backing file to the fast tier. Blocking; call via asyncio.to_thread."""
+        backing = self.index.root / rel
+        try:
+            stat = os.stat(backing)
+        except OSError:
+            return # Not downloaded (yet)
+        with self._lock:
+            entry = self._entries.get(rel)
+        if entry and (entry['size'], entry['mtime']) == (stat.st_size, stat.st_mtime):
+            return
+        if self.cap and stat.st_size > self.cap:
+            logger.info(f"{SAUSMSG}: {rel} is larger than the fast tier cap, not promoting")
+            return
+        if not self._make_room(stat.st_size, keep):
+            logger.warning(f"{SAUSMSG}: No room in the fast model tier for {rel}")
+            return
+
+        fast_path = self.root / rel
+        part = fast_path.with_name(fast_path.name + '.part')
+        started = time.monotonic()
+        try:
+            fast_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(backing, part)
+            # The copy carries the backing file's mtime so it can be validated after a restart.
+            os.utime(part, (time.time(), stat.st_mtime))
+            os.replace(part, fast_path)
+        except OSError as e:
+            logger.error(f"{SAUSMSG}: Could not promote {rel} to the fast tier: {e}")
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._entries[rel] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'last_used': time.time()}
+        logger.info(f"{SAUSMSG}: Promoted {rel} to the fast tier in {time.monotonic() - started:.1f}s")
+
+    def promote(self, rels) -> None:
+        """Queues models (relative paths) for background promotion."""
+        if not self.enabled:
+            return
+        for rel in rels:
+            if rel not in self._pending:
+                self._pending.append(rel)
+        if self._pending and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        await asyncio.to_thread(self.load)
+        while self._pending:
+            rel = self._pending[0]
+            try:
+                await asyncio.to_thread(self._promote, rel, set(self._pending))
+            except Exception as e:
+                logger.error(f"{SAUSMSG}: Fast tier promotion of {rel} failed: {e}")
+            finally:
+                self._pending.remove(rel)
+
+    def app_opened(self, base_path: str) -> None:
+        """RouteManager open listener: promotes the models of the app being opened."""
+        self.promote(app_model_paths(base_path.strip('/').split('/', 1)[-1]))
+
+    def report(self) -> dict:
+        with self._lock:
+            entries = [{'path': rel, **entry} for rel, entry in self._entries.items()]
+        entries.sort(key=lambda entry: entry['last_used'], reverse=True)
+        return {
+            'enabled': self.enabled,
+            'path': str(self.root) if self.root else None,
+            'cap_bytes': self.cap,
+            'used_bytes': sum(entry['size'] for entry in entries),
+            'pending': list(self._pending),
+            'models': entries,
+        }
+
+fast_tier = FastTier()
+
+def install_resolve_hook() -> None:
+    """Makes ComfyUI load promoted models from the fast tier."""
+    try:
+        import folder_paths
+        original_get_full_path = folder_paths.get_full_path
+
+        def get_full_path(folder_name, filename):
+            return fast_tier.resolve(original_get_full_path(folder_name, filename))
+
+        folder_paths.get_full_path = get_full_path
+    except Exception as e:
+        logger.error(f"{SAUSMSG}: Could not hook model loading for the fast tier: {e}")
+
+async def on_startup(app) -> None:
+    if fast_tier.enabled:
+        await asyncio.to_thread(fast_tier.load)
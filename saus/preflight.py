@@ -0,0 +1,143 @@
+''' Remote size probing and free-space accounting done before downloads start '''
+import os
+import json
+import time
+import shutil
+import asyncio
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qsl, urlencode
+import aiohttp
+
+from .constants import (
+    DATA_DIR, SAUSMSG, logger, DOWNLOAD_SIZE_CACHE_TTL, DOWNLOAD_SIZE_FAILURE_TTL, DOWNLOAD_PROBE_TIMEOUT
+)
+from .http_client import get_session
+from .helpers import atomic_write_json
+
+SIZE_CACHE_FILE = DATA_DIR / "download_sizes.json"
+
+# Query parameters that carry credentials and must not end up in the cache file.
+_SECRET_PARAMS = {'token', 'api_key', 'apikey', 'access_token'}
+
+class SizeCache:
+    """
+    Probed Content-Length per URL, persisted so sizes survive restarts.
+    Probes that found no size (gated, missing, or silent servers) are kept
+    as well, for the shorter `failure_ttl`, so they are not repeated on
+    every page load.
+    """
+
+    def __init__(self, path=SIZE_CACHE_FILE, ttl=DOWNLOAD_SIZE_CACHE_TTL, failure_ttl=DOWNLOAD_SIZE_FAILURE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._lock = threading.Lock()
+        self._entries = None
+
+    @staticmethod
+    def key(url: str) -> str:
+        parsed = urlparse(url)
+        query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if k.lower() not in _SECRET_PARAMS]
+        return parsed._replace(query=urlencode(query)).geturl()
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            self._entries = {}
+            if self.path.exists():
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._entries = json.load(f)
+                except Exception as e:
+                    logger.warning(f"{SAUSMSG}: Ignoring unreadable size cache {self.path}: {e}")
+        return self._entries
+
+    def _fresh(self, url: str):
+        with self._lock:
+            entry = self._load().get(self.key(url))
+        if entry:
+            ttl = self.ttl if entry.get('size') else self.failure_ttl
+            if time.time() - entry.get('checked_at', 0) < ttl:
+                return entry
+        return None
+
+    def known(self, url: str) -> bool:
+        """Whether `url` was probed recently, even if no size was found."""
+        return self._fresh(url) is not None
+
+    def get(self, url: str):
+        entry = self._fresh(url)
+        return entry.get('size') if entry else None
+
+    def set(self, url: str, size) -> None:
+        """Blocking; call via asyncio.to_thread."""
+        with self._lock:
+            self._load()[self.key(url)] = {'size': size, 'checked_at': time.time()}
+            atomic_write_json(self.path, self._entries)
+
+size_cache = SizeCache()
+
+def _content_range_total(resp):
+    try:
+        total = resp.headers.get('Content-Range', '').split('/')[-1]
+        return int(total) if total and total != '*' else None
+    except ValueError:
+        return None
+
+async def probe_size(url: str, headers: dict = None, use_cache: bool = True):
+    """
+    Size in bytes of the file at `url`, or None when the server does not say.
+    Tries a HEAD request first and falls back to a one-byte ranged GET, for
+    servers that answer HEAD without a Content-Length. Results are cached,
+    failures too.
+    """
+    if use_cache and size_cache.known(url):
+        return size_cache.get(url)
+
+    session = get_session()
+    timeout = aiohttp.ClientTimeout(total=DOWNLOAD_PROBE_TIMEOUT)
+    headers = headers or {}
+    size = None
+    try:
+        async with session.head(url, headers=headers, allow_redirects=True, timeout=timeout) as resp:
+            if resp.status == 200:
+                size = int(resp.headers.get('Content-Length') or 0) or None
+        if size is None:
+            async with session.get(url, headers={**headers, 'Range': 'bytes=0-0'}, timeout=timeout) as resp:
+                if resp.status == 206:
+                    size = _content_range_total(resp)
+                elif resp.status == 200:
+                    # Range ignored; the body is not read, only its announced length.
+                    size = int(resp.headers.get('Content-Length') or 0) or None
+    except Exception as e:
+        logger.warning(f"[Downloader] Could not probe size of {url}: {e}")
+
+    try:
+        await asyncio.to_thread(size_cache.set, url, size)
+    except OSError as e:
+        logger.warning(f"{SAUSMSG}: Could not write size cache: {e}")
+    return size
+
+def _existing_dir(path: Path) -> Path:
+    """Closest existing ancestor of `path`, so targets that do not exist yet can be checked."""
+    path = Path(path)
+    while not path.exists() and path.parent != path:
+        path = path.parent
+    return path
+
+def free_bytes(path) -> int:
+    return shutil.disk_usage(_existing_dir(path)).free
+
+def same_filesystem(a, b) -> bool:
+    try:
+        return os.stat(_existing_dir(a)).st_dev == os.stat(_existing_dir(b)).st_dev
+    except OSError:
+        return False
+
+def format_size(size: int) -> str:
+    value = float(size)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
@@ -1,16 +1,40 @@
 from aiohttp import web
 from pathlib import Path
 
+from .constants import SAUSMSG, logger
+
 class RouteManager:
+    # Called with the base path (e.g. 'saus/<app url>') each time an app page is served.
+    open_listeners = []
+
+    @staticmethod
+    def serve_index(base_path: str, app_dir: Path) -> web.FileResponse:
+        for listener in RouteManager.open_listeners:
+            try:
+                listener(base_path)
+            except Exception as e:
+                logger.error(f"{SAUSMSG}: App open listener failed for {base_path}: {e}")
+        return web.FileResponse(app_dir / 'index.html', headers={'X-Content-Type-Options': 'nosniff', 'Cache-Control': 'no-cache'})
+
+    @staticmethod
+    def serve_file(app_dir: Path, rel_path: str) -> web.StreamResponse:
+        """A file of `app_dir`, as its static route would serve it."""
+        file_path = app_dir / rel_path
+        try:
+            file_path.resolve().relative_to(app_dir.resolve())
+        except ValueError:
+            raise web.HTTPForbidden()
+        if not file_path.is_file():
+            raise web.HTTPNotFound()
+        return web.FileResponse(file_path)
 
     @staticmethod
     def create_routes(base_path: str, app_dir: Path) -> web.RouteTableDef:
         routes = web.RouteTableDef()
-        index_html = app_dir / 'index.html'
 
         @routes.get(f"/{base_path}")
         async def serve_html(request: web.Request) -> web.FileResponse:
-            return web.FileResponse(index_html, headers={'X-Content-Type-Options': 'nosniff', 'Cache-Control': 'no-cache'})
+            return RouteManager.serve_index(base_path, app_dir)
 
         routes.static(f"/{base_path}/", path=app_dir, show_index=False)
         return routes
@@ -3,7 +3,10 @@ import asyncio
 import server
 import os
 from .app_manager import AppManager
-from .downloader import download_update_apps
+from . import http_client, bandwidth, model_index, model_cache, model_tiers, model_scanner, app_sync
+from .route_manager import RouteManager
+from .downloads import restore_journaled_downloads, prefetch_app_models
+from .helpers import load_settings
 from .constants import SAUSMSG, logger
 import folder_paths
 
@@ -86,12 +89,53 @@ def setup_server() -> None:
         except Exception as e:
              logger.error(f"{SAUSMSG}: Error setting keep_alive_timeout: {e}")
 
-    download_update_apps()
+    # Pooled outbound HTTP session lives for the lifetime of the server.
+    server_instance.app.on_startup.append(http_client.on_startup)
+    server_instance.app.on_cleanup.append(http_client.on_cleanup)
+    # Downloads interrupted by a restart or crash continue from their .part files.
+    server_instance.app.on_startup.append(restore_journaled_downloads)
+    server_instance.app.on_startup.append(model_index.on_startup)
 
+    # Model usage for the optional LRU model cache (model_cache_budget_gb).
+    model_cache.install_load_hook()
+    model_cache.model_cache.send = server_instance.send_sync
+    RouteManager.open_listeners.append(model_cache.model_cache.app_opened)
+    server_instance.app.on_startup.append(model_cache.on_startup)
+    server_instance.app.on_cleanup.append(model_cache.on_cleanup)
+
+    # Optional fast local tier (model_fast_tier_path); hooked after the usage hook so it wraps it.
+    model_tiers.fast_tier.apply_settings(load_settings())
+    model_tiers.install_resolve_hook()
+    RouteManager.open_listeners.append(model_tiers.fast_tier.app_opened)
+    server_instance.app.on_startup.append(model_tiers.on_startup)
+
+    # Default models of an app are queued as soon as its page is opened (prefetch_models).
+    RouteManager.open_listeners.append(prefetch_app_models)
+
+    # Background integrity scanning of the models directory (model_scan).
+    server_instance.app.on_startup.append(model_scanner.on_startup)
+    server_instance.app.on_cleanup.append(model_scanner.on_cleanup)
+
+    # Download rate limits, and UI activity tracking for interactive priority.
+    bandwidth.apply_settings(load_settings())
+    try:
+        server_instance.app.middlewares.append(bandwidth.ui_activity_middleware)
+    except Exception as e:
+        logger.error(f"{SAUSMSG}: Failed to register UI activity middleware: {e}")
+
+    # Routes come from the apps on disk; the sync with the app repositories runs in the
+    # background, and the apps it adds are served without a restart.
     try:
         AppManager.setup_app_routes(server_instance.app)
     except Exception as e:
         logger.error(f"{SAUSMSG}: Failed to set up app routes: {e}")
+    app_sync.app_sync.send = server_instance.send_sync
+    app_sync.app_sync.synced_listeners.append(AppManager.register_new_apps)
+    try:
+        server_instance.app.middlewares.append(AppManager.synced_apps_middleware)
+    except Exception as e:
+        logger.error(f"{SAUSMSG}: Failed to register synced apps middleware: {e}")
+    server_instance.app.on_startup.append(app_sync.on_startup)
 
     if os.environ.get("RUNPOD_POD_ID"):
         # If we are in Runpod, we start redirect server
@@ -0,0 +1,122 @@
+''' Concurrent execution of the stages of an app sync '''
+import time
+import asyncio
+
+from .constants import SAUSMSG, logger, APP_SYNC_STAGE_TIMEOUT, APP_SYNC_RETRY_DELAY
+
+class StageSkipped(Exception):
+    """Raised by a stage with nothing to do (e.g. no token); the stages that need it are skipped too."""
+
+class StageFailed(Exception):
+    """Raised by a stage for a failure that retrying cannot fix (e.g. a rejected token)."""
+
+class Stage:
+    """
+    One step of a sync: `func(inputs)` runs in a worker thread, `inputs`
+    mapping each stage in `needs` to what it returned. A stage starts once
+    the stages it `needs` succeeded (it is skipped otherwise) and the stages
+    it only runs `after` ended, whatever their outcome, except a time out:
+    that thread may still be writing, so everything downstream is skipped.
+    """
+
+    def __init__(self, name: str, func, needs=(), after=(), timeout: float = APP_SYNC_STAGE_TIMEOUT, retries: int = 0):
+        self.name = name
+        self.func = func
+        self.needs = list(needs)
+        self.after = list(after)
+        self.timeout = timeout
+        self.retries = retries
+
+class SyncPipeline:
+    """
+    Runs a DAG of stages, each as soon as its dependencies allow, so
+    independent network fetches overlap. A failed attempt is retried with a
+    growing delay, unless it raised StageFailed; a timed out one is not
+    either, as its thread cannot be stopped and may still be writing. `run`
+    returns, per stage, its status ('ok', 'skipped', 'failed', 'timeout'),
+    attempts, duration and error; the threads of timed out stages are left
+    in `unfinished` to be waited for.
+    """
+
+    def __init__(self, stages: list):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            for dep in stage.needs + stage.after:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown stage {dep}")
+        self._check_acyclic()
+        self.results = {}
+        self._values = {}
+        self._blocked_by = {} # stage -> timed out stages it ran, or was skipped, because of
+        self.unfinished = {} # timed out stage -> future of its still running thread
+
+    def _check_acyclic(self) -> None:
+        done, visiting = set(), set()
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage {name} depends on itself")
+            visiting.add(name)
+            for dep in self.stages[name].needs + self.stages[name].after:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+        for name in self.stages:
+            visit(name)
+
+    async def _run_stage(self, stage: Stage, tasks: dict) -> None:
+        for dep in stage.needs + stage.after:
+            await tasks[dep]
+        result = {'status': 'skipped', 'attempts': 0, 'duration': 0.0, 'error': None}
+        self.results[stage.name] = result
+        timed_out = sorted(set().union(*(self._blocked_by.get(dep, ()) for dep in stage.needs + stage.after)))
+        if timed_out:
+            self._blocked_by[stage.name] = timed_out
+            result['error'] = f"Blocked by timed-out stage {', '.join(timed_out)}"
+            return
+        blocked = [dep for dep in stage.needs if self.results[dep]['status'] != 'ok']
+        if blocked:
+            result['error'] = f"Needs {', '.join(blocked)}"
+            return
+
+        inputs = {dep: self._values[dep] for dep in stage.needs}
+        started = time.monotonic()
+        for attempt in range(1, stage.retries + 2):
+            result['attempts'] = attempt
+            work = asyncio.ensure_future(asyncio.to_thread(stage.func, inputs))
+            try:
+                self._values[stage.name] = await asyncio.wait_for(asyncio.shield(work), stage.timeout)
+                result.update(status='ok', error=None)
+                break
+            except StageSkipped as e:
+                result.update(status='skipped', error=str(e) or None)
+                break
+            except StageFailed as e:
+                result.update(status='failed', error=str(e))
+                break
+            except Exception as e:
+                if not work.done():
+                    # wait_for gave up on the thread; a TimeoutError the stage raised itself is a failure.
+                    self.unfinished[stage.name] = work
+                    self._blocked_by[stage.name] = [stage.name]
+                    result.update(status='timeout', error=f"Did not finish within {stage.timeout}s, still running")
+                    break
+                result.update(status='failed', error=str(e) or type(e).__name__)
+                if attempt <= stage.retries:
+                    logger.warning(f"{SAUSMSG}: Sync stage {stage.name} failed (attempt {attempt}), retrying: {e}")
+                    await asyncio.sleep(APP_SYNC_RETRY_DELAY * attempt)
+        result['duration'] = round(time.monotonic() - started, 3)
+        if result['status'] in ('failed', 'timeout'):
+            logger.error(f"{SAUSMSG}: Sync stage {stage.name} {result['status']}: {result['error']}")
+
+    async def run(self) -> dict:
+        self.results = {}
+        self._values = {}
+        self._blocked_by = {}
+        self.unfinished = {}
+        tasks = {}
+        for name, stage in self.stages.items():
+            tasks[name] = asyncio.ensure_future(self._run_stage(stage, tasks))
+        await asyncio.gather(*tasks.values())
+        return {name: self.results[name] for name in self.stages}
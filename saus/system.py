@@ -12,6 +12,8 @@ from PIL import Image
 from .constants import (
     APP_VERSION, SAUSMSG, logger,
 )
+from . import bandwidth
+from .model_tiers import fast_tier
 from .helpers import (
     pathToKey, get_preview_id, get_preview_paths,
     encrypt_value, decrypt_value, ensure_data_folders
@@ -208,7 +210,7 @@ async def get_settings_handler(request: web.Request) -> web.Response:
                 data = json.load(f)
             
             response_data = data.copy()
-            sensitive_keys = ['civitai_api_key', 'huggingface_api_key', 'saus_token']
+            sensitive_keys = ['civitai_api_key', 'huggingface_api_key', 'saus_token', 'mirror_token']
             for key in sensitive_keys:
                 if response_data.get(key):
                     response_data[key] = "********"
@@ -234,7 +236,7 @@ async def save_settings_handler(request: web.Request) -> web.Response:
             except Exception:
                 existing_data = {}
 
-        sensitive_keys = ['civitai_api_key', 'huggingface_api_key', 'saus_token']
+        sensitive_keys = ['civitai_api_key', 'huggingface_api_key', 'saus_token', 'mirror_token']
         
         for key, value in new_data.items():
             if key in sensitive_keys and value == "********":
@@ -247,6 +249,8 @@ async def save_settings_handler(request: web.Request) -> web.Response:
 
         with open(settings_file, 'w', encoding='utf-8') as f:
             json.dump(existing_data, f, indent=2)
+        bandwidth.apply_settings(existing_data)
+        fast_tier.apply_settings(existing_data)
         return web.json_response({"status": "success"})
     except Exception as e:
         logger.error(f"{SAUSMSG}: Error saving settings: {e}")
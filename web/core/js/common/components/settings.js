@@ -146,7 +146,9 @@ export class SettingsComponent {
             if (response.ok) {
                 this.showSyncResultModal(
                     "Sync Successful",
-                    (result.message || 'Apps synced successfully.') + '<br><br>A server restart is required to load the new apps.',
+                    (result.message || 'Apps synced successfully.') + ((result.new_apps || []).length
+                        ? `<br><br>New apps are available now: ${result.new_apps.join(', ')}.`
+                        : ''),
                     true
                 );
             } else {
@@ -82,10 +82,12 @@ function setupWebSocket() {
     ws.onmessage = (event) => {
         try {
             const msg = JSON.parse(event.data);
-            if (msg.type === 'file_download_progress') {
-                const { filename, progress } = msg.data;
-                //console.log(`[WS] Progress for ${filename}: ${progress}%`);
-                updateDownloadProgress(progress, `Downloading ${filename}...`);
+            if (msg.type === 'downloads_progress') {
+                const job = (msg.data.jobs || []).find(j => j.job_id === activeDownloadJobId);
+                if (job && job.status === 'running') {
+                    //console.log(`[WS] Progress for ${job.filename}: ${job.progress}%`);
+                    updateDownloadProgress(job.progress, `Downloading ${job.filename}...`);
+                }
             } else if (msg.type === 'file_download_complete') {
                 const { filename } = msg.data;
                 console.log(`[WS] Complete: ${filename}`);
@@ -149,6 +151,7 @@ function resetDownloadUI() {
 }
 
 let currentDirectory = 'output'; // sets initial drectory
+let activeDownloadJobId = null; // job id of the server-side download shown in the modal
 
 function loadManagerApp() {
     // Code to load the Manager app into the content area
@@ -216,6 +219,8 @@ window.startDownload = async function () {
         if (!response.ok) {
             throw new Error(`Download failed: ${response.statusText}`);
         }
+        const result = await response.json();
+        activeDownloadJobId = result.job_id || null;
         
         console.log("[Download] Server accepted request. Waiting for WebSocket updates...");
         if (statusDiv) statusDiv.textContent = "Download started on server...";
@@ -2,7 +2,7 @@ import { PromptServerClient } from './websocket.js';
 import { SettingsComponent } from '../../core/js/common/components/settings.js';
 import { state, loadFavorites, preferencesManager } from './state.js';
 import { checkForUpdate, showVersion } from './updates.js';
-import { updateComponentStatus } from './models.js';
+import { updateComponentStatus, loadModelStatuses } from './models.js';
 import { renderSidebarCategories, initializeStaticSidebarEvents } from './sidebar.js';
 import { renderApps, filterCurrentApps, renderTagsFilter, showHome, showApps, showSettings } from './ui.js';
 
@@ -18,6 +18,14 @@ export async function loadApps() {
         if (archResponse.ok) state.ARCHITECTURES = await archResponse.json();
         if (modelsResponse.ok) state.MODELS_DATA = await modelsResponse.json();
 
+        // Sizes are probed server-side and cached; not needed to render the list.
+        fetch('/saus/api/model-sizes')
+            .then(res => res.ok ? res.json() : { sizes: {} })
+            .then(data => { state.MODEL_SIZES = data.sizes || {}; })
+            .catch(() => {});
+
+        loadModelStatuses(true);
+
         const response = await fetch('/saus/api/apps');
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
@@ -255,10 +263,27 @@ function toggleFavoritesFilter(button) {
 function initializeWebSocket() {
     const client = new PromptServerClient();
     
-    client.on('model_download_progress', (e) => {
+    client.on('downloads_progress', (e) => {
         //console.log('[SAUS] WS Progress:', e.detail);
-        const { file_name, progress } = e.detail;
-        updateComponentStatus(file_name, 'downloading', progress);
+        for (const job of e.detail.jobs || []) {
+            if (job.kind === 'model' && job.status === 'running') {
+                updateComponentStatus(job.filename, 'downloading', job.progress);
+            }
+        }
+    });
+
+    client.on('models_evicted', (e) => {
+        // Paths are relative to the models folder; the file name is the component id.
+        for (const path of e.detail.files || []) {
+            updateComponentStatus(path.split('/').pop(), 'missing');
+        }
+    });
+
+    client.on('apps_synced', (e) => {
+        // Apps added by a background sync are served without a restart.
+        if ((e.detail.new_apps || []).length) {
+            window.dispatchEvent(new Event('appsSynced'));
+        }
     });
 
     client.on('model_download_complete', (e) => {
@@ -1,22 +1,40 @@
 import { state } from './state.js';
 
-export async function checkModelStatus(fileId, modelPath) {
-    if (!modelPath) return 'missing';
-    try {
-        const query = new URLSearchParams({
-            file_id: fileId,
-            model_path: modelPath
-        }).toString();
+// One request answers the status of the whole catalogue; concurrent callers share it.
+let modelStatusesRequest = null;
+
+export function loadModelStatuses(force = false) {
+    if (!modelStatusesRequest || force) {
+        modelStatusesRequest = fetch('/saus/api/model-statuses')
+            .then(res => res.ok ? res.json() : { statuses: {} })
+            .then(data => data.statuses || {})
+            .catch(error => {
+                console.error("Error loading model statuses:", error);
+                return {};
+            });
+    }
+    return modelStatusesRequest;
+}
 
-        const response = await fetch(`/saus/api/model-status?${query}`);
-        if (!response.ok) return 'error';
-        
-        const data = await response.json();
-        return data.status || 'missing';
-    } catch (error) {
-        console.error("Error checking model status:", error);
-        return 'error';
+async function getComponentStatus(compKey) {
+    const statuses = await loadModelStatuses();
+    return statuses[compKey]?.status || 'missing';
+}
+
+// 'unverified' files exist but have no recorded checksum (e.g. copied in by hand).
+export function isInstalledStatus(status) {
+    return status === 'ready' || status === 'unverified';
+}
+
+function formatSize(bytes) {
+    if (!bytes) return '';
+    const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+    let i = 0;
+    while (bytes >= 1024 && i < units.length - 1) {
+        bytes /= 1024;
+        i++;
     }
+    return `${bytes.toFixed(1)} ${units[i]}`;
 }
 
 export async function updateAppStatus(app, statusElement) {
@@ -45,10 +63,9 @@ export async function updateAppStatus(app, statusElement) {
     const checkComponents = async (componentList) => {
         let readyCount = 0;
         for (const compKey of componentList) {
-            const modelInfo = state.MODELS_DATA[compKey];
-            if (modelInfo) {
-                const status = await checkModelStatus(modelInfo.id, modelInfo.model_path);
-                if (status === 'ready') readyCount++;
+            if (state.MODELS_DATA[compKey]) {
+                const status = await getComponentStatus(compKey);
+                if (isInstalledStatus(status)) readyCount++;
             }
         }
         return readyCount;
@@ -58,10 +75,9 @@ export async function updateAppStatus(app, statusElement) {
     
     if (atLeastOne.length > 0) {
         for (const compKey of atLeastOne) {
-            const modelInfo = state.MODELS_DATA[compKey];
-            if (modelInfo) {
-                const status = await checkModelStatus(modelInfo.id, modelInfo.model_path);
-                if (status === 'ready') {
+            if (state.MODELS_DATA[compKey]) {
+                const status = await getComponentStatus(compKey);
+                if (isInstalledStatus(status)) {
                     readyAtLeastOneCount++;
                     break;
                 }
@@ -111,6 +127,10 @@ export async function showAppDetails(app) {
             <p class="details-description">${app.description}</p>
             <div style="margin-top:10px;">
                 <button class="btn-action open-app-btn ${statusClass}" onclick="window.open('saus/${app.url}', '_blank')"><i class="fas fa-play"></i> Open App</button>                
+                ${app.architecture && state.ARCHITECTURES[app.architecture] && statusClass !== 'status-ready'
+                    ? `<button class="btn-action" onclick="provisionArchitecture('${app.architecture}', event)" title="Download every required model"><i class="fas fa-download"></i> Install Required</button>`
+                    : ''
+                }
             </div>
         </div>
     `;
@@ -139,11 +159,11 @@ async function renderComponentList(title, componentKeys, listType) {
     const modelStatuses = await Promise.all(componentKeys.map(async (key) => {
         const model = state.MODELS_DATA[key];
         if (!model) return { key, model: null, status: 'error' };
-        const status = await checkModelStatus(model.id, model.model_path);
+        const status = await getComponentStatus(key);
         return { key, model, status };
     }));
 
-    const readyCount = modelStatuses.filter(m => m.status === 'ready').length;
+    const readyCount = modelStatuses.filter(m => isInstalledStatus(m.status)).length;
     const totalCount = modelStatuses.length;
 
     let headerTrafficLight = '';
@@ -165,7 +185,7 @@ async function renderComponentList(title, componentKeys, listType) {
     const itemsHtml = modelStatuses.map(({ key, model, status }) => {
         if (!model) return '';
 
-        const isReady = status === 'ready';
+        const isReady = isInstalledStatus(status);
 
         let backgroundClass = '';
         if (listType === 'compulsory' || listType === 'at_least_one') {
@@ -180,6 +200,7 @@ async function renderComponentList(title, componentKeys, listType) {
             <div class="component-item ${backgroundClass}" data-file-id="${model.id}" data-list-type="${listType}">
                 <div class="component-info">
                     <span class="component-name">${model.name}</span>
+                    ${state.MODEL_SIZES[key] ? `<span class="component-size">${formatSize(state.MODEL_SIZES[key])}</span>` : ''}
                     <!--<span class="component-filename">${model.id}</span>-->
                 </div>
                 <div class="component-actions">
@@ -269,6 +290,7 @@ export function updateComponentStatus(fileId, status, progress = 0) {
     //console.log(`[SAUS] updateComponentStatus: ${fileId} -> ${status} (${progress}%)`);
 
     if (status === 'ready' || status === 'missing') {
+        loadModelStatuses(true);
         const AppCards = document.querySelectorAll('.app-card');
         AppCards.forEach(card => {
             const AppId = card.dataset.appId;
@@ -443,6 +465,36 @@ window.downloadModel = async function(componentType, urlModel, modelPath, fileId
     }
 };
 
+// Queues every missing required model of an architecture in one server-side request.
+window.provisionArchitecture = async function(architecture, event) {
+    if (event) event.stopPropagation();
+    try {
+        const response = await fetch('/saus/api/provision', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ architecture })
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            showToast(result.message, "error");
+            return;
+        }
+        const jobs = result.group.jobs;
+        if (jobs.length === 0) {
+            showToast("All required models are already installed", "success");
+            return;
+        }
+        for (const key in state.MODELS_DATA) {
+            const model = state.MODELS_DATA[key];
+            if (jobs.some(job => job.filename === model.id)) updateComponentStatus(model.id, 'downloading', 0);
+        }
+        showToast(`Downloading ${jobs.length} model${jobs.length > 1 ? 's' : ''}`, "info");
+    } catch (e) {
+        console.error(e);
+        showToast('Error initiating download', "error");
+    }
+};
+
 window.deleteModel = function(fileId, modelPath) {
     showConfirmationModal(
         "Delete Model",
@@ -11,6 +11,7 @@ export const state = {
     sidebarFilter: null,
     ARCHITECTURES: {},
     MODELS_DATA: {},
+    MODEL_SIZES: {},
     settingsComponent: null,
     hideDescriptions: false,
     hideTitles: false,